@@ -1,24 +1,106 @@
+import bisect
+import functools
+import hashlib
+import hmac
 import json
+import logging
+import math
 import os
 import secrets
-import requests
+import signal
+import sys
+import threading
+import time
 import uuid
-from flask import Flask, request, redirect, url_for, render_template, flash, session, g, jsonify
+from urllib.parse import quote
+import click
+from flask import (Flask, request, redirect, url_for, render_template, flash, session, g, jsonify, make_response, abort,
+                   send_from_directory, stream_with_context, has_request_context, request_started, request_finished,
+                   before_render_template, template_rendered)
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from flask_cors import CORS
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, date
+from werkzeug.datastructures import MultiDict
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
+from datetime import datetime, date, timedelta
+from db_pool import (REPLICA_BIND, ReplicaLagGuard, RoutingSession, engine_options_from_config,
+                     install_statement_timeout, pool_status)
+from media import build_renditions, derive_image, plain_image, servable_image
+from page_cache import PageCacheEntry, create_page_cache
+from observability import (MetricsRegistry, configure_logging, install_query_timing, read_snapshots,
+                           remove_snapshot, render_prometheus)
+from room_catalog import (FORMATS as CATALOG_FORMATS, CatalogError, catalog_format, catalog_reader,
+                          csv_catalog_chunks, json_catalog_chunks, room_values)
+from room_index import RoomSearchIndex
+from booking_reports import EXPORT_FIELDS as BOOKING_EXPORT_FIELDS, csv_chunks, funnel, rollup_deltas, term_bounds
+from serving import cooperative, make_psycopg_cooperative
+from static_assets import (IMMUTABLE, build_static, content_type, is_compressible, is_fingerprinted,
+                           load_manifest, precompressed_variant)
+from passwords import LoginThrottle, PasswordHasher, PasswordHashingBusy
+from paystack import PaystackClient, PaystackError
 
 # Initialize Flask app, specifying static and template folders
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
 # --- Configuration ---
+# Logs go to stderr as one JSON object per line; LOG_FORMAT=text is easier to read locally.
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')
+configure_logging(app.logger, app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+
 app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', secrets.token_hex(16))
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///leemonthostel.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+# Connection pool (PostgreSQL). Every gunicorn worker has its own pool, so each one can
+# hold up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections. Set DB_CONNECTION_BUDGET to the
+# connections this app may use in total and leave DB_POOL_SIZE unset to derive it from
+# WEB_CONCURRENCY (gunicorn's worker count). DB_PGBOUNCER=1 leaves pooling to PgBouncer.
+app.config['WEB_CONCURRENCY'] = int(os.environ.get('WEB_CONCURRENCY', 1))
+app.config['DB_POOL_SIZE'] = int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None
+app.config['DB_CONNECTION_BUDGET'] = int(os.environ.get('DB_CONNECTION_BUDGET', 0))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 2))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+app.config['DB_PGBOUNCER'] = os.environ.get('DB_PGBOUNCER', '0') == '1'
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_config(app.config)
+
+# Read replica (optional). With DATABASE_REPLICA_URL set, public browsing pages read from
+# the replica while it is within REPLICA_MAX_LAG_SECONDS of the primary; writes, and any
+# user's reads for REPLICA_READ_YOUR_WRITES_SECONDS after they wrote, use the primary.
+# See Read Replica Routing below. The replica's pool uses the same DB_* settings.
+app.config['DATABASE_REPLICA_URL'] = os.environ.get('DATABASE_REPLICA_URL')
+app.config['REPLICA_MAX_LAG_SECONDS'] = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+app.config['REPLICA_LAG_CHECK_SECONDS'] = float(os.environ.get('REPLICA_LAG_CHECK_SECONDS', 2))
+app.config['REPLICA_READ_YOUR_WRITES_SECONDS'] = float(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', 30))
+app.config['REPLICA_HEARTBEAT_SECONDS'] = float(os.environ.get('REPLICA_HEARTBEAT_SECONDS', 1))
+if app.config['DATABASE_REPLICA_URL']:
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: dict(
+        engine_options_from_config(dict(app.config, SQLALCHEMY_DATABASE_URI=app.config['DATABASE_REPLICA_URL'])),
+        url=app.config['DATABASE_REPLICA_URL'])}
+
+# Serving mode. gunicorn.conf.py picks the worker class: GUNICORN_WORKER_CLASS=sync (the
+# default) holds a process per request, while gevent serves up to GUNICORN_WORKER_CONNECTIONS
+# requests per worker and switches whenever one waits on Paystack or PostgreSQL. A gevent
+# worker still draws on the same DB_POOL_SIZE connections, so requests queue for a connection
+# (up to DB_POOL_TIMEOUT) rather than opening more. See gunicorn.conf.py for tested settings.
+app.config['COOPERATIVE'] = cooperative()
+app.config['WORKER_CONNECTIONS'] = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+if app.config['COOPERATIVE'] and app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres'):
+    make_psycopg_cooperative()
+# Token for /internal/* endpoints; admins can always reach them while logged in.
+app.config['INTERNAL_TOKEN'] = os.environ.get('INTERNAL_TOKEN')
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+if app.config['DB_PGBOUNCER'] and app.config['DB_STATEMENT_TIMEOUT_MS']:
+    with app.app_context():
+        install_statement_timeout(db.engine, app.config['DB_STATEMENT_TIMEOUT_MS'])
 CORS(app)
 
 login_manager = LoginManager()
@@ -28,20 +110,107 @@ login_manager.login_view = 'user_login'
 # NEW: Paystack Configuration
 PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY', 'pk_test_YOUR_PAYSTACK_PUBLIC_KEY')
 PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', 'sk_test_YOUR_PAYSTACK_SECRET_KEY')
-PAYSTACK_VERIFY_URL = "https://api.paystack.co/transaction/verify/"
-PAYSTACK_INITIALIZE_URL = "https://api.paystack.co/transaction/initialize"
-
-# --- DEBUGGING PAYSTACK KEYS (TEMPORARY) ---
-# These print statements will show up in your Render deployment/runtime logs.
-# For security, avoid printing the full secret key in production logs.
-print(f"DEBUG: PAYSTACK_PUBLIC_KEY as seen by app: {PAYSTACK_PUBLIC_KEY}")
-print(f"DEBUG: PAYSTACK_SECRET_KEY is set: {bool(PAYSTACK_SECRET_KEY)}")
-if PAYSTACK_SECRET_KEY:
-    print(f"DEBUG: PAYSTACK_SECRET_KEY prefix: {PAYSTACK_SECRET_KEY[:10]}...")
-# --- END DEBUGGING ---
+app.config['PAYSTACK_SECRET_KEY'] = PAYSTACK_SECRET_KEY
+# PAYSTACK_BASE_URL can point at benchmarks/fake_paystack.py for local load tests.
+app.config['PAYSTACK_BASE_URL'] = os.environ.get('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+app.config['PAYSTACK_CONNECT_TIMEOUT'] = float(os.environ.get('PAYSTACK_CONNECT_TIMEOUT', 3.05))
+app.config['PAYSTACK_READ_TIMEOUT'] = float(os.environ.get('PAYSTACK_READ_TIMEOUT', 10))
+app.config['PAYSTACK_VERIFY_RETRIES'] = int(os.environ.get('PAYSTACK_VERIFY_RETRIES', 2))
+# Kept connections to Paystack: one per request that can be waiting on it at once.
+app.config['PAYSTACK_POOL_MAXSIZE'] = int(os.environ.get(
+    'PAYSTACK_POOL_MAXSIZE', app.config['WORKER_CONNECTIONS'] if app.config['COOPERATIVE'] else 10))
+app.config['PAYSTACK_BREAKER_THRESHOLD'] = int(os.environ.get('PAYSTACK_BREAKER_THRESHOLD', 5))
+app.config['PAYSTACK_BREAKER_RESET'] = float(os.environ.get('PAYSTACK_BREAKER_RESET', 30))
+paystack = PaystackClient.from_config(app.config)
+
+# Password hashing. PASSWORD_HASH_METHOD takes werkzeug's method strings, e.g.
+# 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'; stored hashes made with other parameters
+# are upgraded on the user's next login. PASSWORD_HASH_WORKERS > 0 runs hashing on that
+# many threads per worker process (about one per core, with gthread workers) and refuses
+# attempts once PASSWORD_HASH_QUEUE more are waiting. gevent workers default to one thread
+# per core, since hashing inline would stall every request the worker is serving.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get(
+    'PASSWORD_HASH_WORKERS', (os.cpu_count() or 1) if app.config['COOPERATIVE'] else 0))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+# Failed logins allowed per email and per client IP within LOGIN_FAILURE_WINDOW seconds;
+# further attempts are refused before the password is hashed.
+app.config['LOGIN_MAX_FAILURES_PER_EMAIL'] = int(os.environ.get('LOGIN_MAX_FAILURES_PER_EMAIL', 5))
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', 20))
+app.config['LOGIN_FAILURE_WINDOW'] = int(os.environ.get('LOGIN_FAILURE_WINDOW', 300))
+password_hasher = PasswordHasher.from_config(app.config)
+login_throttle = LoginThrottle.from_config(app.config)
+
+# Reverse proxies in front of the app (Render's router counts as one). With PROXY_HOPS set,
+# request.remote_addr is the client's address, which login throttling keys on.
+app.config['PROXY_HOPS'] = int(os.environ.get('PROXY_HOPS', 0))
+if app.config['PROXY_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_HOPS'], x_proto=app.config['PROXY_HOPS'])
+
+# Image renditions are derived when rooms or hostel details are saved (see media.py).
+# Local ones are files under static/renditions/, named by a hash of the source image:
+# 'flask build-static' writes them for static/images/ on every instance, and a page
+# falls back to the original URL for any rendition missing on the instance serving it.
+# MEDIA_CLOUDINARY_HOSTS lists the hosts whose URLs take Cloudinary transformations;
+# add a local stand-in such as benchmarks/fake_cloudinary.py to work offline.
+app.config['MEDIA_CLOUDINARY_HOSTS'] = tuple(
+    host.strip() for host in os.environ.get('MEDIA_CLOUDINARY_HOSTS', 'res.cloudinary.com').split(',') if host.strip())
+
+# Static assets. `flask build-static` writes content-hashed, precompressed copies under
+# static/dist/; url_for('static', ...) then points at them and browsers keep them for a year.
+# STATIC_HANDOFF moves the file bytes off the gunicorn workers: 'whitenoise' (needs the
+# whitenoise package), 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx, with
+# STATIC_ACCEL_PREFIX as an internal location aliased to the static folder).
+app.config['STATIC_FINGERPRINT'] = os.environ.get('STATIC_FINGERPRINT', '1') == '1'
+app.config['STATIC_HANDOFF'] = os.environ.get('STATIC_HANDOFF', '')
+app.config['STATIC_ACCEL_PREFIX'] = os.environ.get('STATIC_ACCEL_PREFIX', '/_static/')
+app.config['USE_X_SENDFILE'] = app.config['STATIC_HANDOFF'] == 'x-sendfile'
+if app.config['STATIC_HANDOFF'] == 'whitenoise':
+    from whitenoise import WhiteNoise
+    app.wsgi_app = WhiteNoise(app.wsgi_app, root=app.static_folder, prefix='static/',
+                              immutable_file_test=lambda path, url: is_fingerprinted(url.split('/static/', 1)[-1]))
+
+# Never log any part of the secret key; whether it is still the placeholder is enough to debug a deploy.
+app.logger.info("Paystack configured.", extra={
+    'paystack_public_key': PAYSTACK_PUBLIC_KEY,
+    'paystack_secret_key_placeholder': PAYSTACK_SECRET_KEY.startswith('sk_test_YOUR'),
+})
 
 # --- SQLAlchemy Models ---
 
+class JsonListMixin:
+    """Decodes JSON list columns once per loaded value instead of once per template call."""
+
+    def _get_json_list(self, column):
+        raw = getattr(self, column)
+        cache = self.__dict__.setdefault('_json_list_cache', {})
+        cached = cache.get(column)
+        # A reload or expire hands back a new string object, which invalidates the entry.
+        if cached is not None and cached[0] is raw:
+            return cached[1]
+        decoded = json.loads(raw) if raw else []
+        cache[column] = (raw, decoded)
+        return decoded
+
+    def _set_json_list(self, column, values):
+        raw = json.dumps(values)
+        setattr(self, column, raw)
+        self.__dict__.setdefault('_json_list_cache', {})[column] = (raw, list(values))
+
+    def _set_images(self, images_column, renditions_column, urls):
+        """Stores image URLs together with their size-specific renditions."""
+        self._set_json_list(images_column, urls)
+        self._set_json_list(renditions_column, [
+            derive_image(url, app.static_folder, app.config['MEDIA_CLOUDINARY_HOSTS']) for url in urls])
+
+    def _get_responsive_images(self, images_column, renditions_column):
+        images = self._get_json_list(images_column)
+        renditions = self._get_json_list(renditions_column)
+        # Rows saved before renditions existed fall back to the original URLs.
+        if [rendition['url'] for rendition in renditions] != images:
+            return [plain_image(url) for url in images]
+        return [servable_image(rendition, app.static_folder) for rendition in renditions]
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -51,15 +220,20 @@ class User(db.Model, UserMixin):
     bookings = db.relationship('Booking', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verifies a password, rehashing it if the hashing parameters changed. The caller commits."""
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
 
     def __repr__(self):
         return f'<User {self.email}>'
 
-class Room(db.Model):
+class Room(JsonListMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     capacity = db.Column(db.Integer, nullable=False)
@@ -67,29 +241,41 @@ class Room(db.Model):
     available_rooms = db.Column(db.Integer, default=0)
     description = db.Column(db.Text, nullable=True)
     images_json = db.Column(db.Text, default='[]')
+    image_renditions_json = db.Column(db.Text, default='[]')
     videos_json = db.Column(db.Text, default='[]')
     amenities_json = db.Column(db.Text, default='[]')
     is_deleted = db.Column(db.Boolean, default=False)
 
     bookings = db.relationship('Booking', backref='room', lazy=True)
 
+    __table_args__ = (
+        # Public pages list active rooms in id order; deleted rooms never enter this index.
+        db.Index('ix_room_active_id', 'id',
+                 sqlite_where=db.text('is_deleted = 0'), postgresql_where=db.text('is_deleted = false')),
+        # Catalogue imports match rooms by name, a batch at a time.
+        db.Index('ix_room_name', 'name'),
+    )
+
     def get_images(self):
-        return json.loads(self.images_json) if self.images_json else []
+        return self._get_json_list('images_json')
 
     def set_images(self, image_list):
-        self.images_json = json.dumps(image_list)
+        self._set_images('images_json', 'image_renditions_json', image_list)
+
+    def get_responsive_images(self):
+        return self._get_responsive_images('images_json', 'image_renditions_json')
 
     def get_videos(self):
-        return json.loads(self.videos_json) if self.videos_json else []
+        return self._get_json_list('videos_json')
 
     def set_videos(self, video_list):
-        self.videos_json = json.dumps(video_list)
+        self._set_json_list('videos_json', video_list)
 
     def get_amenities(self):
-        return json.loads(self.amenities_json) if self.amenities_json else []
+        return self._get_json_list('amenities_json')
 
     def set_amenities(self, amenity_list):
-        self.amenities_json = json.dumps(amenity_list)
+        self._set_json_list('amenities_json', amenity_list)
 
     def __repr__(self):
         return f'<Room {self.name}>'
@@ -104,43 +290,286 @@ class Booking(db.Model):
     status = db.Column(db.String(50), default='pending_payment')
     payment_reference = db.Column(db.String(100), unique=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # While a payment is pending the booking holds one unit of the room's inventory until hold_expires_at.
+    holds_inventory = db.Column(db.Boolean, default=False, nullable=False)
+    hold_expires_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Serves the availability interval query: equality on room and status, range on dates.
+        db.Index('ix_booking_room_status_dates', 'room_id', 'status', 'check_in_date', 'check_out_date'),
+        # my_bookings: one user's bookings, newest first, read straight off the index.
+        db.Index('ix_booking_user_created', 'user_id', 'created_at'),
+        # The expiry sweep: pending bookings whose hold lapsed longest ago.
+        db.Index('ix_booking_status_hold_expires', 'status', 'hold_expires_at'),
+    )
 
     def __repr__(self):
         return f'<Booking {self.id} by User {self.user_id} for Room {self.room_id}>'
 
-class HostelDetails(db.Model):
+class PaymentEvent(db.Model):
+    """A queued payment confirmation: a Paystack webhook delivery or a verify request from the callback."""
+    id = db.Column(db.Integer, primary_key=True)
+    reference = db.Column(db.String(100), nullable=False, index=True)
+    event = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending | processing | processed | failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_payment_event_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<PaymentEvent {self.event} {self.reference} ({self.status})>'
+
+class BookingRollup(db.Model):
+    """Running totals of the bookings of one room, in one academic term, with one status."""
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'), primary_key=True)
+    term = db.Column(db.String(20), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    bookings = db.Column(db.Integer, default=0, nullable=False)
+    nights = db.Column(db.Integer, default=0, nullable=False)
+    amount = db.Column(db.Float, default=0.0, nullable=False)
+
+    def __repr__(self):
+        return f'<BookingRollup room {self.room_id} {self.term} {self.status}: {self.bookings}>'
+
+class DataMigration(db.Model):
+    """A one-off data change upgrade_schema has applied, so it never runs twice."""
+    name = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class ReplicationHeartbeat(db.Model):
+    """A single row rewritten on the primary, so its copy on the replica shows how far behind the replica is."""
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False)
+
+class CacheVersion(db.Model):
+    """A counter per cached dataset, bumped on the primary whenever the dataset changes."""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    bumped_at = db.Column(db.DateTime, nullable=False)
+
+class HostelDetails(JsonListMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     hostel_name = db.Column(db.String(100), nullable=False, default='Leemont Hostel')
     general_video_url = db.Column(db.Text, default='')
     general_images_json = db.Column(db.Text, default='[]')
+    general_image_renditions_json = db.Column(db.Text, default='[]')
     hostel_amenities_json = db.Column(db.Text, default='[]')
 
     def get_general_images(self):
-        return json.loads(self.general_images_json) if self.general_images_json else []
+        return self._get_json_list('general_images_json')
 
     def set_general_images(self, image_list):
-        self.general_images_json = json.dumps(image_list)
+        self._set_images('general_images_json', 'general_image_renditions_json', image_list)
+
+    def get_responsive_general_images(self):
+        return self._get_responsive_images('general_images_json', 'general_image_renditions_json')
 
     def get_hostel_amenities(self):
-        return json.loads(self.hostel_amenities_json) if self.hostel_amenities_json else []
+        return self._get_json_list('hostel_amenities_json')
 
     def set_hostel_amenities(self, amenity_list):
-        self.hostel_amenities_json = json.dumps(amenity_list)
+        self._set_json_list('hostel_amenities_json', amenity_list)
 
     def __repr__(self):
         return f'<HostelDetails {self.hostel_name}>'
 
 
 # --- Flask-Login User Loader ---
+# Each worker keeps a detached snapshot of recently seen users for USER_CACHE_SECONDS,
+# so a logged-in page view does not pay a query just to learn who is asking. Anything
+# that changes a password or is_admin calls forget_cached_users() after committing,
+# which bumps the 'users' version and empties the cache in every worker, on other hosts
+# within CACHE_VERSION_SECONDS.
+app.config['USER_CACHE_SECONDS'] = float(os.environ.get('USER_CACHE_SECONDS', 60))
+app.config['USER_CACHE_MAX_ENTRIES'] = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+_user_cache = {'version': None, 'users': {}}
+_user_cache_lock = threading.Lock()
+
+def forget_cached_users():
+    """Drops the cached users in every worker process, after a password or admin flag changed."""
+    bump_cache_version('users')
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """Returns the logged-in User, from the per-worker cache while it is fresh."""
+    user_id = int(user_id)
+    ttl = app.config['USER_CACHE_SECONDS']
+    if ttl <= 0:
+        return db.session.get(User, user_id)
+
+    version = get_cache_version('users')
+    now = time.monotonic()
+    if _user_cache['version'] == version:
+        cached = _user_cache['users'].get(user_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    db.session.expunge(user)
+    with _user_cache_lock:
+        users = _user_cache['users']
+        if _user_cache['version'] != version:
+            users = _user_cache['users'] = {}
+            _user_cache['version'] = version
+        if len(users) >= app.config['USER_CACHE_MAX_ENTRIES']:
+            for stale_id in [key for key, (_, expires_at) in users.items() if expires_at <= now]:
+                del users[stale_id]
+            while len(users) >= app.config['USER_CACHE_MAX_ENTRIES']:
+                del users[next(iter(users))]
+        users[user_id] = (user, now + ttl)
+    return user
+
+# --- Schema Migrations ---
+# create_all only creates missing tables. upgrade_schema also brings existing tables
+# up to the models by adding missing columns and indexes, which covers every schema
+# change this app makes (all additive). Run it with 'flask db upgrade'.
+#
+# One data change comes with it. Room.available_rooms used to count the units still free:
+# each approved booking took one for good. It now counts all of a room's units, and
+# availability subtracts the bookings for the dates asked about. Databases from before
+# that change (their booking table has no holds_inventory column) get each room's
+# approved bookings added back onto available_rooms once, recorded as a DataMigration.
+ROOM_UNITS_MIGRATION = 'room_units_count_all_units'
+
+def _needs_room_units_backfill(inspector, existing_tables):
+    if 'booking' not in existing_tables or 'room' not in existing_tables:
+        return False
+    if 'holds_inventory' in {column['name'] for column in inspector.get_columns('booking')}:
+        return False
+    if DataMigration.__tablename__ not in existing_tables:
+        return True
+    with db.engine.connect() as connection:
+        return connection.execute(db.select(DataMigration.name).where(
+            DataMigration.name == ROOM_UNITS_MIGRATION)).first() is None
+
+def _backfill_room_units(connection):
+    """Adds each room's approved bookings back onto available_rooms. Returns the bookings added back."""
+    booking, room = Booking.__table__, Room.__table__
+    approved = db.select(booking.c.room_id, db.func.count().label('approved')) \
+        .where(booking.c.status == 'approved').group_by(booking.c.room_id)
+    counted = 0
+    for room_id, count in connection.execute(approved).all():
+        connection.execute(db.update(room).where(room.c.id == room_id)
+                           .values(available_rooms=db.func.coalesce(room.c.available_rooms, 0) + count))
+        counted += count
+    return counted
+def _add_column_ddl(table, column, dialect):
+    preparer = dialect.identifier_preparer
+    ddl = f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} ' \
+          f'{column.type.compile(dialect=dialect)}'
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        # Existing rows take the model default, which also lets NOT NULL columns be added.
+        ddl += f' DEFAULT {column.type.literal_processor(dialect)(default)}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
+
+def upgrade_schema():
+    """Creates missing tables, columns and indexes. Returns a description of each change made."""
+    changes = []
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    if _needs_room_units_backfill(inspector, existing_tables):
+        # Before any column is added, in one transaction with its marker, so a crash either
+        # leaves the database untouched for the next run or fully migrated.
+        with db.engine.begin() as connection:
+            DataMigration.__table__.create(connection, checkfirst=True)
+            counted = _backfill_room_units(connection)
+            connection.execute(db.insert(DataMigration.__table__).values(
+                name=ROOM_UNITS_MIGRATION, applied_at=datetime.utcnow()))
+        existing_tables.add(DataMigration.__tablename__)
+        changes.append(f'added {counted} approved booking(s) back onto room units')
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                table.create(connection)
+                changes.append(f'created table {table.name}')
+                continue
+
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    connection.execute(db.text(_add_column_ddl(table, column, connection.dialect)))
+                    changes.append(f'added column {table.name}.{column.name}')
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    changes.append(f'created index {index.name}')
+    return changes
+
+def canonical_queries():
+    """The hot-path queries whose plans 'flask db explain' reports, as (name, Query) pairs."""
+    today = date.today()
+    return [
+        ('public rooms list', Room.query.filter_by(is_deleted=False).order_by(Room.id.asc())),
+        ('my_bookings', user_bookings_query(1, f'{datetime.utcnow().isoformat()}|1')
+            .limit(app.config['MY_BOOKINGS_PAGE_SIZE'] + 1)),
+        ('payment callback lookup', Booking.query.filter_by(payment_reference='reference')),
+        ('room availability', overlapping_stays_query(today, today + timedelta(days=120), [1])),
+        ('stale pending bookings', stale_bookings_query(datetime.utcnow()).limit(500)),
+        ('bookings export', bookings_export_query()),
+        ('payment events due', PaymentEvent.query.filter(
+            PaymentEvent.status == 'pending', PaymentEvent.next_attempt_at <= datetime.utcnow())
+            .order_by(PaymentEvent.id.asc())),
+    ]
+
+def explain_query(query):
+    """Returns the database's plan for a Query as a list of lines."""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    if db.engine.dialect.name == 'sqlite':
+        return [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+    return [row[0] for row in db.session.execute(db.text(f'EXPLAIN {sql}'))]
+
+@app.cli.group('db')
+def db_command():
+    """Schema maintenance for the configured DATABASE_URL."""
+
+@db_command.command('upgrade')
+def db_upgrade_command():
+    """Adds missing tables, columns and indexes to the database."""
+    changes = upgrade_schema()
+    for change in changes:
+        app.logger.info("Schema: %s.", change)
+    if not changes:
+        app.logger.info("Schema is up to date.")
+
+@db_command.command('explain')
+def db_explain_command():
+    """Prints the query plan of each canonical hot-path query."""
+    for name, query in canonical_queries():
+        click.echo(f"{name}:")
+        for line in explain_query(query):
+            click.echo(f"    {line}")
 
 # --- Database Initialization and Data Seeding ---
+# None of this runs at import time, so web workers boot without touching the schema or
+# hashing the admin password. Run 'flask init-db' once per deploy (the release phase in
+# the Procfile does this) before the new workers start.
 def initialize_database():
+    """Brings the schema up to date and seeds the default data."""
+    with app.app_context():
+        changes = upgrade_schema()
+        for change in changes:
+            app.logger.info("Schema: %s.", change)
+        if f'created table {BookingRollup.__tablename__}' in changes:
+            app.logger.info("Booking rollups built from %d existing booking(s).", rebuild_booking_rollups())
+        seed_database()
+
+def seed_database():
+    """Creates the default admin and hostel details if they are missing, and the rooms from ROOM_CATALOG_PATH."""
     with app.app_context():
-        db.create_all()
-
         admin_email = 'admin@leemonthostel.com'
         admin_user = User.query.filter_by(email=admin_email, is_admin=True).first()
         if not admin_user:
@@ -148,14 +577,17 @@ def initialize_database():
             admin_user.set_password(os.environ.get('ADMIN_PASSWORD', 'adminpass'))
             db.session.add(admin_user)
             db.session.commit()
-            print(f"Default admin user '{admin_email}' created.")
+            app.logger.info("Default admin user '%s' created.", admin_email)
         else:
-            print(f"Default admin user '{admin_email}' already exists.")
+            app.logger.info("Default admin user '%s' already exists.", admin_email)
             new_admin_password = os.environ.get('ADMIN_PASSWORD')
-            if new_admin_password and not admin_user.check_password(new_admin_password):
+            password_changed = new_admin_password and not admin_user.check_password(new_admin_password)
+            if password_changed:
                 admin_user.set_password(new_admin_password)
-                db.session.commit()
-                print(f"Admin user '{admin_email}' password updated from environment variable.")
+                app.logger.info("Admin user '%s' password updated from environment variable.", admin_email)
+            db.session.commit()
+            if password_changed:
+                forget_cached_users()
 
         hostel_details_entry = HostelDetails.query.first()
         if not hostel_details_entry:
@@ -180,89 +612,1446 @@ def initialize_database():
             ])
             db.session.add(hostel_details_entry)
             db.session.commit()
-            print("Default hostel details created.")
+            bump_cache_version('hostel_details')
+            app.logger.info("Default hostel details created.")
         else:
-            print("Hostel details already exist.")
+            app.logger.info("Hostel details already exist.")
 
         if not Room.query.first():
-            print("No rooms found, seeding initial room data...")
-            rooms_data = []
-            num_individual_rooms = 15
-            for i in range(1, num_individual_rooms + 1):
-                room_name = f"Room {i}"
-                if i % 2 != 0:
-                    capacity = 1
-                    price = 4800.00 + (i * 10)
-                    description = f"A comfortable single room (Room {i}) with a private bathroom and study desk, ideal for focused study."
-                    amenities = ["WiFi", "Private Toilet", "Single Bed", "Study Desk", "Wardrobe"]
-                else:
-                    capacity = 2
-                    price = 3200.00 + (i * 10)
-                    description = f"Spacious double room (Room {i}), perfect for sharing with a roommate, featuring two beds and ample storage."
-                    amenities = ["WiFi", "Shared Bathroom", "Two Beds", "Study Desk", "Wardrobe"]
-
-                room = Room(
-                    name=room_name,
-                    capacity=capacity,
-                    price_per_academic_year=round(price, 2),
-                    available_rooms=1,
-                    description=description,
-                    is_deleted=False
-                )
-                room.set_images([f"https://placehold.co/400x300/6c5ce7/ffffff?text=Room+{i}"])
-                room.set_videos([])
-                room.set_amenities(amenities)
-                db.session.add(room)
-            db.session.commit()
-            print("Initial room data seeded.")
+            app.logger.info("No rooms found, importing %s...", app.config['ROOM_CATALOG_PATH'])
+            with open(app.config['ROOM_CATALOG_PATH'], 'rb') as f:
+                summary = import_rooms(catalog_reader(f, catalog_format(app.config['ROOM_CATALOG_PATH'])))
+            for error in summary['errors']:
+                app.logger.warning("Room catalogue: %s", error)
+            app.logger.info("Initial room data seeded: %d rooms.", summary['created'])
         else:
-            print("Rooms already exist in DB, skipping initial room data seeding.")
+            app.logger.info("Rooms already exist in DB, skipping initial room data seeding.")
 
-with app.app_context():
+@app.cli.command('init-db')
+def init_db_command():
+    """Upgrades the schema and seeds default data. Run once per deploy, before web workers start."""
     initialize_database()
 
+@app.cli.command('seed')
+def seed_command():
+    """Seeds the default admin, hostel details and rooms without touching the schema."""
+    seed_database()
+
+@app.cli.command('derive-media')
+def derive_media_command():
+    """Re-derives image renditions for every room and the hostel details, e.g. after changing widths."""
+    for room in Room.query.all():
+        room.set_images(room.get_images())
+    hostel_details_entry = HostelDetails.query.first()
+    if hostel_details_entry:
+        hostel_details_entry.set_general_images(hostel_details_entry.get_general_images())
+    db.session.commit()
+    bump_cache_version('hostel_details')
+    bump_content_version()
+    app.logger.info("Image renditions derived.")
+
+@app.cli.command('build-static')
+def build_static_command():
+    """Writes fingerprinted, precompressed copies of the static files and their manifest, and image renditions."""
+    manifest = build_static(app.static_folder)
+    static_manifest.clear()
+    static_manifest.update(manifest)
+    app.logger.info("Built %d static assets.", len(manifest))
+    app.logger.info("Built renditions of %d image(s).", build_renditions(app.static_folder))
+
+# --- Room Catalogue Import and Export ---
+# The room catalogue moves in bulk as JSON (the data/rooms.json layout) or CSV. Imports
+# parse the file incrementally and upsert rooms by name, ROOM_IMPORT_BATCH_SIZE records
+# per bulk INSERT and bulk UPDATE. Both 'flask rooms import' and the admin upload do a
+# dry run first and apply nothing if any record is invalid. Exports stream from the
+# database, so neither direction holds the whole catalogue in memory.
+app.config['ROOM_CATALOG_PATH'] = os.environ.get('ROOM_CATALOG_PATH', os.path.join(app.root_path, 'data', 'rooms.json'))
+app.config['ROOM_IMPORT_BATCH_SIZE'] = int(os.environ.get('ROOM_IMPORT_BATCH_SIZE', 500))
+# How many per-room changes and errors an import summary lists.
+ROOM_IMPORT_REPORT_LIMIT = 50
+
+def _catalog_record(row):
+    """A Room row (or a row of its columns) as a catalogue record."""
+    videos = json.loads(row.videos_json) if row.videos_json else []
+    return {
+        'id': f'room_{row.id}',
+        'name': row.name,
+        'capacity': row.capacity,
+        'price_per_academic_year': row.price_per_academic_year,
+        'available_rooms': row.available_rooms or 0,
+        'description': row.description or '',
+        'amenities': json.loads(row.amenities_json) if row.amenities_json else [],
+        'images': json.loads(row.images_json) if row.images_json else [],
+        'video_url': videos[0] if videos else '',
+        'is_deleted': bool(row.is_deleted),
+    }
+
+_CATALOG_COLUMNS = (Room.id, Room.name, Room.capacity, Room.price_per_academic_year, Room.available_rooms,
+                    Room.description, Room.amenities_json, Room.images_json, Room.videos_json, Room.is_deleted)
+
+def catalog_rooms():
+    """Every room as a catalogue record in id order, fetched from the database in batches."""
+    query = db.session.query(*_CATALOG_COLUMNS).order_by(Room.id.asc()) \
+        .execution_options(yield_per=app.config['ROOM_IMPORT_BATCH_SIZE'])
+    for row in query:
+        yield _catalog_record(row)
+
+def catalog_hostel():
+    """The hostel details as the top-level keys of a JSON catalogue."""
+    hostel_details_entry = HostelDetails.query.first()
+    if not hostel_details_entry:
+        return {}
+    return {
+        'hostel_name': hostel_details_entry.hostel_name,
+        'general_video_url': hostel_details_entry.general_video_url or '',
+        'general_images': hostel_details_entry.get_general_images(),
+        'hostel_amenities': hostel_details_entry.get_hostel_amenities(),
+    }
+
+def catalog_chunks(fmt):
+    return csv_catalog_chunks(catalog_rooms()) if fmt == 'csv' else json_catalog_chunks(catalog_hostel(), catalog_rooms())
+
+def _room_columns(values, images_changed=True):
+    columns = {
+        'name': values['name'],
+        'capacity': values['capacity'],
+        'price_per_academic_year': values['price_per_academic_year'],
+        'available_rooms': values['available_rooms'],
+        'description': values['description'],
+        'amenities_json': json.dumps(values['amenities']),
+        'videos_json': json.dumps([values['video_url']] if values['video_url'] else []),
+        'is_deleted': values['is_deleted'],
+    }
+    if images_changed:
+        columns['images_json'] = json.dumps(values['images'])
+        columns['image_renditions_json'] = json.dumps([
+            derive_image(url, app.static_folder, app.config['MEDIA_CLOUDINARY_HOSTS']) for url in values['images']])
+    return columns
+
+def _upsert_room_batch(batch, dry_run, summary):
+    """Diffs a batch of validated records against the rooms of the same names, then bulk-writes the changes."""
+    existing = {}
+    names = list({values['name'] for values in batch})
+    # Descending ids, so the oldest room wins when several share a name.
+    for row in db.session.query(*_CATALOG_COLUMNS).filter(Room.name.in_(names)).order_by(Room.id.desc()):
+        existing[row.name] = row
+
+    creates, updates = [], []
+    for values in batch:
+        row = existing.get(values['name'])
+        if row is None:
+            creates.append(_room_columns(values))
+            change = {'action': 'create', 'name': values['name']}
+        else:
+            current = _catalog_record(row)
+            fields = [field for field, value in values.items() if current[field] != value]
+            if not fields:
+                summary['unchanged'] += 1
+                continue
+            updates.append(dict(_room_columns(values, 'images' in fields), id=row.id))
+            change = {'action': 'update', 'name': values['name'], 'fields': fields}
+        if len(summary['changes']) < ROOM_IMPORT_REPORT_LIMIT:
+            summary['changes'].append(change)
+    summary['created'] += len(creates)
+    summary['updated'] += len(updates)
+    if dry_run:
+        return
+    if creates:
+        db.session.execute(db.insert(Room), creates)
+    if updates:
+        db.session.execute(db.update(Room), updates)
+    db.session.commit()
+
+def import_rooms(records, dry_run=False, batch_size=None):
+    """Upserts catalogue records by room name in batches. Returns a summary; dry_run only computes it."""
+    batch_size = batch_size or app.config['ROOM_IMPORT_BATCH_SIZE']
+    summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': [], 'changes': []}
+    seen_names = set()
+    batch = []
+    records = iter(records)
+    number = 0
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except CatalogError as e:
+            summary['errors'].append(str(e))
+            break
+        number += 1
+        try:
+            values = room_values(record)
+            if values['name'] in seen_names:
+                raise CatalogError(f'Room "{values["name"]}" appears more than once.')
+        except CatalogError as e:
+            if len(summary['errors']) < ROOM_IMPORT_REPORT_LIMIT:
+                summary['errors'].append(f'Room {number}: {e}')
+            continue
+        seen_names.add(values['name'])
+        batch.append(values)
+        if len(batch) >= batch_size:
+            _upsert_room_batch(batch, dry_run, summary)
+            batch = []
+    if batch:
+        _upsert_room_batch(batch, dry_run, summary)
+    if not dry_run and (summary['created'] or summary['updated']):
+        bump_content_version()
+        bump_rooms_version()
+    return summary
+
+def _as_catalog_list(value):
+    return [str(item) for item in value] if isinstance(value, list) else []
+
+def import_hostel_details(hostel, dry_run=False):
+    """Applies the hostel keys of a JSON catalogue. Returns the names of the fields that changed."""
+    setters = {
+        'hostel_name': lambda entry, value: setattr(entry, 'hostel_name', str(value)),
+        'general_video_url': lambda entry, value: setattr(entry, 'general_video_url', str(value or '')),
+        'general_images': lambda entry, value: entry.set_general_images(_as_catalog_list(value)),
+        'hostel_amenities': lambda entry, value: entry.set_hostel_amenities(_as_catalog_list(value)),
+    }
+    current = catalog_hostel()
+    changed = [key for key in setters if key in hostel and hostel[key] != current.get(key)]
+    if dry_run or not changed:
+        return changed
+    hostel_details_entry = HostelDetails.query.first() or HostelDetails()
+    for key in changed:
+        setters[key](hostel_details_entry, hostel[key])
+    db.session.add(hostel_details_entry)
+    db.session.commit()
+    bump_cache_version('hostel_details')
+    bump_content_version()
+    return changed
+
+def import_catalog(stream, fmt='json', dry_run=False):
+    """Imports the rooms and, from JSON, the hostel details of a catalogue stream. Returns the summary."""
+    reader = catalog_reader(stream, fmt)
+    summary = import_rooms(reader, dry_run)
+    summary['hostel'] = import_hostel_details(reader.hostel, dry_run)
+    summary['dry_run'] = dry_run
+    return summary
+
+def import_catalog_checked(stream, fmt='json', dry_run=False):
+    """A dry run, then the real import only if it found no errors. The stream must be seekable."""
+    summary = import_catalog(stream, fmt, dry_run=True)
+    if dry_run or summary['errors']:
+        return summary
+    stream.seek(0)
+    return import_catalog(stream, fmt)
+
+@app.cli.group('rooms')
+def rooms_command():
+    """Bulk import and export of the room catalogue."""
+
+@rooms_command.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(CATALOG_FORMATS), help='Defaults to the file extension.')
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+def rooms_import_command(path, fmt, dry_run):
+    """Upserts rooms by name from a JSON or CSV catalogue, after a dry run finds no errors."""
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        summary = import_catalog_checked(f, fmt or catalog_format(path), dry_run)
+    for change in summary['changes']:
+        click.echo(f"{change['action']:6} {change['name']}" +
+                   (f" ({', '.join(change['fields'])})" if change.get('fields') else ''))
+    for error in summary['errors']:
+        click.echo(f"error  {error}", err=True)
+    verb = 'Would import' if summary['dry_run'] else 'Imported'
+    click.echo(f"{verb}: {summary['created']} created, {summary['updated']} updated, "
+               f"{summary['unchanged']} unchanged, hostel fields changed: {', '.join(summary['hostel']) or 'none'} "
+               f"({time.perf_counter() - started:.1f}s).")
+    if summary['errors']:
+        raise click.ClickException('The catalogue has errors; nothing was imported.')
+
+@rooms_command.command('export')
+@click.argument('path', default='-', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(CATALOG_FORMATS), help='Defaults to the file extension, or JSON.')
+def rooms_export_command(path, fmt):
+    """Writes every room (and, as JSON, the hostel details) to PATH or stdout."""
+    with click.open_file(path, 'w', encoding='utf-8') as f:
+        for chunk in catalog_chunks(fmt or catalog_format(path)):
+            f.write(chunk)
+
+# --- Cross-Process Cache Versions ---
+# Each cached dataset has a row in cache_version on the primary, bumped after the change
+# commits. Workers read every row in one query at most once per request and once per
+# CACHE_VERSION_SECONDS, so a change made on one host reaches the hostel, page and room
+# index caches on the others within that TTL; the worker that made it sees it at once.
+app.config['CACHE_VERSION_SECONDS'] = float(os.environ.get('CACHE_VERSION_SECONDS', 2))
+_cache_versions = {'snapshot': (0.0, {})}
+
+def _current_cache_versions():
+    if has_request_context() and 'cache_versions' in g:
+        return g.cache_versions
+    now = time.monotonic()
+    expires_at, versions = _cache_versions['snapshot']
+    if expires_at <= now:
+        # Always the primary: a lagging replica would hand back the old versions.
+        with db.engine.connect() as connection:
+            versions = {name: (version, bumped_at) for name, version, bumped_at in connection.execute(
+                db.select(CacheVersion.name, CacheVersion.version, CacheVersion.bumped_at))}
+        _cache_versions['snapshot'] = (now + app.config['CACHE_VERSION_SECONDS'], versions)
+    if has_request_context():
+        g.cache_versions = versions
+    return versions
+
+def get_cache_version(name):
+    """Returns (version, bumped_at) for a cached dataset, or None if it was never bumped."""
+    return _current_cache_versions().get(name)
+
+def bump_cache_version(name):
+    """Marks a cached dataset as stale in every worker process, on every host."""
+    now = datetime.utcnow()
+    bump = db.update(CacheVersion).where(CacheVersion.name == name) \
+        .values(version=CacheVersion.version + 1, bumped_at=now)
+    with db.engine.begin() as connection:
+        if not connection.execute(bump).rowcount:
+            try:
+                with connection.begin_nested():
+                    connection.execute(db.insert(CacheVersion).values(name=name, version=1, bumped_at=now))
+            except IntegrityError:
+                # Another process added the row first.
+                connection.execute(bump)
+    _cache_versions['snapshot'] = (0.0, {})
+    if has_request_context():
+        g.pop('cache_versions', None)
+
+# --- Hostel Details Cache ---
+# The HostelDetails row only changes when an admin saves edit_hostel_details, so each
+# worker keeps a detached snapshot and reloads it only when the version is bumped.
+_hostel_cache = {'version': None, 'hostel': None}
+_hostel_cache_lock = threading.Lock()
+
+def get_cached_hostel_details():
+    """Returns a detached HostelDetails snapshot, reloading it if an admin edit bumped the version."""
+    version = get_cache_version('hostel_details')
+    hostel = _hostel_cache['hostel']
+    if hostel is not None and _hostel_cache['version'] == version:
+        return hostel
+
+    with _hostel_cache_lock:
+        if _hostel_cache['hostel'] is not None and _hostel_cache['version'] == version:
+            return _hostel_cache['hostel']
+        hostel = HostelDetails.query.first()
+        if not hostel:
+            # Not seeded yet. Serve uncached defaults rather than seeding from a web worker.
+            app.logger.warning("No hostel details found. Run 'flask init-db' to seed the database.")
+            return HostelDetails(hostel_name='Leemont Hostel', general_video_url='')
+        db.session.expunge(hostel)
+        _hostel_cache['hostel'] = hostel
+        _hostel_cache['version'] = version
+        return hostel
+
+# --- Room Search Index ---
+# Amenity, capacity and price filters run against a per-worker inverted index of the
+# active rooms (see room_index.py). Room edits bump the 'rooms' version, and the next
+# search in each worker rebuilds the index from one column query.
+_room_index_cache = {'version': None, 'index': None}
+_room_index_lock = threading.Lock()
+
+def bump_rooms_version():
+    """Marks the room search index as stale in every worker process."""
+    bump_cache_version('rooms')
+
+def get_room_index():
+    """Returns the RoomSearchIndex for the active rooms, rebuilding it if rooms were edited."""
+    version = get_cache_version('rooms')
+    index = _room_index_cache['index']
+    if index is not None and _room_index_cache['version'] == version:
+        return index
+
+    with _room_index_lock:
+        if _room_index_cache['index'] is not None and _room_index_cache['version'] == version:
+            return _room_index_cache['index']
+        rows = db.session.query(Room.id, Room.capacity, Room.price_per_academic_year, Room.amenities_json) \
+            .filter(Room.is_deleted.is_(False)).all()
+        index = RoomSearchIndex(rows)
+        _room_index_cache['index'] = index
+        _room_index_cache['version'] = version
+        return index
+
+def room_search_filters(args):
+    """Reads ?amenity= (repeatable), ?capacity=, ?min_price= and ?max_price=. Raises ValueError."""
+    try:
+        return {
+            'amenities': [amenity for amenity in args.getlist('amenity') if amenity.strip()],
+            'capacity': int(args['capacity']) if args.get('capacity') else None,
+            'min_price': float(args['min_price']) if args.get('min_price') else None,
+            'max_price': float(args['max_price']) if args.get('max_price') else None,
+        }
+    except ValueError:
+        raise ValueError('capacity must be an integer; min_price and max_price must be numbers.')
+
+# --- Rendered Page Cache ---
+# Public pages are identical for every anonymous visitor, so their rendered HTML is
+# cached under the current content version. Admin edits bump the version, which makes
+# every older entry unreachable. The free units these pages show are keyed separately
+# on availability_version(): booking changes bump it, and it also rolls over every
+# AVAILABILITY_CACHE_SECONDS, because a payment hold that lapses changes availability
+# without any write to bump on.
+app.config['AVAILABILITY_CACHE_SECONDS'] = int(os.environ.get('AVAILABILITY_CACHE_SECONDS', 60))
+app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'memory')  # memory | filesystem | none
+app.config['PAGE_CACHE_MAX_ENTRIES'] = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 512))
+app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR', os.path.join(app.instance_path, 'page_cache'))
+page_cache = create_page_cache(app.config)
+
+def bump_content_version():
+    """Invalidates cached public pages after rooms or hostel details change."""
+    bump_cache_version('content')
+
+def bump_availability_version():
+    """Invalidates cached public pages after a booking changes the free units they show."""
+    bump_cache_version('availability')
+
+def bump_availability_for_stay(check_in, check_out):
+    """Bumps the availability version if a stay's change shows on the pages, i.e. it covers tonight.
+
+    Pages for other dates pick the change up when the availability slot rolls over.
+    """
+    if check_in <= date.today() < check_out:
+        bump_availability_version()
+
+def availability_version():
+    """The 'availability' version plus the current AVAILABILITY_CACHE_SECONDS slot."""
+    ttl = app.config['AVAILABILITY_CACHE_SECONDS']
+    return get_cache_version('availability'), int(time.time() // ttl) if ttl > 0 else 0
+
+def cached_page(view):
+    """Serves a public GET view from the page cache for anonymous visitors, with ETag/304 support."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Logged-in users see their own nav links, and pending flashes must render once.
+        if request.method != 'GET' or current_user.is_authenticated or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        # Availability shown on public pages is for tonight, so entries also roll over daily.
+        key = f"{get_cache_version('content')}|{get_cache_version('hostel_details')}|{availability_version()}|" \
+              f"{date.today()}|{request.full_path}"
+        entry = page_cache.get(key)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.modified:
+                return response
+            body = response.get_data()
+            entry = PageCacheEntry(body, response.mimetype, hashlib.sha1(body).hexdigest(), int(time.time()))
+            page_cache.set(key, entry)
+
+        response = app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        # Browsers may keep the page but must revalidate, and shared caches must not
+        # hand the anonymous variant to a logged-in user.
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    return wrapper
+
 @app.teardown_request
 def teardown_request(exception=None):
     db.session.remove()
 
 @app.before_request
 def load_hostel_details_for_request():
-    g.hostel = HostelDetails.query.first()
-    if not g.hostel:
-        initialize_database()
-        g.hostel = HostelDetails.query.first()
+    if request.endpoint == 'static':
+        return
+    g.hostel = get_cached_hostel_details()
+
+
+# --- Read Replica Routing ---
+# Views wrapped in reads_from_replica send their SELECTs to the replica (RoutingSession
+# in db_pool.py), unless the visitor wrote something recently, cached data was bumped
+# recently (a page or index built from a stale replica would be cached under the new
+# version), or the replica lags. reads_from_replica goes inside cached_page and
+# conditional_api, so cache hits and 304s never check the replica.
+# Lag is measured with a heartbeat row: the Procfile's heartbeat process (one instance,
+# `flask --app app replica-heartbeat`) writes the time to the primary every
+# REPLICA_HEARTBEAT_SECONDS, and the lag is the age of the copy on the replica. Web
+# workers only read it. Scale that process to one whenever DATABASE_REPLICA_URL is set:
+# without it the beat only ages and every read stays on the primary.
+# REPLICA_MAX_LAG_SECONDS must exceed the heartbeat interval.
+replica_lag_guard = ReplicaLagGuard(app.config['REPLICA_MAX_LAG_SECONDS'], app.config['REPLICA_LAG_CHECK_SECONDS'])
+
+def write_replication_heartbeat():
+    """Stamps the heartbeat row on the primary with the current time."""
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        updated = connection.execute(
+            db.update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == 1).values(beat_at=now)).rowcount
+        if not updated:
+            connection.execute(db.insert(ReplicationHeartbeat).values(id=1, beat_at=now))
+
+def measure_replica_lag():
+    """Age in seconds of the heartbeat the replica has, or None until it has one."""
+    with db.engines[REPLICA_BIND].connect() as connection:
+        replica_beat = connection.execute(
+            db.select(ReplicationHeartbeat.beat_at).where(ReplicationHeartbeat.id == 1)).scalar()
+    if replica_beat is None:
+        return None
+    return max((datetime.utcnow() - replica_beat).total_seconds(), 0.0)
+
+@app.cli.command('replica-heartbeat')
+def replica_heartbeat_command():
+    """Writes the replica-lag heartbeat every REPLICA_HEARTBEAT_SECONDS (the Procfile's heartbeat process)."""
+    if not app.config['DATABASE_REPLICA_URL'] or app.config['REPLICA_HEARTBEAT_SECONDS'] <= 0:
+        raise click.ClickException('Set DATABASE_REPLICA_URL and a positive REPLICA_HEARTBEAT_SECONDS.')
+    while True:
+        try:
+            write_replication_heartbeat()
+        except Exception:
+            app.logger.exception("Replica heartbeat error")
+        time.sleep(app.config['REPLICA_HEARTBEAT_SECONDS'])
+
+def _recently_bumped():
+    window = app.config['REPLICA_MAX_LAG_SECONDS'] + app.config['REPLICA_LAG_CHECK_SECONDS']
+    for name in ('content', 'rooms', 'hostel_details', 'availability'):
+        version = get_cache_version(name)
+        if version is not None and (datetime.utcnow() - version[1]).total_seconds() < window:
+            return True
+    return False
+
+def replica_readable():
+    """Whether this request may read from the replica."""
+    return (REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {})
+            and session.get('read_primary_until', 0) <= time.time()
+            and not _recently_bumped()
+            and replica_lag_guard.usable(measure_replica_lag))
+
+def reads_from_replica(view):
+    """Lets a public GET view read from the replica when replica_readable() allows it."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_replica = request.method == 'GET' and replica_readable()
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.after_request
+def remember_recent_write(response):
+    """Keeps a visitor who just wrote on the primary, so their next pages show the write."""
+    if g.get('db_wrote') and app.config['DATABASE_REPLICA_URL']:
+        session['read_primary_until'] = time.time() + app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+    return response
+
+# --- Room Availability ---
+# Room.available_rooms is the number of bookable units of a room. How many are free
+# depends on the dates: a unit is occupied by an approved booking, or by a pending one
+# whose payment hold has not expired, for each night between check-in and check-out.
+# A search fetches every overlapping stay with one indexed interval query and sweeps
+# the intervals in Python to find the busiest night per room.
+app.config['BOOKING_HOLD_MINUTES'] = int(os.environ.get('BOOKING_HOLD_MINUTES', 30))
+
+def _occupying_booking_filter():
+    now = datetime.utcnow()
+    return db.and_(
+        Booking.status.in_(('approved', 'pending_payment')),
+        db.or_(Booking.status == 'approved',
+               db.and_(Booking.holds_inventory.is_(True), Booking.hold_expires_at > now)),
+    )
+
+def overlapping_stays_query(check_in, check_out, room_ids=None, exclude_booking_id=None):
+    """The interval query behind every availability search, served by ix_booking_room_status_dates."""
+    query = db.session.query(Booking.room_id, Booking.check_in_date, Booking.check_out_date).filter(
+        Booking.check_in_date < check_out,
+        Booking.check_out_date > check_in,
+        _occupying_booking_filter(),
+    )
+    if room_ids is not None:
+        query = query.filter(Booking.room_id.in_(room_ids))
+    if exclude_booking_id is not None:
+        query = query.filter(Booking.id != exclude_booking_id)
+    return query
+
+def overlapping_stays(check_in, check_out, room_ids=None, exclude_booking_id=None):
+    """Returns {room_id: [(check_in, check_out), ...]} for occupying bookings that overlap [check_in, check_out)."""
+    stays = {}
+    for room_id, stay_in, stay_out in overlapping_stays_query(check_in, check_out, room_ids, exclude_booking_id):
+        stays.setdefault(room_id, []).append((stay_in, stay_out))
+    return stays
+
+def peak_occupancy(stays, check_in, check_out):
+    """The most stays that share a single night within [check_in, check_out)."""
+    changes = []
+    for stay_in, stay_out in stays:
+        changes.append((max(stay_in, check_in), 1))
+        changes.append((min(stay_out, check_out), -1))
+    # A check-out frees the unit for a check-in on the same day, so -1 sorts first.
+    changes.sort()
+    occupied = peak = 0
+    for _, change in changes:
+        occupied += change
+        peak = max(peak, occupied)
+    return peak
+
+def free_units(room_id, check_in, check_out, exclude_booking_id=None):
+    """Units of a room that are free for every night of [check_in, check_out)."""
+    units = db.session.query(Room.available_rooms).filter_by(id=room_id).scalar() or 0
+    stays = overlapping_stays(check_in, check_out, [room_id], exclude_booking_id).get(room_id, [])
+    return max(units - peak_occupancy(stays, check_in, check_out), 0)
+
+def annotate_free_units(rooms, check_in=None, check_out=None):
+    """Sets room.free_units on already loaded rooms (tonight by default) with one query. Returns the rooms."""
+    check_in = check_in or date.today()
+    check_out = check_out or check_in + timedelta(days=1)
+    stays = overlapping_stays(check_in, check_out, [room.id for room in rooms]) if rooms else {}
+    for room in rooms:
+        peak = peak_occupancy(stays.get(room.id, []), check_in, check_out)
+        room.free_units = max((room.available_rooms or 0) - peak, 0)
+    return rooms
+
+def rooms_free_between(check_in, check_out):
+    """Active rooms with at least one unit free for the whole of [check_in, check_out)."""
+    rooms = Room.query.filter_by(is_deleted=False).order_by(Room.id.asc()).all()
+    return [room for room in annotate_free_units(rooms, check_in, check_out) if room.free_units > 0]
+
+def lock_room(room_id):
+    """Takes the room's row lock until commit, serializing checkouts for that room. Caller commits."""
+    # A no-op UPDATE locks the row on PostgreSQL and takes the write lock on SQLite.
+    locked = Room.query.filter_by(id=room_id).update(
+        {Room.available_rooms: Room.available_rooms}, synchronize_session=False)
+    return locked == 1
+
+def hold_room_unit(room_id, check_in, check_out):
+    """Locks the room and checks a unit is free for the stay. Caller adds the pending booking and commits."""
+    return lock_room(room_id) and free_units(room_id, check_in, check_out) > 0
+
+def parse_stay_dates(args):
+    """Reads check_in/check_out (YYYY-MM-DD) from request args. Raises ValueError with a user-facing message."""
+    try:
+        check_in = datetime.strptime(args.get('check_in', ''), '%Y-%m-%d').date()
+        check_out = datetime.strptime(args.get('check_out', ''), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('check_in and check_out are required as YYYY-MM-DD.')
+    if check_in >= check_out:
+        raise ValueError('check_out must be after check_in.')
+    return check_in, check_out
+
+# --- Booking Rollups ---
+# Owner reports (occupancy per room, revenue per term, the payment funnel) read
+# BookingRollup, never the Booking table. Each status change (a new booking, a payment
+# result, an expiry) moves the booking's count, nights and price from its old
+# (room, term, status) row to the new one, in the transaction that changes the booking.
+# A booking counts in the academic term its check-in falls in; terms start on the first
+# of ACADEMIC_YEAR_START_MONTH. 'flask reports rebuild' recomputes every row from the
+# bookings, for bookings written some other way.
+app.config['ACADEMIC_YEAR_START_MONTH'] = int(os.environ.get('ACADEMIC_YEAR_START_MONTH', 8))
+app.config['BOOKING_EXPORT_BATCH_SIZE'] = int(os.environ.get('BOOKING_EXPORT_BATCH_SIZE', 1000))
+
+def _add_to_rollups(deltas):
+    """Adds {(room_id, term, status): [bookings, nights, amount]} onto the rollup rows, creating missing ones."""
+    if not deltas:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    table = BookingRollup.__table__
+    upsert = insert(table)
+    upsert = upsert.on_conflict_do_update(index_elements=[table.c.room_id, table.c.term, table.c.status], set_={
+        'bookings': table.c.bookings + upsert.excluded.bookings,
+        'nights': table.c.nights + upsert.excluded.nights,
+        'amount': table.c.amount + upsert.excluded.amount,
+    })
+    # Sorted, so concurrent transactions lock shared rows in the same order.
+    db.session.execute(upsert, [
+        {'room_id': room_id, 'term': term, 'status': status, 'bookings': bookings, 'nights': nights, 'amount': amount}
+        for (room_id, term, status), (bookings, nights, amount) in sorted(deltas.items())])
+
+def record_booking_transitions(stays, old_status, new_status):
+    """Moves (room_id, check_in, check_out, total_price) stays from old_status to new_status in the rollups.
+
+    Call it in the transaction that changes the bookings; old_status is None for new bookings.
+    """
+    _add_to_rollups(rollup_deltas(stays, old_status, new_status, app.config['ACADEMIC_YEAR_START_MONTH']))
+
+def rebuild_booking_rollups():
+    """Recomputes every rollup row in one streamed pass over the bookings. Returns the bookings counted."""
+    start_month = app.config['ACADEMIC_YEAR_START_MONTH']
+    stays = db.session.query(Booking.status, Booking.room_id, Booking.check_in_date, Booking.check_out_date,
+                             Booking.total_price) \
+        .execution_options(yield_per=app.config['BOOKING_EXPORT_BATCH_SIZE'])
+    totals, counted = {}, 0
+    for status, *stay in stays:
+        for key, delta in rollup_deltas([stay], None, status, start_month).items():
+            total = totals.setdefault(key, [0, 0, 0.0])
+            for i, value in enumerate(delta):
+                total[i] += value
+        counted += 1
+    db.session.query(BookingRollup).delete(synchronize_session=False)
+    _add_to_rollups(totals)
+    db.session.commit()
+    return counted
+
+def occupancy_report(term=None):
+    """Approved bookings and nights per room and term, against the nights the room's units had."""
+    start_month = app.config['ACADEMIC_YEAR_START_MONTH']
+    query = db.session.query(BookingRollup.room_id, Room.name, Room.available_rooms, BookingRollup.term,
+                             BookingRollup.bookings, BookingRollup.nights) \
+        .join(Room, BookingRollup.room_id == Room.id).filter(BookingRollup.status == 'approved')
+    if term:
+        query = query.filter(BookingRollup.term == term)
+    report = []
+    for room_id, name, units, row_term, bookings, nights in query.order_by(BookingRollup.term, BookingRollup.room_id):
+        term_start, term_end = term_bounds(row_term, start_month)
+        available = (units or 0) * (term_end - term_start).days
+        report.append({
+            'room_id': room_id, 'room_name': name, 'term': row_term, 'units': units or 0,
+            'approved_bookings': bookings, 'booked_nights': nights, 'available_nights': available,
+            'occupancy_percent': round(100 * nights / available, 1) if available else 0.0,
+        })
+    return report
+
+def revenue_report():
+    """Revenue per term: approved, still awaiting payment, and owed back as refunds."""
+    rows = db.session.query(BookingRollup.term, BookingRollup.status, db.func.sum(BookingRollup.bookings),
+                            db.func.sum(BookingRollup.amount)) \
+        .group_by(BookingRollup.term, BookingRollup.status).order_by(BookingRollup.term)
+    terms = {}
+    for term, status, bookings, amount in rows:
+        entry = terms.setdefault(term, {'term': term, 'approved_bookings': 0, 'revenue': 0.0,
+                                        'pending_amount': 0.0, 'refund_pending_amount': 0.0})
+        if status == 'approved':
+            entry['approved_bookings'] = bookings
+            entry['revenue'] = round(amount, 2)
+        elif status == 'pending_payment':
+            entry['pending_amount'] = round(amount, 2)
+        elif status == 'refund_pending':
+            entry['refund_pending_amount'] = round(amount, 2)
+    return list(terms.values())
+
+def funnel_report(term=None):
+    """Bookings per status (pending_payment -> approved, failed, expired or refund_pending)."""
+    query = db.session.query(BookingRollup.status, db.func.sum(BookingRollup.bookings)).group_by(BookingRollup.status)
+    if term:
+        query = query.filter(BookingRollup.term == term)
+    return funnel({status: count for status, count in query})
+
+def bookings_export_query():
+    """Every booking with its guest's email and room name, oldest first."""
+    return db.session.query(
+        Booking.id, Booking.created_at, Booking.status, Booking.user_id, User.email, Booking.room_id, Room.name,
+        Booking.check_in_date, Booking.check_out_date, Booking.total_price, Booking.payment_reference,
+    ).join(User, Booking.user_id == User.id).join(Room, Booking.room_id == Room.id).order_by(Booking.id)
+
+def bookings_csv_chunks():
+    """The bookings as CSV text, fetched BOOKING_EXPORT_BATCH_SIZE rows at a time.
+
+    yield_per streams the result (a server-side cursor on PostgreSQL), so only one batch of
+    rows is in memory however many bookings there are.
+    """
+    batch_size = app.config['BOOKING_EXPORT_BATCH_SIZE']
+    rows = bookings_export_query().execution_options(yield_per=batch_size)
+    return csv_chunks(((
+        row.id, row.created_at.isoformat(sep=' ', timespec='seconds') if row.created_at else '', row.status,
+        row.user_id, row.email, row.room_id, row.name, row.check_in_date.isoformat(), row.check_out_date.isoformat(),
+        (row.check_out_date - row.check_in_date).days, row.total_price, row.payment_reference or '',
+    ) for row in rows), BOOKING_EXPORT_FIELDS, rows_per_chunk=batch_size)
+
+@app.cli.group('reports')
+def reports_command():
+    """Booking report rollups."""
+
+@reports_command.command('rebuild')
+def reports_rebuild_command():
+    """Recomputes the booking rollups from the bookings. Run it while no bookings are changing."""
+    started = time.perf_counter()
+    counted = rebuild_booking_rollups()
+    click.echo(f'Rebuilt the booking rollups from {counted} bookings ({time.perf_counter() - started:.1f}s).')
+
+# --- Payment Processing ---
+# Payments are confirmed off the request path. The Paystack webhook and the browser
+# callback only record a PaymentEvent; a background worker verifies each one with
+# Paystack and applies the result to the booking exactly once. A transaction Paystack
+# has not settled yet (ongoing, pending, queued, ...) is verified again later with
+# backoff; only a status in PAYSTACK_FAILED_STATUSES fails the booking.
+app.config['PAYMENT_WORKER_MODE'] = os.environ.get('PAYMENT_WORKER_MODE', 'thread')  # thread | external
+app.config['PAYMENT_WORKER_POLL_SECONDS'] = float(os.environ.get('PAYMENT_WORKER_POLL_SECONDS', 5))
+app.config['PAYMENT_EVENT_MAX_ATTEMPTS'] = int(os.environ.get('PAYMENT_EVENT_MAX_ATTEMPTS', 8))
+# A 'processing' event older than this is assumed to belong to a crashed worker.
+PAYMENT_EVENT_CLAIM_TIMEOUT = timedelta(minutes=5)
+PAYSTACK_FAILED_STATUSES = ('failed', 'abandoned', 'reversed')
+
+_payment_events_ready = threading.Event()
+_payment_worker_lock = threading.Lock()
+_payment_worker_thread = None
+
+def verify_paystack_signature(body, signature):
+    """Checks the X-Paystack-Signature header: an HMAC-SHA512 of the raw body keyed with the secret key."""
+    if not signature:
+        return False
+    expected = hmac.new(PAYSTACK_SECRET_KEY.encode('utf-8'), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def enqueue_payment_event(reference, event, payload=None):
+    """Queues a payment reference for background verification unless one is already waiting."""
+    already_queued = PaymentEvent.query.filter(
+        PaymentEvent.reference == reference,
+        PaymentEvent.status.in_(('pending', 'processing')),
+    ).first()
+    if not already_queued:
+        db.session.add(PaymentEvent(reference=reference, event=event, payload=payload))
+        db.session.commit()
+    _wake_payment_worker()
+
+def apply_payment_result(reference, succeeded):
+    """Moves a pending booking to approved or failed. Repeated calls for the same reference are no-ops."""
+    booking = Booking.query.filter_by(payment_reference=reference).first()
+    if not booking:
+        return None
+
+    new_status = 'approved' if succeeded else 'failed'
+    holding = booking.status == 'pending_payment' and booking.holds_inventory \
+        and booking.hold_expires_at > datetime.utcnow()
+    if succeeded and not holding:
+        # The hold expired before the payment landed. Keep the stay only if a unit is
+        # still free for its dates, otherwise flag the payment for a refund.
+        lock_room(booking.room_id)
+        if free_units(booking.room_id, booking.check_in_date, booking.check_out_date,
+                      exclude_booking_id=booking.id) <= 0:
+            new_status = 'refund_pending'
+    # Conditional UPDATE so the webhook, the callback and a retried event cannot apply twice.
+    # A payment that lands after the booking expired or failed still counts, on the same
+    # terms as above.
+    payable = ('pending_payment', 'expired', 'failed') if succeeded else ('pending_payment',)
+    for old_status in payable:
+        updated = Booking.query.filter(Booking.id == booking.id, Booking.status == old_status).update(
+            {'status': new_status, 'holds_inventory': False}, synchronize_session=False)
+        if updated:
+            record_booking_transitions(
+                [(booking.room_id, booking.check_in_date, booking.check_out_date, booking.total_price)],
+                old_status, new_status)
+            break
+    db.session.commit()
+    # Paying for a held unit keeps it occupied; only a released hold or a late payment
+    # changes the free units.
+    if updated and holding != (new_status == 'approved'):
+        bump_availability_for_stay(booking.check_in_date, booking.check_out_date)
+    return booking
+
+def _retry_payment_event(event, error):
+    """Puts a claimed event back in the queue with backoff, or gives up after PAYMENT_EVENT_MAX_ATTEMPTS."""
+    event.last_error = error
+    if event.attempts >= app.config['PAYMENT_EVENT_MAX_ATTEMPTS']:
+        event.status = 'failed'
+    else:
+        event.status = 'pending'
+        event.next_attempt_at = datetime.utcnow() + timedelta(seconds=min(30 * 2 ** event.attempts, 3600))
+    db.session.commit()
+
+def process_payment_events(limit=50):
+    """Verifies and applies up to `limit` due payment events. Returns how many were handled."""
+    now = datetime.utcnow()
+    is_due = db.or_(
+        db.and_(PaymentEvent.status == 'pending', PaymentEvent.next_attempt_at <= now),
+        db.and_(PaymentEvent.status == 'processing',
+                PaymentEvent.next_attempt_at <= now - PAYMENT_EVENT_CLAIM_TIMEOUT),
+    )
+    due = PaymentEvent.query.filter(is_due).order_by(PaymentEvent.id.asc()).limit(limit) \
+        .with_entities(PaymentEvent.id).all()
+
+    handled = 0
+    for (event_id,) in due:
+        # Claim the event so concurrent workers never verify the same one twice.
+        claimed = PaymentEvent.query.filter(PaymentEvent.id == event_id, is_due).update(
+            {'status': 'processing', 'next_attempt_at': now}, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            continue
+
+        event = db.session.get(PaymentEvent, event_id)
+        event.attempts += 1
+        try:
+            transaction_status = paystack.verify_transaction(event.reference)['data']['status']
+        except PaystackError as e:
+            _retry_payment_event(event, str(e))
+            continue
+        if transaction_status != 'success' and transaction_status not in PAYSTACK_FAILED_STATUSES:
+            # Not settled yet: the booking keeps its hold until a later verify decides.
+            _retry_payment_event(event, f'Paystack transaction is {transaction_status}.')
+            continue
+
+        apply_payment_result(event.reference, transaction_status == 'success')
+        event = db.session.get(PaymentEvent, event_id)
+        event.status = 'processed'
+        event.processed_at = datetime.utcnow()
+        db.session.commit()
+        handled += 1
+    return handled
+
+def _run_payment_worker():
+    while True:
+        _payment_events_ready.wait(app.config['PAYMENT_WORKER_POLL_SECONDS'])
+        _payment_events_ready.clear()
+        with app.app_context():
+            try:
+                while process_payment_events():
+                    pass
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Payment worker error")
+            finally:
+                db.session.remove()
+
+def _start_payment_worker():
+    """Starts the in-process worker thread once per process; it drains whatever is already due first."""
+    global _payment_worker_thread
+    with _payment_worker_lock:
+        if _payment_worker_thread is None:
+            _payment_worker_thread = threading.Thread(target=_run_payment_worker, name='payment-worker', daemon=True)
+            _payment_worker_thread.start()
+            _payment_events_ready.set()
+
+def _wake_payment_worker():
+    """Signals the in-process worker thread that a new event was queued."""
+    if app.config['PAYMENT_WORKER_MODE'] != 'thread':
+        return
+    if _payment_worker_thread is None:
+        _start_payment_worker()
+    _payment_events_ready.set()
+
+@app.before_request
+def start_payment_worker():
+    """Starts the worker on the first request (after gunicorn forks), so events queued before a restart still run."""
+    if _payment_worker_thread is None and app.config['PAYMENT_WORKER_MODE'] == 'thread':
+        _start_payment_worker()
+
+@app.cli.command('process-payments')
+@click.option('--loop', is_flag=True, help='Keep polling instead of exiting once the queue is empty.')
+def process_payments_command(loop):
+    """Verifies queued Paystack payment events (use with PAYMENT_WORKER_MODE=external)."""
+    while True:
+        handled = process_payment_events()
+        if handled:
+            app.logger.info("Processed %d payment event(s).", handled)
+        elif not loop:
+            break
+        else:
+            time.sleep(app.config['PAYMENT_WORKER_POLL_SECONDS'])
+
+# --- Booking Expiry ---
+# A checkout that is never paid leaves its booking in pending_payment for good. A sweep
+# expires every pending booking whose hold lapsed more than BOOKING_EXPIRY_GRACE_MINUTES
+# ago and that has no payment confirmation still queued, in batches of conditional
+# UPDATEs. A payment that arrives later is still applied (see apply_payment_result).
+# BOOKING_EXPIRY_MODE=external (default) leaves the sweep to the Procfile's worker process,
+# one per deploy; 'thread' sweeps from a thread in each web worker every
+# BOOKING_EXPIRY_INTERVAL_SECONDS instead, for deploys without that process. Pick one:
+# running both only sweeps the same rows twice. A lapsed hold already stops counting
+# against availability, so expiring it changes no cached page.
+app.config['BOOKING_EXPIRY_MODE'] = os.environ.get('BOOKING_EXPIRY_MODE', 'external')  # external | thread
+app.config['BOOKING_EXPIRY_INTERVAL_SECONDS'] = float(os.environ.get('BOOKING_EXPIRY_INTERVAL_SECONDS', 300))
+app.config['BOOKING_EXPIRY_GRACE_MINUTES'] = int(os.environ.get('BOOKING_EXPIRY_GRACE_MINUTES', 60))
+app.config['BOOKING_EXPIRY_BATCH_SIZE'] = int(os.environ.get('BOOKING_EXPIRY_BATCH_SIZE', 500))
+
+_booking_sweeper_lock = threading.Lock()
+_booking_sweeper_thread = None
+
+def stale_bookings_query(cutoff):
+    """Pending bookings whose hold lapsed before cutoff and whose payment is not waiting to be verified."""
+    awaiting_verification = db.exists().where(
+        PaymentEvent.reference == Booking.payment_reference,
+        PaymentEvent.status.in_(('pending', 'processing')),
+    )
+    return db.session.query(Booking.id).filter(
+        Booking.status == 'pending_payment',
+        db.or_(Booking.hold_expires_at <= cutoff,
+               db.and_(Booking.hold_expires_at.is_(None), Booking.created_at <= cutoff)),
+        ~awaiting_verification,
+    ).order_by(Booking.hold_expires_at.asc())
+
+def expire_stale_bookings(batch_size=None):
+    """Marks abandoned checkouts expired and releases their holds. Returns (rows expired, batches run)."""
+    batch_size = batch_size or app.config['BOOKING_EXPIRY_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(minutes=app.config['BOOKING_EXPIRY_GRACE_MINUTES'])
+    expired = batches = 0
+    while True:
+        ids = [booking_id for (booking_id,) in stale_bookings_query(cutoff).limit(batch_size)]
+        if not ids:
+            break
+        # Re-checks the status, so a payment applied since the SELECT is never overwritten.
+        stays = db.session.execute(
+            db.update(Booking).where(Booking.id.in_(ids), Booking.status == 'pending_payment')
+            .values(status='expired', holds_inventory=False)
+            .returning(Booking.room_id, Booking.check_in_date, Booking.check_out_date, Booking.total_price),
+            execution_options={'synchronize_session': False}).all()
+        record_booking_transitions(stays, 'pending_payment', 'expired')
+        expired += len(stays)
+        db.session.commit()
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return expired, batches
+
+def run_booking_expiry():
+    """One sweep, reported to the log and to this process's metrics."""
+    started = time.perf_counter()
+    expired, batches = expire_stale_bookings()
+    seconds = time.perf_counter() - started
+    metrics.observe('background_job_duration_seconds', {'job': 'expire_bookings'}, seconds)
+    metrics.inc('background_job_rows_total', {'job': 'expire_bookings', 'action': 'expired'}, expired)
+    app.logger.log(logging.INFO if expired else logging.DEBUG, "Expired %d stale booking(s).", expired, extra={
+        'job': 'expire_bookings', 'rows': expired, 'batches': batches, 'duration_ms': round(seconds * 1000, 1)})
+    return expired
+
+def _run_booking_sweeper():
+    while True:
+        with app.app_context():
+            try:
+                run_booking_expiry()
+                if app.config['METRICS_DIR']:
+                    flush_metrics()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Booking expiry error")
+            finally:
+                db.session.remove()
+        time.sleep(app.config['BOOKING_EXPIRY_INTERVAL_SECONDS'])
 
+@app.before_request
+def start_booking_sweeper():
+    """Starts the in-process sweep thread on the first request (after gunicorn forks)."""
+    global _booking_sweeper_thread
+    if _booking_sweeper_thread is not None or app.config['BOOKING_EXPIRY_MODE'] != 'thread':
+        return
+    with _booking_sweeper_lock:
+        if _booking_sweeper_thread is None:
+            _booking_sweeper_thread = threading.Thread(target=_run_booking_sweeper, name='booking-sweeper', daemon=True)
+            _booking_sweeper_thread.start()
+
+@app.cli.command('expire-bookings')
+@click.option('--loop', is_flag=True, help='Sweep every BOOKING_EXPIRY_INTERVAL_SECONDS instead of once.')
+def expire_bookings_command(loop):
+    """Expires abandoned pending_payment bookings (the Procfile's worker runs it with --loop)."""
+    if not loop:
+        # Nothing is left to report to /metrics once a single run exits, so it writes no snapshot.
+        click.echo(f"Expired {run_booking_expiry()} stale booking(s).")
+        return
+    # The looping worker publishes a snapshot like a web worker, and deletes it when it stops,
+    # including on the SIGTERM a restart sends, so its series do not outlive the process.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            click.echo(f"Expired {run_booking_expiry()} stale booking(s).")
+            if app.config['METRICS_DIR']:
+                flush_metrics()
+            time.sleep(app.config['BOOKING_EXPIRY_INTERVAL_SECONDS'])
+    finally:
+        if app.config['METRICS_DIR']:
+            remove_snapshot(app.config['METRICS_DIR'], os.getpid())
+
+# --- Static Assets ---
+# Maps 'css/style.css' to its fingerprinted copy, e.g. 'dist/css/style.<hash>.css'.
+static_manifest = load_manifest(app.static_folder) if app.config['STATIC_FINGERPRINT'] else {}
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """Points url_for('static', filename=...) at the fingerprinted copy when one has been built."""
+    if endpoint == 'static' and values.get('filename') in static_manifest:
+        values['filename'] = static_manifest[values['filename']]
+
+def serve_static(filename):
+    """Serves a static file, preferring a precompressed variant the client accepts.
+
+    Fingerprinted files are cached for a year; everything else keeps Flask's revalidation.
+    """
+    variant = precompressed_variant(app.static_folder, filename, request.headers.get('Accept-Encoding', ''))
+    served = variant[1] if variant else filename
+    max_age = 31536000 if is_fingerprinted(filename) else None
+    if app.config['STATIC_HANDOFF'] == 'x-accel-redirect':
+        path = safe_join(app.static_folder, served)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        # nginx sends the file from its internal location; the worker only writes headers.
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = app.config['STATIC_ACCEL_PREFIX'] + quote(served)
+        response.mimetype = content_type(filename)
+    else:
+        response = send_from_directory(app.static_folder, served, mimetype=content_type(filename), max_age=max_age)
+    if variant:
+        response.headers['Content-Encoding'] = variant[0]
+    if is_compressible(filename):
+        response.vary.add('Accept-Encoding')
+    if max_age:
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+app.view_functions['static'] = serve_static
+
+# --- Request Metrics ---
+# Each worker records latency, SQL, template and Paystack timings per endpoint and writes
+# them to METRICS_DIR at most every METRICS_FLUSH_SECONDS. /metrics merges every worker's
+# file, so whichever worker answers a scrape reports the whole host; gunicorn.conf.py
+# deletes a worker's file when it exits, so its series drop out and the host's counters
+# reset as far as Prometheus is concerned. Of the CLI commands, only expire-bookings --loop
+# writes a file, and it deletes its own on exit. An empty METRICS_DIR keeps metrics per process. SLOW_REQUEST_MS > 0 logs slower requests with their SQL.
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR', os.path.join(app.instance_path, 'metrics'))
+app.config['METRICS_FLUSH_SECONDS'] = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 0))
+
+metrics = MetricsRegistry()
+_metrics_state = {'flushed_at': 0.0}
+
+def _request_stats():
+    return g.get('request_stats') if has_request_context() else None
+
+def _record_query(statement, seconds):
+    stats = _request_stats()
+    if stats is None:
+        # Background work: the payment worker thread and CLI commands.
+        metrics.inc('db_queries_total', {'endpoint': 'background'})
+        metrics.inc('db_query_seconds_total', {'endpoint': 'background'}, seconds)
+        return
+    stats['queries'] += 1
+    stats['query_seconds'] += seconds
+    if app.config['SLOW_REQUEST_MS']:
+        stats['statements'].append((statement, seconds))
+
+def _record_paystack_call(operation, seconds, outcome):
+    metrics.observe('paystack_request_duration_seconds', {'operation': operation, 'outcome': outcome}, seconds)
+    stats = _request_stats()
+    if stats is not None:
+        stats['paystack_seconds'] += seconds
+
+install_query_timing(Engine, _record_query)
+paystack.on_request = _record_paystack_call
+
+def flush_metrics():
+    """Writes this worker's metrics to METRICS_DIR for /metrics to merge."""
+    _metrics_state['flushed_at'] = time.monotonic()
+    try:
+        metrics.write_snapshot(app.config['METRICS_DIR'])
+    except OSError as e:
+        app.logger.warning("Could not write metrics: %s", e)
+
+@request_started.connect_via(app)
+def start_request_metrics(sender, **extra):
+    g.request_stats = {'started': time.perf_counter(), 'queries': 0, 'query_seconds': 0.0, 'statements': [],
+                       'template_started': [], 'template_seconds': 0.0, 'paystack_seconds': 0.0}
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None:
+        stats['template_started'].append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def stop_template_timer(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is None or not stats['template_started']:
+        return
+    seconds = time.perf_counter() - stats['template_started'].pop()
+    stats['template_seconds'] += seconds
+    metrics.observe('template_render_seconds',
+                    {'endpoint': request.endpoint or 'unmatched', 'template': template.name or 'string'}, seconds)
+
+@request_finished.connect_via(app)
+def finish_request_metrics(sender, response, **extra):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return
+    seconds = time.perf_counter() - stats['started']
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe('http_request_duration_seconds',
+                    {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)}, seconds)
+    metrics.observe('db_queries_per_request', {'endpoint': endpoint}, stats['queries'])
+    if stats['queries']:
+        metrics.inc('db_queries_total', {'endpoint': endpoint}, stats['queries'])
+        metrics.inc('db_query_seconds_total', {'endpoint': endpoint}, stats['query_seconds'])
+
+    slow_ms = app.config['SLOW_REQUEST_MS']
+    if slow_ms and seconds * 1000 >= slow_ms:
+        app.logger.warning("Slow request", extra={
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'duration_ms': round(seconds * 1000, 1),
+            'db_queries': stats['queries'],
+            'db_ms': round(stats['query_seconds'] * 1000, 1),
+            'template_ms': round(stats['template_seconds'] * 1000, 1),
+            'paystack_ms': round(stats['paystack_seconds'] * 1000, 1),
+            'queries': [{'ms': round(query_seconds * 1000, 2), 'sql': ' '.join(statement.split())[:500]}
+                        for statement, query_seconds in stats['statements']],
+        })
+
+    if app.config['METRICS_DIR'] and time.monotonic() - _metrics_state['flushed_at'] >= app.config['METRICS_FLUSH_SECONDS']:
+        flush_metrics()
+
+# --- Internal Endpoints ---
+
+def internal_only(view):
+    """Allows a request that carries INTERNAL_TOKEN in X-Internal-Token, or comes from a logged-in admin.
+
+    The token is also accepted as a Bearer token, which is how Prometheus sends credentials.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config['INTERNAL_TOKEN']
+        supplied = request.headers.get('X-Internal-Token') or request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if token and hmac.compare_digest(supplied, token):
+            return view(*args, **kwargs)
+        if current_user.is_authenticated and current_user.is_admin:
+            return view(*args, **kwargs)
+        return jsonify({'status': 'error', 'message': 'Not found.'}), 404
+    return wrapper
+
+@app.route('/internal/db-pool')
+@internal_only
+def db_pool_metrics():
+    """JSON: this worker's pool occupancy and checkout waits, the connection budget across workers, and replica lag."""
+    status = pool_status(db.engine)
+    if status['pool_class'] == 'MeteredQueuePool':
+        per_worker = status['size'] + app.config['DB_MAX_OVERFLOW']
+        status['max_connections_per_worker'] = per_worker
+        status['workers'] = app.config['WEB_CONCURRENCY']
+        status['max_connections_total'] = per_worker * app.config['WEB_CONCURRENCY']
+    if REPLICA_BIND in db.engines:
+        status['replica'] = dict(pool_status(db.engines[REPLICA_BIND]), **replica_lag_guard.status())
+    status['pid'] = os.getpid()
+    return jsonify(status)
+
+@app.route('/metrics')
+@internal_only
+def prometheus_metrics():
+    """Prometheus text format: request latency, SQL, template and Paystack metrics for every worker."""
+    if app.config['METRICS_DIR']:
+        flush_metrics()
+        snapshots = read_snapshots(app.config['METRICS_DIR'])
+    else:
+        snapshots = [metrics.snapshot()]
+    return app.response_class(render_prometheus(snapshots), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # --- Routes for Public Pages ---
 
 @app.route('/')
 @app.route('/home')
+@cached_page
+@reads_from_replica
 def home():
     """Renders the home page with general hostel info and some room highlights."""
-    active_rooms = Room.query.filter_by(is_deleted=False).order_by(Room.id.asc()).limit(3).all()
+    active_rooms = annotate_free_units(Room.query.filter_by(is_deleted=False).order_by(Room.id.asc()).limit(3).all())
     return render_template('home.html', hostel=g.hostel, featured_rooms=active_rooms)
 
 @app.route('/gallery')
+@cached_page
+@reads_from_replica
 def gallery():
     """Renders the gallery page showing all hostel images and videos."""
     rooms = Room.query.filter_by(is_deleted=False).order_by(Room.id.asc()).all()
     return render_template('gallery.html', hostel=g.hostel, rooms=rooms)
 
 @app.route('/rooms')
+@cached_page
+@reads_from_replica
 def rooms():
-    """Renders the rooms page displaying all available rooms with details."""
-    active_rooms = Room.query.filter_by(is_deleted=False).order_by(Room.id.asc()).all()
-    return render_template('rooms.html', rooms=active_rooms, hostel=g.hostel)
+    """Renders the rooms page, optionally filtered by ?amenity=, ?capacity=, ?min_price= and ?max_price=."""
+    room_index = get_room_index()
+    try:
+        filters = room_search_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        filters = room_search_filters(MultiDict())
+
+    query = Room.query.filter_by(is_deleted=False)
+    if any(value not in (None, []) for value in filters.values()):
+        query = query.filter(Room.id.in_(room_index.search(**filters)))
+    active_rooms = annotate_free_units(query.order_by(Room.id.asc()).all())
+    return render_template('rooms.html', rooms=active_rooms, hostel=g.hostel, filters=filters,
+                           amenity_options=room_index.amenities, capacity_options=room_index.capacities)
 
 @app.route('/room/<int:room_id>')
+@cached_page
+@reads_from_replica
 def room_detail(room_id):
     """Renders a detailed page for a specific room."""
     room = Room.query.get_or_404(room_id)
     if room.is_deleted and not (current_user.is_authenticated and current_user.is_admin):
         flash('This room is not available.', 'error')
         return redirect(url_for('rooms'))
+    annotate_free_units([room])
     return render_template('room_detail.html', room=room, hostel=g.hostel)
 
+@app.route('/api/rooms/<int:room_id>/availability')
+def room_availability(room_id):
+    """JSON: free units of one room for ?check_in=&check_out=, used by the booking form."""
+    room = Room.query.get_or_404(room_id)
+    try:
+        check_in, check_out = parse_stay_dates(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    units_free = 0 if room.is_deleted else free_units(room.id, check_in, check_out)
+    return jsonify({
+        'room_id': room.id,
+        'check_in': check_in.isoformat(),
+        'check_out': check_out.isoformat(),
+        'units': room.available_rooms,
+        'free_units': units_free,
+        'available': units_free > 0,
+    })
+
+@app.route('/api/availability')
+def availability_search():
+    """JSON: every active room with a unit free for the whole of ?check_in=&check_out=."""
+    try:
+        check_in, check_out = parse_stay_dates(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({
+        'check_in': check_in.isoformat(),
+        'check_out': check_out.isoformat(),
+        'rooms': [
+            {'room_id': room.id, 'name': room.name, 'units': room.available_rooms, 'free_units': room.free_units}
+            for room in rooms_free_between(check_in, check_out)
+        ],
+    })
+
+
+# --- Rooms JSON API ---
+# Read-only room data for the mobile client and partner sites. Rows are selected as
+# plain column tuples (only the requested fields) and serialized directly, and the
+# ETag is derived from the content version so a revalidation costs no query at all.
+app.config['ROOMS_API_PAGE_SIZE'] = int(os.environ.get('ROOMS_API_PAGE_SIZE', 20))
+app.config['ROOMS_API_MAX_PAGE_SIZE'] = int(os.environ.get('ROOMS_API_MAX_PAGE_SIZE', 100))
+
+ROOM_API_COLUMNS = {
+    'id': Room.id,
+    'name': Room.name,
+    'capacity': Room.capacity,
+    'price_per_academic_year': Room.price_per_academic_year,
+    'units': Room.available_rooms,
+    'description': Room.description,
+    'images': Room.images_json,
+    'videos': Room.videos_json,
+    'amenities': Room.amenities_json,
+}
+ROOM_API_JSON_LIST_FIELDS = {'images', 'videos', 'amenities'}
+# free_units is computed from bookings for the requested stay (tonight by default).
+ROOM_API_FIELDS = list(ROOM_API_COLUMNS) + ['free_units']
+
+def conditional_api(view):
+    """Answers If-None-Match with 304 before running a public JSON view, and tags 200 responses."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Room data changes only with the content version, availability with availability_version().
+        etag = hashlib.sha1(f"{get_cache_version('content')}|{availability_version()}|{date.today()}|"
+                            f"{request.full_path}".encode()).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+def _room_api_fields(args):
+    fields = [field.strip() for field in args.get('fields', '').split(',') if field.strip()] or ROOM_API_FIELDS
+    unknown = sorted(set(fields) - set(ROOM_API_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(ROOM_API_FIELDS)}.")
+    return fields
+
+def _int_arg(args, name, default=None):
+    """A whole-number query argument; raises ValueError rather than silently using the default."""
+    value = args.get(name, '')
+    if value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a whole number, got {value!r}.') from None
+
+def _room_api_stay(args):
+    if args.get('check_in') or args.get('check_out'):
+        return parse_stay_dates(args)
+    return date.today(), date.today() + timedelta(days=1)
+
+def _room_api_query(fields):
+    # id and units are always selected: they drive the cursor and free_units.
+    columns = [Room.id.label('id'), Room.available_rooms.label('units')]
+    columns += [ROOM_API_COLUMNS[field].label(field) for field in fields if field in ROOM_API_COLUMNS
+                and field not in ('id', 'units')]
+    return db.session.query(*columns).filter(Room.is_deleted.is_(False))
+
+def _serialize_room_row(row, fields, free):
+    data = {}
+    for field in fields:
+        if field == 'free_units':
+            data[field] = free
+        elif field in ROOM_API_JSON_LIST_FIELDS:
+            raw = getattr(row, field)
+            data[field] = json.loads(raw) if raw else []
+        else:
+            data[field] = getattr(row, field)
+    return data
+
+@app.route('/api/rooms')
+@conditional_api
+@reads_from_replica
+def rooms_api():
+    """JSON: active rooms in id order, filtered and paged with ?after=<next_cursor>&limit=.
+
+    ?fields= picks the returned fields. ?available=1 keeps only rooms with a free unit for
+    ?check_in=&check_out= (tonight if omitted), which is also the stay free_units is for.
+    """
+    try:
+        fields = _room_api_fields(request.args)
+        check_in, check_out = _room_api_stay(request.args)
+        filters = room_search_filters(request.args)
+        after = _int_arg(request.args, 'after')
+        limit = _int_arg(request.args, 'limit', app.config['ROOMS_API_PAGE_SIZE'])
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    limit = min(max(limit, 1), app.config['ROOMS_API_MAX_PAGE_SIZE'])
+    only_available = request.args.get('available') == '1'
+    needs_availability = only_available or 'free_units' in fields
+
+    # The search index yields every matching id in order; rows are fetched a batch at a
+    # time after the cursor. With ?available=1 rows get dropped, so keep going until full.
+    room_ids = get_room_index().search(**filters)
+    position = bisect.bisect_right(room_ids, after) if after is not None else 0
+    query = _room_api_query(fields)
+    results = []
+    while len(results) <= limit and position < len(room_ids):
+        batch_ids = room_ids[position:position + limit + 1]
+        position += len(batch_ids)
+        batch = query.filter(Room.id.in_(batch_ids)).order_by(Room.id.asc()).all()
+        stays = overlapping_stays(check_in, check_out, [row.id for row in batch]) \
+            if needs_availability and batch else {}
+        for row in batch:
+            free = max((row.units or 0) - peak_occupancy(stays.get(row.id, []), check_in, check_out), 0) \
+                if needs_availability else None
+            if not only_available or free > 0:
+                results.append((row, free))
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = results[-1][0].id
+    return jsonify({
+        'rooms': [_serialize_room_row(row, fields, free) for row, free in results],
+        'next_cursor': next_cursor,
+    })
+
+@app.route('/api/rooms/<int:room_id>')
+@conditional_api
+@reads_from_replica
+def room_api(room_id):
+    """JSON: one active room, with ?fields= and ?check_in=&check_out= as for /api/rooms."""
+    try:
+        fields = _room_api_fields(request.args)
+        check_in, check_out = _room_api_stay(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    row = _room_api_query(fields).filter(Room.id == room_id).first()
+    if row is None:
+        return jsonify({'status': 'error', 'message': 'Room not found.'}), 404
+    free = None
+    if 'free_units' in fields:
+        stays = overlapping_stays(check_in, check_out, [row.id]).get(row.id, [])
+        free = max((row.units or 0) - peak_occupancy(stays, check_in, check_out), 0)
+    return jsonify(_serialize_room_row(row, fields, free))
 
 @app.route('/book/<int:room_id>', methods=['GET', 'POST'])
 @login_required
@@ -276,6 +2065,7 @@ def book_room(room_id):
     if room.is_deleted:
         flash('This room is not available for booking.', 'error')
         return redirect(url_for('rooms'))
+    annotate_free_units([room])
 
     if request.method == 'POST':
         check_in_str = request.form.get('check_in_date')
@@ -301,8 +2091,9 @@ def book_room(room_id):
             flash('Check-in date cannot be in the past.', 'error')
             return render_template('book.html', room=room, hostel=g.hostel)
 
-        if room.available_rooms <= 0:
-            flash('Sorry, this room is currently fully booked.', 'error')
+        if not hold_room_unit(room.id, check_in, check_out):
+            db.session.rollback()
+            flash('Sorry, this room is fully booked for those dates.', 'error')
             return render_template('book.html', room=room, hostel=g.hostel)
 
         total_price = room.price_per_academic_year
@@ -316,17 +2107,18 @@ def book_room(room_id):
             check_out_date=check_out,
             total_price=total_price,
             status='pending_payment',
-            payment_reference=payment_reference
+            payment_reference=payment_reference,
+            holds_inventory=True,
+            hold_expires_at=datetime.utcnow() + timedelta(minutes=app.config['BOOKING_HOLD_MINUTES'])
         )
         db.session.add(new_booking)
-        db.session.commit()
+        db.session.flush()
+        record_booking_transitions([(room.id, check_in, check_out, total_price)], None, 'pending_payment')
 
         amount_pesewas = int(total_price * 100)
 
-        headers = {
-            "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
+        # Built before the commit expires the loaded rows, so nothing below reloads them and
+        # the Paystack call runs without a database connection checked out.
         payload = {
             "email": current_user.email,
             "amount": amount_pesewas,
@@ -338,11 +2130,12 @@ def book_room(room_id):
                 "user_id": current_user.id
             }
         }
+        # Committing the booking releases the room lock taken by hold_room_unit.
+        db.session.commit()
+        bump_availability_for_stay(check_in, check_out)
 
         try:
-            response = requests.post(PAYSTACK_INITIALIZE_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            paystack_data = response.json()
+            paystack_data = paystack.initialize_transaction(payload)
 
             if paystack_data['status'] and paystack_data['data']['authorization_url']:
                 return jsonify({
@@ -352,18 +2145,20 @@ def book_room(room_id):
                     'reference': payment_reference
                 })
             else:
-                db.session.rollback()
+                apply_payment_result(payment_reference, succeeded=False)
                 flash('Payment initialization failed. Please try again.', 'error')
                 return jsonify({'status': 'error', 'message': 'Payment initialization failed.'}), 500
 
-        except requests.exceptions.RequestException as e:
+        except PaystackError as e:
             db.session.rollback()
-            print(f"Paystack API error: {e}")
+            apply_payment_result(payment_reference, succeeded=False)
+            app.logger.warning("Paystack API error: %s", e, extra={'reference': payment_reference})
             flash('Could not connect to payment gateway. Please try again later.', 'error')
             return jsonify({'status': 'error', 'message': f'Payment gateway error: {e}'}), 500
         except Exception as e:
             db.session.rollback()
-            print(f"An unexpected error occurred: {e}")
+            apply_payment_result(payment_reference, succeeded=False)
+            app.logger.exception("Unexpected error during payment initialization", extra={'reference': payment_reference})
             flash('An unexpected error occurred during payment. Please try again.', 'error')
             return jsonify({'status': 'error', 'message': f'An unexpected error occurred: {e}'}), 500
 
@@ -372,57 +2167,55 @@ def book_room(room_id):
 
 @app.route('/paystack/callback')
 def paystack_payment_callback():
-    """Handles the redirect from Paystack after a payment attempt."""
+    """Handles the redirect from Paystack after a payment attempt.
+
+    Verification happens in the background (webhook or queued verify), so this is
+    only a status lookup and never waits on the gateway.
+    """
     reference = request.args.get('trxref') or request.args.get('reference')
 
     if not reference:
         flash('Payment reference not found. Payment could not be verified.', 'error')
         return redirect(url_for('payment_failure'))
 
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}"
-    }
+    booking = Booking.query.filter_by(payment_reference=reference).first()
+    if not booking:
+        flash('Payment received, but the associated booking was not found. Please contact support.', 'warning')
+        return redirect(url_for('payment_failure'))
 
-    try:
-        response = requests.get(f"{PAYSTACK_VERIFY_URL}{reference}", headers=headers)
-        response.raise_for_status()
-        paystack_data = response.json()
-
-        if paystack_data['status'] and paystack_data['data']['status'] == 'success':
-            booking = Booking.query.filter_by(payment_reference=reference).first()
-
-            if booking:
-                if booking.status == 'pending_payment':
-                    booking.status = 'approved'
-                    room = Room.query.get(booking.room_id)
-                    if room and room.available_rooms > 0:
-                        room.available_rooms -= 1
-                    db.session.commit()
-                    flash('Your booking has been successfully approved and confirmed!', 'success')
-                    return redirect(url_for('payment_success', booking_id=booking.id))
-                else:
-                    flash('Payment already processed for this booking.', 'info')
-                    return redirect(url_for('payment_success', booking_id=booking.id))
-            else:
-                flash('Payment successful, but associated booking not found. Please contact support.', 'warning')
-                return redirect(url_for('payment_failure'))
-        else:
-            booking = Booking.query.filter_by(payment_reference=reference).first()
-            if booking:
-                booking.status = 'failed'
-                db.session.commit()
-            flash('Your payment was not successful. Please try again.', 'error')
-            return redirect(url_for('payment_failure'))
-
-    except requests.exceptions.RequestException as e:
-        print(f"Paystack verification API error: {e}")
-        flash('Payment verification failed due to a network error. Please contact support.', 'error')
+    if booking.status == 'approved':
+        flash('Your booking has been successfully approved and confirmed!', 'success')
+        return redirect(url_for('payment_success', booking_id=booking.id))
+    if booking.status == 'failed':
+        flash('Your payment was not successful. Please try again.', 'error')
         return redirect(url_for('payment_failure'))
-    except Exception as e:
-        print(f"An unexpected error occurred during payment verification: {e}")
-        flash('An unexpected error occurred during payment verification. Please contact support.', 'error')
+    if booking.status == 'refund_pending':
+        flash('Your payment arrived after your reservation expired and the room is now full. '
+              'Please contact support for a refund.', 'warning')
         return redirect(url_for('payment_failure'))
 
+    enqueue_payment_event(reference, 'callback')
+    flash('Thank you! We are confirming your payment with Paystack. Your booking will update shortly.', 'info')
+    return redirect(url_for('my_bookings'))
+
+
+@app.route('/paystack/webhook', methods=['POST'])
+def paystack_webhook():
+    """Receives signed Paystack events, records charge.success for background verification and returns at once."""
+    body = request.get_data()
+    if not verify_paystack_signature(body, request.headers.get('X-Paystack-Signature')):
+        return jsonify({'status': 'error', 'message': 'Invalid signature.'}), 401
+
+    try:
+        event = json.loads(body)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid JSON payload.'}), 400
+
+    reference = (event.get('data') or {}).get('reference')
+    if event.get('event') == 'charge.success' and reference:
+        enqueue_payment_event(reference, 'charge.success', body.decode('utf-8'))
+    return jsonify({'status': 'success'}), 200
+
 
 @app.route('/payment/success')
 def payment_success():
@@ -439,6 +2232,26 @@ def payment_failure():
 
 # --- Routes for User Authentication ---
 
+HASHING_BUSY_MESSAGE = 'We are handling a lot of sign-ins right now. Please try again in a moment.'
+
+def check_login(user, email, password, invalid_message):
+    """Returns None if the password is right, else the (message, status) for the login form.
+
+    Emails and client IPs with too many recent failures are refused before any hashing.
+    """
+    wait = login_throttle.retry_after(email, request.remote_addr)
+    if wait:
+        return f'Too many failed sign-in attempts. Please try again in {math.ceil(wait / 60)} minute(s).', 429
+    try:
+        if user is not None and user.check_password(password):
+            login_throttle.reset(email)
+            db.session.commit()  # keeps a hash upgraded by check_password
+            return None
+    except PasswordHashingBusy:
+        return HASHING_BUSY_MESSAGE, 503
+    login_throttle.record_failure(email, request.remote_addr)
+    return invalid_message, 200
+
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     """Handles user registration."""
@@ -466,16 +2279,20 @@ def signup():
             return render_template('signup.html', hostel=g.hostel)
 
         new_user = User(email=email, is_admin=False)
-        new_user.set_password(password)
+        try:
+            new_user.set_password(password)
+        except PasswordHashingBusy:
+            flash(HASHING_BUSY_MESSAGE, 'error')
+            return render_template('signup.html', hostel=g.hostel), 503
 
         try:
             db.session.add(new_user)
             db.session.commit()
             flash('Account created successfully! Please log in.', 'success')
             return redirect(url_for('user_login'))
-        except Exception as e:
+        except Exception:
             db.session.rollback()
-            print(f"Database error during signup: {e}")
+            app.logger.exception("Database error during signup")
             flash('An error occurred during signup. Please try again.', 'error')
             return render_template('signup.html', hostel=g.hostel)
 
@@ -496,13 +2313,15 @@ def user_login():
 
         user = User.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
+        refusal = check_login(user, email, password, 'Invalid email or password.')
+        if refusal is None:
             login_user(user)
             flash('Logged in successfully!', 'success')
             next_page = request.args.get('next')
             return redirect(next_page or url_for('home'))
-        else:
-            flash('Invalid email or password.', 'error')
+        message, status = refusal
+        flash(message, 'error')
+        return render_template('login.html', hostel=g.hostel), status
 
     return render_template('login.html', hostel=g.hostel)
 
@@ -531,26 +2350,75 @@ def admin_login():
 
         admin_user = User.query.filter_by(email=email, is_admin=True).first()
 
-        if admin_user and admin_user.check_password(password):
+        refusal = check_login(admin_user, email, password, 'Invalid admin email or password.')
+        if refusal is None:
             login_user(admin_user)
             flash('Admin logged in successfully!', 'success')
             return redirect(url_for('admin_dashboard'))
-        else:
-            flash('Invalid admin email or password.', 'error')
+        message, status = refusal
+        flash(message, 'error')
+        return render_template('admin_login.html', hostel=g.hostel), status
     return render_template('admin_login.html', hostel=g.hostel)
 
 
+app.config['ADMIN_PAGE_SIZE'] = int(os.environ.get('ADMIN_PAGE_SIZE', 25))
+
+def keyset_page(query, key_column, cursor, page_size, descending=False):
+    """Returns (items, next_cursor) for the page after `cursor`, seeking on an indexed key instead of OFFSET."""
+    if cursor is not None:
+        query = query.filter(key_column < cursor if descending else key_column > cursor)
+    query = query.order_by(key_column.desc() if descending else key_column.asc())
+    items = query.limit(page_size + 1).all()
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    return items, getattr(items[-1], key_column.key)
+
+def dashboard_stats():
+    """Room and booking totals for the dashboard, from aggregate queries and the booking rollups."""
+    today = date.today()
+    active_rooms, total_units = db.session.query(
+        db.func.count(Room.id),
+        db.func.coalesce(db.func.sum(Room.available_rooms), 0),
+    ).filter(Room.is_deleted.is_(False)).one()
+
+    occupied_units = db.session.query(db.func.count(Booking.id)).filter(
+        _occupying_booking_filter(), Booking.check_in_date <= today, Booking.check_out_date > today).scalar()
+    pending_payments, approved_bookings, revenue = db.session.query(
+        db.func.coalesce(db.func.sum(db.case((BookingRollup.status == 'pending_payment', BookingRollup.bookings))), 0),
+        db.func.coalesce(db.func.sum(db.case((BookingRollup.status == 'approved', BookingRollup.bookings))), 0),
+        db.func.coalesce(db.func.sum(db.case((BookingRollup.status == 'approved', BookingRollup.amount))), 0),
+    ).one()
+
+    return {
+        'active_rooms': active_rooms,
+        'total_units': total_units,
+        'occupied_units': occupied_units,
+        'occupancy_percent': round(100 * occupied_units / total_units, 1) if total_units else 0.0,
+        'pending_payments': pending_payments,
+        'approved_bookings': approved_bookings,
+        'revenue': revenue,
+    }
+
 @app.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
-    """Renders the admin dashboard with an overview of rooms."""
+    """Renders the admin dashboard: totals, and keyset-paginated rooms and bookings."""
     if not current_user.is_admin:
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('home'))
 
-    rooms = Room.query.order_by(Room.id.asc()).all()
-    total_active_rooms = Room.query.filter_by(is_deleted=False).count()
-    return render_template('admin_dashboard.html', hostel=g.hostel, rooms=rooms, total_available=total_active_rooms)
+    page_size = app.config['ADMIN_PAGE_SIZE']
+    rooms, next_rooms_after = keyset_page(
+        Room.query, Room.id, request.args.get('rooms_after', type=int), page_size)
+    annotate_free_units(rooms)
+    # Room and user are loaded in the same query, so rendering a row never lazy-loads.
+    bookings, next_bookings_before = keyset_page(
+        Booking.query.options(joinedload(Booking.user), joinedload(Booking.room)),
+        Booking.id, request.args.get('bookings_before', type=int), page_size, descending=True)
+    return render_template('admin_dashboard.html', hostel=g.hostel, rooms=rooms, bookings=bookings,
+                           next_rooms_after=next_rooms_after, next_bookings_before=next_bookings_before,
+                           stats=dashboard_stats())
 
 @app.route('/admin/edit_room/<int:room_id>', methods=['GET', 'POST'])
 @login_required
@@ -586,6 +2454,8 @@ def edit_room(room_id):
         room.set_amenities([a.strip() for a in amenities_str.split(',') if a.strip()])
 
         db.session.commit()
+        bump_content_version()
+        bump_rooms_version()
         flash(f'Room {room.name} updated successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
 
@@ -635,6 +2505,8 @@ def add_room():
 
         db.session.add(new_room)
         db.session.commit()
+        bump_content_version()
+        bump_rooms_version()
         flash(f'New room "{name}" added successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
     return render_template('add_room.html', hostel=g.hostel)
@@ -650,6 +2522,8 @@ def delete_room(room_id):
     room = Room.query.get_or_404(room_id)
     room.is_deleted = True
     db.session.commit()
+    bump_content_version()
+    bump_rooms_version()
     flash(f'Room "{room.name}" marked as deleted.', 'success')
     return redirect(url_for('admin_dashboard'))
 
@@ -664,10 +2538,85 @@ def restore_room(room_id):
     room = Room.query.get_or_404(room_id)
     room.is_deleted = False
     db.session.commit()
+    bump_content_version()
+    bump_rooms_version()
     flash(f'Room "{room.name}" restored successfully!', 'success')
     return redirect(url_for('admin_dashboard'))
 
 
+@app.route('/admin/rooms/export')
+@login_required
+def export_rooms():
+    """Streams the room catalogue as a JSON or CSV download, one chunk per room or batch of rows."""
+    if not current_user.is_admin:
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('home'))
+
+    fmt = request.args.get('format', 'json')
+    if fmt not in CATALOG_FORMATS:
+        return jsonify({'status': 'error', 'message': 'format must be json or csv.'}), 400
+    response = app.response_class(stream_with_context(catalog_chunks(fmt)),
+                                  mimetype='text/csv' if fmt == 'csv' else 'application/json')
+    response.headers['Content-Disposition'] = f'attachment; filename=rooms.{fmt}'
+    return response
+
+@app.route('/admin/rooms/import', methods=['POST'])
+@login_required
+def import_rooms_upload():
+    """Dry-runs an uploaded JSON or CSV catalogue, and applies it when apply=1 and the dry run found no errors."""
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Admin privileges required.'}), 403
+
+    upload = request.files.get('catalog')
+    if not upload or not upload.filename:
+        return jsonify({'status': 'error', 'message': 'Choose a catalogue file to upload.'}), 400
+    fmt = request.form.get('format') or catalog_format(upload.filename)
+    if fmt not in CATALOG_FORMATS:
+        return jsonify({'status': 'error', 'message': 'format must be json or csv.'}), 400
+
+    # Werkzeug spools large uploads to a temporary file, which the parser reads a chunk at a time.
+    summary = import_catalog_checked(upload.stream, fmt, dry_run=request.form.get('apply') != '1')
+    if summary['errors']:
+        return jsonify(dict(summary, status='error', message='The catalogue has errors; nothing was imported.')), 400
+    return jsonify(dict(summary, status='success'))
+
+@app.route('/admin/reports/occupancy')
+@login_required
+def occupancy_report_json():
+    """JSON: approved nights against available nights per room and term (?term=2026/27 for one term)."""
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Admin privileges required.'}), 403
+    return jsonify({'rooms': occupancy_report(request.args.get('term'))})
+
+@app.route('/admin/reports/revenue')
+@login_required
+def revenue_report_json():
+    """JSON: approved revenue, pending amounts and refunds owed, per term."""
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Admin privileges required.'}), 403
+    return jsonify({'terms': revenue_report()})
+
+@app.route('/admin/reports/funnel')
+@login_required
+def funnel_report_json():
+    """JSON: bookings per payment status and the share of settled checkouts that paid (?term= for one term)."""
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Admin privileges required.'}), 403
+    return jsonify(funnel_report(request.args.get('term')))
+
+@app.route('/admin/bookings/export')
+@login_required
+@reads_from_replica
+def export_bookings():
+    """Streams every booking as a CSV download, one batch of rows per chunk."""
+    if not current_user.is_admin:
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('home'))
+
+    response = app.response_class(stream_with_context(bookings_csv_chunks()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename=bookings-{date.today().isoformat()}.csv'
+    return response
+
 @app.route('/admin/edit_hostel_details', methods=['GET', 'POST'])
 @login_required
 def edit_hostel_details():
@@ -676,9 +2625,9 @@ def edit_hostel_details():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('home'))
 
-    hostel_details_entry = g.hostel
-
     if request.method == 'POST':
+        # g.hostel is a shared, detached snapshot; edit a freshly loaded row instead.
+        hostel_details_entry = HostelDetails.query.first_or_404()
         hostel_details_entry.hostel_name = request.form.get('hostel_name')
 
         general_video_url_str = request.form.get('general_video_url', '')
@@ -691,25 +2640,83 @@ def edit_hostel_details():
         hostel_details_entry.set_hostel_amenities([a.strip() for a in hostel_amenities_str.split(',') if a.strip()])
 
         db.session.commit()
+        bump_cache_version('hostel_details')
+        bump_content_version()
         flash('Hostel details updated successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
 
-    return render_template('edit_hostel_details.html', hostel=hostel_details_entry)
+    return render_template('edit_hostel_details.html', hostel=g.hostel)
 
 # NEW: Route for My Bookings
+app.config['MY_BOOKINGS_PAGE_SIZE'] = int(os.environ.get('MY_BOOKINGS_PAGE_SIZE', 20))
+
+def user_bookings_query(user_id, cursor=None):
+    """A user's bookings after `cursor`, newest first, with only the displayed columns and the room name.
+
+    The cursor is '<created_at ISO>|<id>' of the last row shown; raises ValueError if malformed.
+    """
+    query = db.session.query(
+        Booking.id, Room.name.label('room_name'), Booking.check_in_date, Booking.check_out_date,
+        Booking.total_price, Booking.status, Booking.created_at,
+    ).join(Room, Booking.room_id == Room.id).filter(Booking.user_id == user_id)
+
+    if cursor:
+        created_at, _, booking_id = cursor.partition('|')
+        created_at, booking_id = datetime.fromisoformat(created_at), int(booking_id)
+        # created_at is not unique, so ties are broken on id.
+        query = query.filter(db.or_(
+            Booking.created_at < created_at,
+            db.and_(Booking.created_at == created_at, Booking.id < booking_id),
+        ))
+    return query.order_by(Booking.created_at.desc(), Booking.id.desc())
+
+def user_bookings_page(user_id, cursor=None):
+    """Returns (rows, next_cursor) for one page of a user's bookings, from a single joined query."""
+    page_size = app.config['MY_BOOKINGS_PAGE_SIZE']
+    rows = user_bookings_query(user_id, cursor).limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, f'{rows[-1].created_at.isoformat()}|{rows[-1].id}'
+
 @app.route('/my_bookings')
 @login_required
 def my_bookings():
-    """Displays a list of bookings for the currently logged-in user."""
+    """Displays the current user's bookings a page at a time (?before=<cursor> for older ones)."""
     # Ensure only regular users can view their bookings, not admins
     if current_user.is_admin:
         flash('Admin users do not have personal bookings.', 'info')
         return redirect(url_for('admin_dashboard'))
 
-    # Fetch bookings for the current user, ordered by creation date descending
-    user_bookings = Booking.query.filter_by(user_id=current_user.id).order_by(Booking.created_at.desc()).all()
-    return render_template('my_bookings.html', hostel=g.hostel, bookings=user_bookings)
+    try:
+        user_bookings, next_cursor = user_bookings_page(current_user.id, request.args.get('before'))
+    except ValueError:
+        abort(400)
+    return render_template('my_bookings.html', hostel=g.hostel, bookings=user_bookings, next_cursor=next_cursor)
+
+@app.route('/api/my_bookings')
+@login_required
+def my_bookings_json():
+    """JSON: a page of the current user's bookings, so My Bookings can load more rows in place."""
+    try:
+        rows, next_cursor = user_bookings_page(current_user.id, request.args.get('before'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid cursor.'}), 400
+    return jsonify({
+        'bookings': [{
+            'id': row.id,
+            'room_name': row.room_name,
+            'check_in_date': row.check_in_date.isoformat(),
+            'check_out_date': row.check_out_date.isoformat(),
+            'total_price': row.total_price,
+            'status': row.status,
+            'created_at': row.created_at.strftime('%Y-%m-%d %H:%M'),
+        } for row in rows],
+        'next_cursor': next_cursor,
+    })
 
 
 if __name__ == '__main__':
+    # The development server has no release phase, so prepare the database here.
+    initialize_database()
     app.run(debug=True)
\ No newline at end of file
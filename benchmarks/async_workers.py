@@ -0,0 +1,214 @@
+"""Concurrent bookings under gunicorn's sync workers vs gevent workers with the same worker count.
+
+Usage: python benchmarks/async_workers.py [--workers 2] [--clients 64] [--duration 15]
+           [--paystack-latency 0.3] [--worker-connections 100] [--modes sync,gevent]
+
+Seeds a throwaway SQLite database, starts the fake Paystack gateway and runs the app under
+real gunicorn (with gunicorn.conf.py) once per mode. --clients logged-in users then POST
+/book in a loop for --duration seconds. Prints bookings/s, latency, errors and the resident
+memory of the whole gunicorn process tree, sampled during the run. Exits non-zero if a
+mode fails requests or gevent does not sustain more bookings/s than sync.
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.booking_funnel import percentile  # noqa: E402
+from benchmarks.fake_paystack import start_fake_paystack  # noqa: E402
+
+PASSWORD = 'bench-password'
+# Cheap hashing, so logging the clients in does not dominate the run; this measures bookings.
+HASH_METHOD = 'pbkdf2:sha256:1000'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def tree_rss(pid):
+    """Resident memory in bytes of pid and all its descendants, read from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+def seed(database_url, workdir, clients, rooms):
+    os.environ.update(DATABASE_URL=database_url, METRICS_DIR=os.path.join(workdir, 'metrics'),
+                      PASSWORD_HASH_METHOD=HASH_METHOD)
+    import app as hostel_app
+    from app import db, Room, User
+    from werkzeug.security import generate_password_hash
+
+    hostel_app.initialize_database()
+    with hostel_app.app.app_context():
+        password_hash = generate_password_hash(PASSWORD, HASH_METHOD)
+        emails = [f'async-{n}-{uuid.uuid4().hex[:8]}@example.com' for n in range(clients)]
+        db.session.execute(db.insert(User), [
+            {'email': email, 'password_hash': password_hash, 'is_admin': False} for email in emails])
+        db.session.execute(db.insert(Room), [
+            {'name': f'Async Room {n}', 'capacity': 2, 'price_per_academic_year': 4000, 'available_rooms': 100000,
+             'description': 'async benchmark', 'images_json': '[]', 'image_renditions_json': '[]',
+             'videos_json': '[]', 'amenities_json': '[]', 'is_deleted': False} for n in range(rooms)])
+        db.session.commit()
+        room_ids = [room_id for (room_id,) in db.session.query(Room.id).filter(Room.name.like('Async Room %'))]
+        hostel_app.bump_rooms_version()
+        hostel_app.bump_content_version()
+    return emails, room_ids
+
+
+def start_gunicorn(mode, args, env):
+    port = free_port()
+    env = dict(env, GUNICORN_WORKER_CLASS=mode, WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_WORKER_CONNECTIONS=str(args.worker_connections), LOG_LEVEL='WARNING')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', 'app:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{base_url}/rooms', timeout=5).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'gunicorn ({mode}) did not start: {process.stderr.read().decode()[-2000:]}')
+
+
+def run_mode(mode, args, env, emails, room_ids):
+    process, base_url = start_gunicorn(mode, args, env)
+    try:
+        sessions = []
+        for email in emails:
+            session = requests.Session()
+            session.post(f'{base_url}/login', data={'email': email, 'password': PASSWORD}, allow_redirects=False)
+            sessions.append(session)
+        idle_rss = tree_rss(process.pid)
+
+        latencies, errors, peak_rss = [], [0], [idle_rss]
+        lock = threading.Lock()
+        stop_at = time.monotonic() + args.duration
+
+        def sample_memory():
+            while time.monotonic() < stop_at:
+                peak_rss[0] = max(peak_rss[0], tree_rss(process.pid))
+                time.sleep(0.5)
+
+        def client(session):
+            rng = random.Random()
+            while time.monotonic() < stop_at:
+                check_in = date.today() + timedelta(days=rng.randint(30, 700))
+                started = time.perf_counter()
+                try:
+                    response = session.post(f'{base_url}/book/{rng.choice(room_ids)}', timeout=60, data={
+                        'check_in_date': check_in.isoformat(),
+                        'check_out_date': (check_in + timedelta(days=rng.randint(30, 120))).isoformat(),
+                        'payment_method': 'mobile_money'}, allow_redirects=False)
+                    ok = response.status_code == 200 and response.json().get('status') == 'success'
+                except (requests.RequestException, ValueError):
+                    ok = False
+                with lock:
+                    if ok:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors[0] += 1
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+            list(pool.map(client, sessions))
+        elapsed = time.perf_counter() - started
+        sampler.join()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    latencies.sort()
+    return {
+        'bookings': len(latencies),
+        'errors': errors[0],
+        'rate': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else 0.0,
+        'p95_ms': percentile(latencies, 95) * 1000 if latencies else 0.0,
+        'idle_mib': idle_rss / 2 ** 20,
+        'peak_mib': peak_rss[0] / 2 ** 20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--paystack-latency', type=float, default=0.3)
+    parser.add_argument('--worker-connections', type=int, default=100)
+    parser.add_argument('--modes', default='sync,gevent')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    workdir = tempfile.mkdtemp(prefix='leemont-async-')
+    database_url = f'sqlite:///{os.path.join(workdir, "async.db")}'
+    paystack_server = start_fake_paystack(latency=args.paystack_latency)
+    emails, room_ids = seed(database_url, workdir, args.clients, args.rooms)
+    env = dict(os.environ, DATABASE_URL=database_url, METRICS_DIR=os.path.join(workdir, 'metrics'),
+               PASSWORD_HASH_METHOD=HASH_METHOD,
+               PAYSTACK_BASE_URL=f'http://127.0.0.1:{paystack_server.server_address[1]}',
+               FLASK_SECRET_KEY='async-benchmark', BOOKING_EXPIRY_MODE='external', PAYMENT_WORKER_MODE='external')
+
+    print(f'{args.clients} clients booking for {args.duration:.0f}s against {args.workers} workers, '
+          f'Paystack latency {args.paystack_latency * 1000:.0f} ms')
+    print(f'{"mode":8} {"bookings":>8} {"errors":>6} {"per s":>7} {"p50 ms":>8} {"p95 ms":>8} '
+          f'{"idle MiB":>9} {"peak MiB":>9}')
+    results = {}
+    for mode in args.modes.split(','):
+        row = results[mode] = run_mode(mode, args, env, emails, room_ids)
+        print(f'{mode:8} {row["bookings"]:8} {row["errors"]:6} {row["rate"]:7.1f} {row["p50_ms"]:8.1f} '
+              f'{row["p95_ms"]:8.1f} {row["idle_mib"]:9.1f} {row["peak_mib"]:9.1f}')
+    paystack_server.shutdown()
+
+    failed = [f'{mode}: {row["errors"]} failed bookings' for mode, row in results.items() if row['errors']]
+    if 'sync' in results and 'gevent' in results and results['gevent']['rate'] <= results['sync']['rate']:
+        failed.append('gevent workers did not sustain more bookings/s than sync workers')
+    for line in failed:
+        print(f'FAIL {line}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Times date-range availability searches against a throwaway SQLite database with many bookings.
+
+Usage: python benchmarks/availability.py [--rooms 200] [--bookings 100000] [--iterations 50]
+
+Compares the single interval query behind /api/availability with asking each room in
+turn, and prints SQLite's plan for the interval query.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from harness import load_app
+
+
+def timed(label, iterations, fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:32} {elapsed / iterations * 1000:8.2f} ms/search')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=100_000)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    hostel_app, _ = load_app()
+    from app import db, Booking, Room, User
+
+    rng = random.Random(7)
+    today = date.today()
+    with hostel_app.app.app_context():
+        user = User(email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        for i in range(args.rooms):
+            db.session.add(Room(name=f'Bench Room {i}', capacity=1 + i % 2, price_per_academic_year=3000 + i,
+                                available_rooms=rng.randint(1, 4), description='Benchmark room', is_deleted=False))
+        db.session.commit()
+        room_ids = [room_id for (room_id,) in db.session.query(Room.id).filter(Room.name.like('Bench Room %'))]
+
+        # Mostly historical stays over the last six years, plus some upcoming ones.
+        rows = []
+        for n in range(args.bookings):
+            check_in = today + timedelta(days=rng.randint(-6 * 365, 365))
+            rows.append({
+                'user_id': user.id,
+                'room_id': rng.choice(room_ids),
+                'check_in_date': check_in,
+                'check_out_date': check_in + timedelta(days=rng.randint(7, 240)),
+                'total_price': 3000,
+                'status': rng.choice(('approved', 'approved', 'failed', 'pending_payment', 'refund_pending')),
+                'payment_reference': f'bench-{n}',
+                'holds_inventory': False,
+                'created_at': datetime.utcnow(),
+            })
+        db.session.execute(db.insert(Booking), rows)
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+
+        check_in = today + timedelta(days=60)
+        check_out = check_in + timedelta(days=120)
+        print(f'{args.bookings} bookings across {len(room_ids)} rooms, searching {check_in} to {check_out}')
+
+        timed('all rooms, one interval query', args.iterations,
+              lambda: hostel_app.rooms_free_between(check_in, check_out))
+        timed('all rooms, one query per room', args.iterations,
+              lambda: [hostel_app.free_units(room_id, check_in, check_out) for room_id in room_ids])
+        timed('single room', args.iterations * 10,
+              lambda: hostel_app.free_units(room_ids[0], check_in, check_out))
+
+        print('Plan for the single-room interval query:')
+        for line in hostel_app.explain_query(hostel_app.overlapping_stays_query(check_in, check_out, room_ids[:1])):
+            print('   ', line)
+
+
+if __name__ == '__main__':
+    main()
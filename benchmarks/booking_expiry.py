@@ -0,0 +1,102 @@
+"""Times the stale booking sweep and checks it expires exactly the abandoned checkouts.
+
+Usage: python benchmarks/booking_expiry.py [--database-url URL] [--stale 50000] [--batch-size 500]
+
+Seeds pending bookings in four groups: abandoned long ago, lapsed within the grace period,
+still holding a unit, and abandoned but with a payment confirmation queued. Only the first
+group may expire, and expiring them must not bump a cache version, since a lapsed hold
+already stopped counting against availability. Then checks that a second sweep finds
+nothing and that a payment landing after expiry still approves the booking. Exits non-zero on any mismatch.
+"""
+import argparse
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from harness import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--stale', type=int, default=50000, help='abandoned checkouts to expire')
+    parser.add_argument('--others', type=int, default=1000, help='bookings in each group that must survive')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    hostel_app, _ = load_app('leemont-expiry-', args.database_url, BOOKING_EXPIRY_MODE='external',
+                             BOOKING_EXPIRY_BATCH_SIZE=args.batch_size)
+    from app import db, Booking, PaymentEvent, Room, User
+
+    now = datetime.utcnow()
+    grace = timedelta(minutes=hostel_app.app.config['BOOKING_EXPIRY_GRACE_MINUTES'])
+    check_in = date.today() + timedelta(days=30)
+    failures = []
+
+    with hostel_app.app.app_context():
+        room = Room(name='Expiry Room', capacity=1, price_per_academic_year=1000, available_rooms=5,
+                    description='expiry sweep', is_deleted=False)
+        user = User(email=f'expiry-{uuid.uuid4().hex}@example.com', password_hash='x')
+        db.session.add_all([room, user])
+        db.session.commit()
+
+        def rows(count, hold_expires_at, stay_from=check_in):
+            return [{'user_id': user.id, 'room_id': room.id, 'check_in_date': stay_from,
+                     'check_out_date': stay_from + timedelta(days=120), 'total_price': 1000,
+                     'status': 'pending_payment', 'payment_reference': str(uuid.uuid4()), 'created_at': now,
+                     'holds_inventory': True, 'hold_expires_at': hold_expires_at} for _ in range(count)]
+
+        stale = rows(args.stale, now - grace - timedelta(days=2))
+        # Live holds are for later dates, so the late payment below finds a unit free.
+        keep = rows(args.others, now - grace / 2) + rows(args.others, now + timedelta(minutes=20),
+                                                          check_in + timedelta(days=365))
+        queued = rows(args.others, now - grace - timedelta(days=2))
+        for start in range(0, len(stale), 5000):
+            db.session.execute(db.insert(Booking), stale[start:start + 5000])
+        db.session.execute(db.insert(Booking), keep + queued)
+        db.session.execute(db.insert(PaymentEvent), [
+            {'reference': row['payment_reference'], 'event': 'charge.success', 'status': 'pending',
+             'next_attempt_at': now + timedelta(hours=1)} for row in queued])
+        db.session.commit()
+
+        versions = {name: hostel_app.get_cache_version(name) for name in ('content', 'availability')}
+        started = time.perf_counter()
+        expired = hostel_app.run_booking_expiry()
+        elapsed = time.perf_counter() - started
+        print(f'expired {expired} of {args.stale + 3 * args.others} pending bookings in {elapsed * 1000:.0f} ms '
+              f'({expired / elapsed:,.0f} rows/s, batches of {args.batch_size})')
+
+        counts = dict(db.session.query(Booking.status, db.func.count()).group_by(Booking.status).all())
+        if expired != args.stale or counts.get('expired') != args.stale:
+            failures.append(f'expected {args.stale} expired, swept {expired}, table has {counts.get("expired")}')
+        if counts.get('pending_payment') != 3 * args.others:
+            failures.append(f'expected {3 * args.others} still pending, found {counts.get("pending_payment")}')
+        holding = Booking.query.filter_by(status='expired', holds_inventory=True).count()
+        if holding:
+            failures.append(f'{holding} expired bookings still hold inventory')
+        bumped = [name for name, version in versions.items() if hostel_app.get_cache_version(name) != version]
+        if bumped:
+            failures.append(f'the sweep bumped the {", ".join(bumped)} cache version')
+
+        started = time.perf_counter()
+        again = hostel_app.run_booking_expiry()
+        print(f'second sweep: {again} rows in {(time.perf_counter() - started) * 1000:.1f} ms')
+        if again:
+            failures.append(f'second sweep expired {again} more bookings')
+
+        # A late payment on an expired booking is kept while a unit is free for its dates.
+        hostel_app.apply_payment_result(stale[0]['payment_reference'], succeeded=True)
+        late = Booking.query.filter_by(payment_reference=stale[0]['payment_reference']).one().status
+        if late != 'approved':
+            failures.append(f'late payment left the expired booking {late}')
+
+    for line in failures:
+        print(f'FAIL {line}')
+    if not failures:
+        print('OK: only abandoned checkouts expired and late payments still apply.')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
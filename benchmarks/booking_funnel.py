@@ -0,0 +1,255 @@
+"""Load test of the booking funnel: browse, view a room, sign up, log in, book and return from Paystack.
+
+Usage: python benchmarks/booking_funnel.py [--database-url URL] [--users 500] [--rooms 100]
+           [--bookings 20000] [--virtual-users 8] [--iterations 5] [--paystack-latency 0.2]
+           [--json results.json] [--baseline previous.json] [--max-regression 0.25]
+
+Seeds a throwaway SQLite database (or --database-url, e.g. a local PostgreSQL), starts the fake
+Paystack gateway and serves the app over real HTTP on a threaded server. Each virtual user walks
+the funnel --iterations times. Prints p50/p95/p99 latency and throughput per route.
+
+--baseline compares p95 per route with an earlier --json run and exits non-zero when one got
+slower by more than --max-regression (and by at least --min-delta-ms), so a regression shows up
+in review. --seed-only seeds --database-url and exits; --target then drives an app that is
+already running against that database, e.g. under gunicorn.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.fake_paystack import start_fake_paystack  # noqa: E402
+
+PASSWORD = 'bench-password'
+
+
+class RouteStats:
+    """Latencies and errors per route name, shared by all virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, seconds, error):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.errors[route] += error
+
+    def summary(self, elapsed):
+        rows = {}
+        for route, samples in self.latencies.items():
+            samples = sorted(samples)
+            rows[route] = {
+                'requests': len(samples),
+                'errors': self.errors[route],
+                'rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 95) * 1000, 2),
+                'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            }
+        return rows
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(int(round(pct / 100 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+class VirtualUser:
+    """One browser: a cookie session that walks the funnel and times every request."""
+
+    def __init__(self, base_url, stats, rng):
+        self.base_url = base_url
+        self.stats = stats
+        self.rng = rng
+        self.session = requests.Session()
+
+    def request(self, route, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, allow_redirects=False, timeout=60, **kwargs)
+        except requests.RequestException:
+            self.stats.record(route, time.perf_counter() - start, True)
+            return None
+        self.stats.record(route, time.perf_counter() - start, response.status_code >= 500)
+        return response
+
+    def walk_funnel(self, room_ids):
+        self.session.cookies.clear()
+        self.request('GET /rooms', 'GET', '/rooms')
+        room_id = self.rng.choice(room_ids)
+        self.request('GET /room/<id>', 'GET', f'/room/{room_id}')
+
+        email = f'funnel-{uuid.uuid4().hex}@example.com'
+        self.request('POST /signup', 'POST', '/signup',
+                     data={'email': email, 'password': PASSWORD, 'confirm_password': PASSWORD})
+        self.request('POST /login', 'POST', '/login', data={'email': email, 'password': PASSWORD})
+
+        self.request('GET /book/<id>', 'GET', f'/book/{room_id}')
+        check_in = date.today() + timedelta(days=self.rng.randint(30, 300))
+        response = self.request('POST /book/<id>', 'POST', f'/book/{room_id}', data={
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=self.rng.randint(30, 120))).isoformat(),
+            'payment_method': 'mobile_money',
+        })
+        reference = None
+        if response is not None and response.headers.get('Content-Type', '').startswith('application/json'):
+            reference = response.json().get('reference')
+        if reference:
+            # Paystack redirects the browser back here once the customer has paid.
+            self.request('GET /paystack/callback', 'GET', f'/paystack/callback?reference={reference}')
+        self.request('GET /my_bookings', 'GET', '/my_bookings')
+        self.request('GET /logout', 'GET', '/logout')
+
+
+def seed(hostel_app, users, rooms, bookings, rng):
+    """Bulk-inserts users, rooms and past bookings so queries run against realistic table sizes."""
+    from app import db, Booking, Room, User
+    from werkzeug.security import generate_password_hash
+
+    with hostel_app.app.app_context():
+        # One hash shared by every seeded user; hashing each would dominate seeding time.
+        password_hash = generate_password_hash(PASSWORD)
+        db.session.execute(db.insert(User), [
+            {'email': f'seed-{n}-{uuid.uuid4().hex[:8]}@example.com', 'password_hash': password_hash,
+             'is_admin': False} for n in range(users)])
+        amenities = ['WiFi', 'Private Toilet', 'Study Desk', 'Wardrobe', 'Fan', 'Air Conditioning']
+        db.session.execute(db.insert(Room), [
+            {'name': f'Funnel Room {n}', 'capacity': rng.randint(1, 4),
+             'price_per_academic_year': rng.randrange(2000, 8000, 50), 'available_rooms': rng.randint(20, 60),
+             'description': 'Load test room', 'images_json': '[]', 'image_renditions_json': '[]',
+             'videos_json': '[]', 'amenities_json': json.dumps(rng.sample(amenities, 3)), 'is_deleted': False}
+            for n in range(rooms)])
+        db.session.commit()
+
+        user_ids = [row[0] for row in db.session.query(User.id).filter(User.is_admin.is_(False))]
+        room_rows = db.session.query(Room.id, Room.price_per_academic_year).all()
+        today = date.today()
+        rows = []
+        for _ in range(bookings):
+            room_id, price = rng.choice(room_rows)
+            # History from earlier years, so the funnel's future stays are not sold out.
+            check_in = today - timedelta(days=rng.randint(200, 1500))
+            created_at = datetime.combine(check_in, datetime.min.time()) - timedelta(days=rng.randint(1, 60))
+            rows.append({'user_id': rng.choice(user_ids), 'room_id': room_id, 'check_in_date': check_in,
+                         'check_out_date': check_in + timedelta(days=rng.randint(30, 180)), 'total_price': price,
+                         'status': rng.choice(['approved', 'approved', 'approved', 'failed', 'cancelled']),
+                         'payment_reference': str(uuid.uuid4()), 'created_at': created_at,
+                         'holds_inventory': False})
+        for start in range(0, len(rows), 5000):
+            db.session.execute(db.insert(Booking), rows[start:start + 5000])
+        db.session.commit()
+        hostel_app.bump_rooms_version()
+        hostel_app.bump_content_version()
+
+
+def compare_with_baseline(results, baseline, max_regression, min_delta_ms):
+    regressions = []
+    for route, row in sorted(results.items()):
+        before = baseline.get(route)
+        if not before:
+            continue
+        delta = row['p95_ms'] - before['p95_ms']
+        if delta >= min_delta_ms and row['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append(f'{route}: p95 {before["p95_ms"]:.1f} ms -> {row["p95_ms"]:.1f} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--rooms', type=int, default=100)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--virtual-users', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=5, help='funnel walks per virtual user')
+    parser.add_argument('--paystack-latency', type=float, default=0.2)
+    parser.add_argument('--random-seed', type=int, default=7)
+    parser.add_argument('--json', help='write the per-route results to this file')
+    parser.add_argument('--baseline', help='an earlier --json file to compare p95 latencies with')
+    parser.add_argument('--max-regression', type=float, default=0.25, help='allowed p95 slowdown, as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='ignore p95 slowdowns smaller than this')
+    parser.add_argument('--seed-only', action='store_true', help='seed --database-url and exit')
+    parser.add_argument('--target', help='base URL of an app already running against a seeded database')
+    args = parser.parse_args()
+    if args.seed_only and not args.database_url:
+        parser.error('--seed-only needs --database-url')
+    rng = random.Random(args.random_seed)
+
+    paystack_server = None
+    if args.target:
+        base_url = args.target.rstrip('/')
+    else:
+        workdir = tempfile.mkdtemp(prefix='leemont-funnel-')
+        os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(workdir, "funnel.db")}'
+        os.environ['METRICS_DIR'] = os.path.join(workdir, 'metrics')
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        paystack_server = start_fake_paystack(latency=args.paystack_latency)
+        os.environ['PAYSTACK_BASE_URL'] = f'http://127.0.0.1:{paystack_server.server_address[1]}'
+        import app as hostel_app
+        hostel_app.initialize_database()
+        started = time.perf_counter()
+        seed(hostel_app, args.users, args.rooms, args.bookings, rng)
+        print(f'seeded {args.users} users, {args.rooms} rooms, {args.bookings} bookings '
+              f'in {time.perf_counter() - started:.1f}s ({os.environ["DATABASE_URL"].split(":")[0]})')
+        if args.seed_only:
+            return 0
+
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        server = make_server('127.0.0.1', 0, hostel_app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+    room_ids = [room['id'] for room in requests.get(f'{base_url}/api/rooms?fields=id&limit=100').json()['rooms']]
+    stats = RouteStats()
+    virtual_users = [VirtualUser(base_url, stats, random.Random(rng.random())) for _ in range(args.virtual_users)]
+
+    def run(user):
+        for _ in range(args.iterations):
+            user.walk_funnel(room_ids)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.virtual_users) as pool:
+        list(pool.map(run, virtual_users))
+    elapsed = time.perf_counter() - started
+    results = stats.summary(elapsed)
+
+    print(f'{args.virtual_users} virtual users x {args.iterations} funnels in {elapsed:.1f}s, '
+          f'Paystack latency {args.paystack_latency * 1000:.0f} ms')
+    print(f'{"route":22} {"requests":>8} {"errors":>6} {"req/s":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for route, row in results.items():
+        print(f'{route:22} {row["requests"]:8} {row["errors"]:6} {row["rps"]:7.1f} '
+              f'{row["p50_ms"]:8.1f} {row["p95_ms"]:8.1f} {row["p99_ms"]:8.1f}')
+    if paystack_server:
+        paystack_server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = [f'{route}: {row["errors"]} errors' for route, row in results.items() if row['errors']]
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed += compare_with_baseline(results, json.load(f), args.max_regression, args.min_delta_ms)
+    for line in failed:
+        print(f'FAIL {line}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
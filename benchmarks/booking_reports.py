@@ -0,0 +1,207 @@
+"""Checks the booking rollups against the bookings and streams a large bookings CSV export.
+
+Usage: python benchmarks/booking_reports.py [--database-url URL] [--bookings 300] [--export-rows 1000000]
+
+Books rooms through /book against the fake Paystack gateway, then settles the bookings
+through the same paths production uses: approved and failed payments, the expiry sweep,
+and a payment that lands after its booking expired. The rollups kept along the way must
+equal a rebuild from the bookings, the report endpoints must not read the booking table,
+and the dashboard totals must match a scan. Then bulk-inserts --export-rows bookings,
+streams /admin/bookings/export and reports its throughput and the process's resident
+memory growth during the download. Exits non-zero on any mismatch.
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.fake_paystack import start_fake_paystack  # noqa: E402
+from benchmarks.harness import load_app  # noqa: E402
+
+ADMIN_PASSWORD = 'bench-admin-password'
+
+
+def rss_bytes():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--bookings', type=int, default=300, help='bookings made through /book')
+    parser.add_argument('--export-rows', type=int, default=1000000, help='bookings in the export step')
+    args = parser.parse_args()
+
+    paystack_server = start_fake_paystack()
+    hostel_app, _ = load_app(
+        'leemont-reports-', args.database_url,
+        PAYSTACK_BASE_URL=f'http://127.0.0.1:{paystack_server.server_address[1]}',
+        ADMIN_PASSWORD=ADMIN_PASSWORD,
+        BOOKING_EXPIRY_MODE='external',
+        PAYMENT_WORKER_MODE='external',
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+    )
+    from app import db, Booking, BookingRollup, Room, User
+    failures = []
+
+    with hostel_app.app.app_context():
+        guest_email = f'reports-{uuid.uuid4().hex[:8]}@example.com'
+        guest = User(email=guest_email)
+        guest.set_password('guest-password')
+        db.session.add(guest)
+        db.session.commit()
+        guest_id = guest.id
+        room_ids = [room_id for (room_id,) in db.session.query(Room.id).filter(Room.is_deleted.is_(False))]
+        db.session.query(Room).update({'available_rooms': 1000}, synchronize_session=False)
+        db.session.commit()
+
+    guest_client = hostel_app.app.test_client()
+    guest_client.post('/login', data={'email': guest_email, 'password': 'guest-password'})
+    rng = random.Random(25)
+    started = time.perf_counter()
+    for _ in range(args.bookings):
+        # Check-ins either side of August exercise the academic term boundary.
+        check_in = date.today() + timedelta(days=rng.randint(1, 700))
+        response = guest_client.post(f'/book/{rng.choice(room_ids)}', data={
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=rng.randint(30, 300))).isoformat(),
+            'payment_method': 'mobile_money'})
+        if response.status_code != 200 or response.get_json().get('status') != 'success':
+            failures.append(f'/book answered {response.status_code}')
+            break
+    booking_seconds = time.perf_counter() - started
+
+    with hostel_app.app.app_context():
+        references = [reference for (reference,) in db.session.query(Booking.payment_reference)
+                      .filter(Booking.user_id == guest_id).order_by(Booking.id)]
+        third = len(references) // 3
+        for reference in references[:third]:
+            hostel_app.apply_payment_result(reference, succeeded=True)
+        for reference in references[third:2 * third]:
+            hostel_app.apply_payment_result(reference, succeeded=False)
+        # The rest are abandoned: their holds lapsed long ago, so the sweep expires them.
+        db.session.query(Booking).filter(Booking.payment_reference.in_(references[2 * third:])).update(
+            {'hold_expires_at': datetime.utcnow() - timedelta(days=1)}, synchronize_session=False)
+        db.session.commit()
+        expired = hostel_app.expire_stale_bookings()[0]
+        # A payment for an expired booking still lands.
+        hostel_app.apply_payment_result(references[-1], succeeded=True)
+        # Repeated results must not count twice.
+        hostel_app.apply_payment_result(references[0], succeeded=True)
+        hostel_app.apply_payment_result(references[third], succeeded=False)
+
+        def rollup_rows():
+            return {(row.room_id, row.term, row.status): (row.bookings, row.nights, round(row.amount, 2))
+                    for row in BookingRollup.query if row.bookings or row.nights or row.amount}
+
+        incremental = rollup_rows()
+        hostel_app.rebuild_booking_rollups()
+        rebuilt = rollup_rows()
+        statuses = dict(db.session.query(Booking.status, db.func.count(Booking.id)).group_by(Booking.status).all())
+        scan_revenue = db.session.query(db.func.coalesce(db.func.sum(Booking.total_price), 0)) \
+            .filter(Booking.status == 'approved').scalar()
+        statements = []
+        db.event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+
+    print(f'{len(references)} bookings through /book in {booking_seconds:.1f}s, {expired} expired by the sweep; '
+          f'status counts {statuses}')
+    print(f'rollup rows: {len(incremental)} kept incrementally, {len(rebuilt)} rebuilt from the bookings')
+    if incremental != rebuilt:
+        differing = sorted(set(incremental.items()) ^ set(rebuilt.items()))[:5]
+        failures.append(f'incremental rollups differ from a rebuild, e.g. {differing}')
+
+    admin = hostel_app.app.test_client()
+    admin.post('/admin/login', data={'username': 'admin@leemonthostel.com', 'password': ADMIN_PASSWORD})
+    admin.get('/admin/dashboard')
+    reports = {}
+    for name in ('occupancy', 'revenue', 'funnel'):
+        statements.clear()
+        response = admin.get(f'/admin/reports/{name}')
+        reports[name] = response.get_json()
+        booking_reads = [statement for statement in statements if re.search(r'(FROM|JOIN) booking\b', statement)]
+        print(f'/admin/reports/{name}: {response.status_code}, {len(statements)} queries, '
+              f'{len(booking_reads)} on the booking table')
+        if response.status_code != 200 or booking_reads:
+            failures.append(f'/admin/reports/{name} answered {response.status_code} or read the booking table')
+
+    funnel = reports['funnel']
+    print(f'funnel: {funnel}')
+    for status, count in statuses.items():
+        if funnel.get(status) != count:
+            failures.append(f'funnel reports {funnel.get(status)} {status}, the bookings have {count}')
+    revenue = round(sum(term['revenue'] for term in reports['revenue']['terms']), 2)
+    if revenue != round(scan_revenue, 2):
+        failures.append(f'revenue report totals {revenue}, the bookings {scan_revenue}')
+    occupancy_nights = sum(room['booked_nights'] for room in reports['occupancy']['rooms'])
+    with hostel_app.app.app_context():
+        approved_nights = sum((check_out - check_in).days for check_in, check_out in db.session.query(
+            Booking.check_in_date, Booking.check_out_date).filter(Booking.status == 'approved'))
+        stats = hostel_app.dashboard_stats()
+    if occupancy_nights != approved_nights:
+        failures.append(f'occupancy report has {occupancy_nights} approved nights, the bookings {approved_nights}')
+    if (stats['approved_bookings'], stats['pending_payments'], round(stats['revenue'], 2)) != (
+            statuses.get('approved', 0), statuses.get('pending_payment', 0), round(scan_revenue, 2)):
+        failures.append(f'dashboard totals {stats} disagree with the bookings')
+
+    # The export: bulk-insert the rows outside the app, as a migration would.
+    with hostel_app.app.app_context():
+        started = time.perf_counter()
+        batch = 20000
+        for offset in range(0, args.export_rows, batch):
+            db.session.execute(db.insert(Booking), [{
+                'user_id': guest_id, 'room_id': room_ids[n % len(room_ids)], 'check_in_date': date(2027, 9, 1),
+                'check_out_date': date(2028, 5, 31), 'total_price': 4000, 'status': 'approved',
+                'payment_reference': f'export-{n}', 'holds_inventory': False, 'created_at': datetime.utcnow(),
+            } for n in range(offset, min(offset + batch, args.export_rows))])
+            db.session.commit()
+        total_rows = db.session.query(db.func.count(Booking.id)).scalar()
+    print(f'inserted {args.export_rows} bookings for the export in {time.perf_counter() - started:.1f}s')
+
+    baseline = peak = rss_bytes()
+    rows = size = chunks = 0
+    tail = ''
+    started = time.perf_counter()
+    response = admin.get('/admin/bookings/export', buffered=False)
+    for chunk in response.response:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        chunks += 1
+        size += len(chunk)
+        rows += chunk.count('\n')
+        tail = (tail + chunk)[-2000:]
+        if chunks % 20 == 0:
+            peak = max(peak, rss_bytes())
+    response.close()
+    seconds = time.perf_counter() - started
+    peak = max(peak, rss_bytes())
+    growth_mib = (peak - baseline) / 2 ** 20
+    print(f'export: {rows - 1} rows, {size / 2 ** 20:.0f} MiB in {chunks} chunks, {seconds:.1f}s '
+          f'({(rows - 1) / seconds:,.0f} rows/s); RSS {baseline / 2 ** 20:.0f} MiB before, '
+          f'peak growth {growth_mib:.1f} MiB')
+    last = next(csv.reader(io.StringIO(tail.strip().splitlines()[-1])))
+    if rows - 1 != total_rows or last[-1] != f'export-{args.export_rows - 1}':
+        failures.append(f'export had {rows - 1} rows (expected {total_rows}), last row {last}')
+    if growth_mib > 64:
+        failures.append(f'export grew the process by {growth_mib:.0f} MiB; rows are being buffered')
+
+    paystack_server.shutdown()
+    for line in failures:
+        print(f'FAIL {line}')
+    if not failures:
+        print('OK: rollups match the bookings, reports skip the booking table, and the export streams.')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
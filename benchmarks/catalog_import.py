@@ -0,0 +1,123 @@
+"""Times bulk room imports and exports and checks they round-trip a large catalogue.
+
+Usage: python benchmarks/catalog_import.py [--database-url URL] [--rooms 100000] [--batch-size 500] [--memory]
+
+Writes a synthetic catalogue in the data/rooms.json layout, then measures a dry run, the
+import itself, a re-import that changes nothing, and JSON and CSV exports. Peak Python
+memory is measured with tracemalloc per step. For comparison it also times the old way of
+loading rooms: json.load and one ORM object per room. Exits non-zero if the export does
+not match the file or a step does the wrong number of creates or updates.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from harness import load_app
+
+
+def write_catalog(path, rooms, rng):
+    amenities = ['WiFi', 'Private Toilet', 'Study Desk', 'Wardrobe', 'Fan', 'Air Conditioning']
+    with open(path, 'w') as f:
+        f.write('{\n  "hostel_name": "Leemont Hostel",\n  "rooms": [\n')
+        for n in range(rooms):
+            record = {'id': f'room_{n + 1}', 'name': f'Catalogue Room {n}', 'capacity': rng.randint(1, 4),
+                      'price_per_academic_year': float(rng.randrange(2000, 8000, 50)),
+                      'available_rooms': rng.randint(1, 20), 'description': f'Room {n} on floor {n % 12}.',
+                      'amenities': rng.sample(amenities, 3),
+                      'images': [f'https://placehold.co/400x300/6c5ce7/ffffff?text=Room+{n}'],
+                      'video_url': '', 'is_deleted': False}
+            f.write(('    ' if n == 0 else ',\n    ') + json.dumps(record))
+        f.write('\n  ]\n}\n')
+
+
+def measure(label, fn, memory=False):
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    line = f'{label:28} {elapsed:7.2f}s'
+    if memory:
+        line += f'  peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:7.1f} MiB'
+        tracemalloc.stop()
+    print(line)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--rooms', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--random-seed', type=int, default=7)
+    parser.add_argument('--memory', action='store_true', help='also report peak memory per step')
+    args = parser.parse_args()
+
+    hostel_app, workdir = load_app('leemont-catalog-', args.database_url, ROOM_IMPORT_BATCH_SIZE=args.batch_size,
+                                   BOOKING_EXPIRY_MODE='external')
+    from app import db, Room
+
+    path = os.path.join(workdir, 'rooms.json')
+    write_catalog(path, args.rooms, random.Random(args.random_seed))
+    print(f'{args.rooms} rooms, {os.path.getsize(path) / 2 ** 20:.1f} MiB of JSON, batches of {args.batch_size}')
+    failures = []
+
+    def run_import(dry_run):
+        with open(path, 'rb') as f:
+            return hostel_app.import_catalog(f, 'json', dry_run=dry_run)
+
+    def check(label, summary, created, updated):
+        if summary['errors'] or summary['created'] != created or summary['updated'] != updated:
+            failures.append(f'{label}: {summary["created"]} created, {summary["updated"]} updated, '
+                            f'errors {summary["errors"][:3]}')
+
+    with hostel_app.app.app_context():
+        seeded = Room.query.count()
+        check('dry run', measure('dry run', lambda: run_import(True), args.memory), args.rooms, 0)
+        check('import', measure('import', lambda: run_import(False), args.memory), args.rooms, 0)
+        check('re-import', measure('re-import (no changes)', lambda: run_import(False), args.memory), 0, 0)
+
+        exported = measure('export json', lambda: sum(map(len, hostel_app.catalog_chunks('json'))), args.memory)
+        measure('export csv', lambda: sum(map(len, hostel_app.catalog_chunks('csv'))), args.memory)
+        print(f'exported {exported / 2 ** 20:.1f} MiB of JSON')
+
+        buffer = io.StringIO()
+        buffer.writelines(hostel_app.catalog_chunks('json'))
+        rooms = json.loads(buffer.getvalue())['rooms'][seeded:]
+        with open(path) as f:
+            expected = json.load(f)['rooms']
+        if [dict(room, id=None) for room in rooms] != [dict(room, id=None) for room in expected]:
+            failures.append('the JSON export does not match the imported catalogue')
+
+        # The old seeding path: the whole file in memory and one ORM object per room.
+        Room.query.filter(Room.name.like('Catalogue Room %')).delete(synchronize_session=False)
+        db.session.commit()
+
+        def orm_import():
+            with open(path) as f:
+                for record in json.load(f)['rooms']:
+                    room = Room(name=record['name'], capacity=record['capacity'],
+                                price_per_academic_year=record['price_per_academic_year'],
+                                available_rooms=record['available_rooms'], description=record['description'],
+                                is_deleted=False)
+                    room.set_images(record['images'])
+                    room.set_videos([])
+                    room.set_amenities(record['amenities'])
+                    db.session.add(room)
+            db.session.commit()
+        measure('old: json.load + ORM adds', orm_import, args.memory)
+
+    for line in failures:
+        print(f'FAIL {line}')
+    if not failures:
+        print('OK: the catalogue round-trips.')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Local stand-in for Cloudinary image delivery, for page-weight benchmarks and offline development.
+
+Usage: python benchmarks/fake_cloudinary.py [--port 8766]
+Then start the app with MEDIA_CLOUDINARY_HOSTS=127.0.0.1:8766 and use image URLs like
+http://127.0.0.1:8766/demo/image/upload/v1/room.jpg.
+
+Untransformed URLs answer with a full-size camera original. URLs with a w_/h_ transformation
+answer with a body sized like a compressed rendition of those dimensions.
+"""
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A 4000x3000 phone photo is a few megabytes as JPEG; q_auto,f_auto renditions come out
+# at roughly a tenth of a byte per pixel.
+ORIGINAL_BYTES = 3_200_000
+RENDITION_BYTES_PER_PIXEL = 0.12
+TRANSFORMATION = re.compile(r'/image/upload/([^/]*\bw_(\d+)[^/]*)/')
+
+
+def image_bytes(path):
+    """Size of the body served for a delivery path."""
+    match = TRANSFORMATION.search(path)
+    if not match:
+        return ORIGINAL_BYTES
+    width = int(match.group(2))
+    height_match = re.search(r'\bh_(\d+)', match.group(1))
+    height = int(height_match.group(1)) if height_match else width * 3 // 4
+    return int(width * height * RENDITION_BYTES_PER_PIXEL)
+
+
+class FakeCloudinaryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_headers(self):
+        if '/image/upload/' not in self.path:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        size = image_bytes(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(size))
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.end_headers()
+        return size
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        size = self._send_headers()
+        if size:
+            self.wfile.write(b'\xff\xd8' + bytes(size - 2))
+
+
+class FakeCloudinaryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def start_fake_cloudinary(port=0):
+    """Starts the fake CDN on a background thread and returns the server; call shutdown() to stop it."""
+    server = FakeCloudinaryServer(('127.0.0.1', port), FakeCloudinaryHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+    server = start_fake_cloudinary(args.port)
+    print(f'Fake Cloudinary listening on http://127.0.0.1:{server.server_address[1]}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
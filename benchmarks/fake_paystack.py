@@ -0,0 +1,113 @@
+"""Local stand-in for the Paystack transaction API, for load tests and offline development.
+
+Usage: python benchmarks/fake_paystack.py [--port 8765] [--latency 0.2] [--error-rate 0.0]
+Then start the app with PAYSTACK_BASE_URL=http://127.0.0.1:8765.
+
+References starting with "fail" verify as failed payments; every other reference succeeds.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePaystackHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _simulate_gateway(self):
+        time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            self._respond(503, {'status': False, 'message': 'Service unavailable (simulated)'})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if not self._simulate_gateway():
+            return
+        if self.path != '/transaction/initialize':
+            self._respond(404, {'status': False, 'message': 'Not found'})
+            return
+        reference = body.get('reference')
+        self.server.transactions[reference] = body
+        self._respond(200, {
+            'status': True,
+            'message': 'Authorization URL created',
+            'data': {
+                'authorization_url': f'http://{self.server.server_address[0]}:{self.server.server_address[1]}/pay/{reference}',
+                'access_code': f'fake_{reference}',
+                'reference': reference,
+            },
+        })
+
+    def do_GET(self):
+        if not self._simulate_gateway():
+            return
+        prefix = '/transaction/verify/'
+        if not self.path.startswith(prefix):
+            self._respond(404, {'status': False, 'message': 'Not found'})
+            return
+        reference = self.path[len(prefix):]
+        initialized = self.server.transactions.get(reference, {})
+        self._respond(200, {
+            'status': True,
+            'message': 'Verification successful',
+            'data': {
+                'reference': reference,
+                'status': 'failed' if reference.startswith('fail') else 'success',
+                'amount': initialized.get('amount', 0),
+                'metadata': initialized.get('metadata'),
+            },
+        })
+
+
+class FakePaystackServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up on a slow response (read timeouts) are expected here.
+        pass
+
+
+def start_fake_paystack(port=0, latency=0.0, error_rate=0.0):
+    """Starts the fake gateway on a background thread and returns the server; call shutdown() to stop it."""
+    server = FakePaystackServer(('127.0.0.1', port), FakePaystackHandler)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.transactions = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds added to every call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered with HTTP 503')
+    args = parser.parse_args()
+    server = start_fake_paystack(args.port, args.latency, args.error_rate)
+    print(f'Fake Paystack listening on http://127.0.0.1:{server.server_address[1]}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
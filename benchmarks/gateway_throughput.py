@@ -0,0 +1,61 @@
+"""Measures verify throughput against the fake gateway: one-off requests calls vs the pooled client.
+
+Usage: python benchmarks/gateway_throughput.py [--latency 0.2] [--threads 8] [--calls 200]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_paystack import start_fake_paystack  # noqa: E402
+from paystack import PaystackClient, PaystackError  # noqa: E402
+
+
+def run(label, call, threads, calls):
+    failures = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for ok in pool.map(call, range(calls)):
+            failures += not ok
+    elapsed = time.perf_counter() - start
+    print(f'{label:28} {calls / elapsed:8.1f} calls/s  {failures} failed  ({elapsed:.2f}s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--read-timeout', type=float, default=10.0)
+    args = parser.parse_args()
+
+    server = start_fake_paystack(latency=args.latency)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    def unpooled(i):
+        response = requests.get(f'{base_url}/transaction/verify/ref-{i}',
+                                headers={'Authorization': 'Bearer sk_test'})
+        return response.ok
+
+    client = PaystackClient('sk_test', base_url=base_url, read_timeout=args.read_timeout,
+                            pool_maxsize=args.threads)
+
+    def pooled(i):
+        try:
+            client.verify_transaction(f'ref-{i}')
+            return True
+        except PaystackError:
+            return False
+
+    print(f'gateway latency {args.latency * 1000:.0f} ms, {args.threads} threads')
+    run('requests.get (no session)', unpooled, args.threads, args.calls)
+    run('PaystackClient (pooled)', pooled, args.threads, args.calls)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
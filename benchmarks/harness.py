@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(prefix='leemont-bench-', database_url=None, workdir=None, **env):
+    """Imports app against a throwaway SQLite file (or database_url) and metrics directory, and seeds it.
+
+    app.py reads its settings at import, so env is put in os.environ first. LOG_LEVEL
+    defaults to WARNING. Returns (the app module, the work directory).
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix=prefix)
+    os.environ['DATABASE_URL'] = database_url or f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ['METRICS_DIR'] = os.path.join(workdir, 'metrics')
+    os.environ.update({key: str(value) for key, value in env.items()})
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, ROOT)
+    import app as hostel_app
+    hostel_app.initialize_database()
+    return hostel_app, workdir
@@ -0,0 +1,80 @@
+"""Locust scenario for the booking funnel, for longer or distributed runs than booking_funnel.py.
+
+Usage:
+    python benchmarks/booking_funnel.py --database-url URL --seed-only
+    PAYSTACK_BASE_URL=http://127.0.0.1:8765 DATABASE_URL=URL gunicorn app:app   # plus benchmarks/fake_paystack.py
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 --users 50 --spawn-rate 5
+
+Needs the locust package. Request names match booking_funnel.py, so both reports line up.
+"""
+import random
+import uuid
+from datetime import date, timedelta
+
+from locust import HttpUser, SequentialTaskSet, between, task
+
+PASSWORD = 'bench-password'
+
+
+class BookingFunnel(SequentialTaskSet):
+    """One visitor: browse, view a room, sign up, log in, book, return from Paystack, log out."""
+
+    def on_start(self):
+        self.client.cookies.clear()
+        response = self.client.get('/api/rooms?fields=id&limit=100', name='GET /api/rooms')
+        self.room_id = random.choice([room['id'] for room in response.json()['rooms']])
+        self.email = f'locust-{uuid.uuid4().hex}@example.com'
+        self.reference = None
+
+    @task
+    def browse_rooms(self):
+        self.client.get('/rooms', name='GET /rooms')
+
+    @task
+    def view_room(self):
+        self.client.get(f'/room/{self.room_id}', name='GET /room/<id>')
+
+    @task
+    def sign_up(self):
+        self.client.post('/signup', name='POST /signup', allow_redirects=False,
+                         data={'email': self.email, 'password': PASSWORD, 'confirm_password': PASSWORD})
+
+    @task
+    def log_in(self):
+        self.client.post('/login', name='POST /login', allow_redirects=False,
+                         data={'email': self.email, 'password': PASSWORD})
+
+    @task
+    def open_booking_form(self):
+        self.client.get(f'/book/{self.room_id}', name='GET /book/<id>', allow_redirects=False)
+
+    @task
+    def book(self):
+        check_in = date.today() + timedelta(days=random.randint(30, 300))
+        response = self.client.post(f'/book/{self.room_id}', name='POST /book/<id>', allow_redirects=False, data={
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=random.randint(30, 120))).isoformat(),
+            'payment_method': 'mobile_money',
+        })
+        if response.headers.get('Content-Type', '').startswith('application/json'):
+            self.reference = response.json().get('reference')
+
+    @task
+    def return_from_paystack(self):
+        if self.reference:
+            self.client.get(f'/paystack/callback?reference={self.reference}', name='GET /paystack/callback',
+                            allow_redirects=False)
+
+    @task
+    def my_bookings(self):
+        self.client.get('/my_bookings', name='GET /my_bookings', allow_redirects=False)
+
+    @task
+    def log_out(self):
+        self.client.get('/logout', name='GET /logout', allow_redirects=False)
+        self.interrupt(reschedule=False)
+
+
+class FunnelVisitor(HttpUser):
+    tasks = [BookingFunnel]
+    wait_time = between(0.5, 2)
@@ -0,0 +1,116 @@
+"""Login throughput per core, and what a login storm does to other requests in the same worker.
+
+Usage: python benchmarks/login_throughput.py [--threads 8] [--logins 48] [--method scrypt:32768:8:1]
+
+1. Verifications per second on one core for a few hashing parameter sets.
+2. A login storm on --threads request threads (like one gthread worker) while another thread
+   fetches /rooms: hashing inline vs on a one-thread-per-core pool.
+3. A password-guessing burst against one email, with and without the failed-login throttle.
+4. A user with an old pbkdf2 hash logs in and comes out with the configured method.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import load_app
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * pct / 100), len(samples) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=48)
+    parser.add_argument('--guesses', type=int, default=50)
+    parser.add_argument('--method', default='scrypt:32768:8:1')
+    args = parser.parse_args()
+
+    hostel_app, _ = load_app(PASSWORD_HASH_METHOD=args.method)
+    from app import db, User
+    from passwords import LoginThrottle, PasswordHasher
+    from werkzeug.security import check_password_hash, generate_password_hash
+
+    cores = os.cpu_count() or 1
+    print(f'{cores} CPU core(s)')
+    for method in (args.method, 'pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000'):
+        stored = generate_password_hash('secret', method)
+        rounds = 5
+        start = time.perf_counter()
+        for _ in range(rounds):
+            check_password_hash(stored, 'secret')
+        per_login = (time.perf_counter() - start) / rounds
+        print(f'{method:24} {per_login * 1000:7.1f} ms/verify  {1 / per_login:6.1f} logins/s per core')
+
+    with hostel_app.app.app_context():
+        user = User(email='storm@example.com', is_admin=False)
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+
+    def login(password='secret', email='storm@example.com'):
+        client = hostel_app.app.test_client()
+        response = client.post('/login', data={'email': email, 'password': password})
+        return response.status_code
+
+    def storm(workers):
+        hostel_app.password_hasher = PasswordHasher(args.method, workers, queue_size=args.logins)
+        probe_latencies = []
+        done = threading.Event()
+
+        def probe():
+            client = hostel_app.app.test_client()
+            while not done.is_set():
+                start = time.perf_counter()
+                client.get('/rooms?probe=1')
+                probe_latencies.append(time.perf_counter() - start)
+
+        client = hostel_app.app.test_client()
+        client.get('/rooms?probe=1')
+        prober = threading.Thread(target=probe)
+        start = time.perf_counter()
+        prober.start()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            statuses = list(pool.map(lambda _: login(), range(args.logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        prober.join()
+        label = 'inline' if not workers else f'pool of {workers}'
+        print(f'hashing {label:12} {args.logins / elapsed:6.1f} logins/s  '
+              f'/rooms during storm p50 {percentile(probe_latencies, 50) * 1000:7.1f} ms '
+              f'p95 {percentile(probe_latencies, 95) * 1000:7.1f} ms  '
+              f'(statuses {sorted(set(statuses))})')
+
+    print(f'login storm: {args.logins} logins on {args.threads} request threads')
+    storm(0)
+    storm(cores)
+
+    hostel_app.password_hasher = PasswordHasher(args.method)
+    for label, throttle in (('no throttle', LoginThrottle(10 ** 9, 10 ** 9)), ('throttle', LoginThrottle())):
+        hostel_app.login_throttle = throttle
+        start = time.perf_counter()
+        statuses = [login(password=f'guess-{n}') for n in range(args.guesses)]
+        elapsed = time.perf_counter() - start
+        print(f'{args.guesses} wrong guesses, {label:11} {elapsed * 1000 / args.guesses:7.1f} ms/attempt  '
+              f'{statuses.count(429)} refused before hashing')
+
+    with hostel_app.app.app_context():
+        legacy = User(email='legacy@example.com', is_admin=False,
+                      password_hash=generate_password_hash('secret', 'pbkdf2:sha256:600000'))
+        db.session.add(legacy)
+        db.session.commit()
+    status = login(email='legacy@example.com')
+    with hostel_app.app.app_context():
+        stored = User.query.filter_by(email='legacy@example.com').one().password_hash
+    upgraded = stored.split('$', 1)[0] == hostel_app.password_hasher.method
+    print(f'legacy pbkdf2 user login: status {status}, hash now {stored.split("$", 1)[0]}')
+    return 0 if upgraded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Image bytes a phone downloads for /, /rooms and /gallery, before and after responsive renditions.
+
+Usage: python benchmarks/page_weight.py [--rooms 24] [--viewport 390] [--dpr 2]
+
+Serves images from benchmarks/fake_cloudinary.py, so it runs offline. "Original" is what the
+pages cost when every <img> pointed at the uploaded file; "responsive" is the srcset candidate
+a browser picks for the viewport; "eager bytes" is the part of it not marked loading="lazy".
+Exits non-zero if an image is missing srcset, dimensions or a loading attribute.
+"""
+import argparse
+import os
+import re
+import sys
+import urllib.request
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_cloudinary import start_fake_cloudinary
+from harness import load_app
+
+
+class ImageCollector(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.images = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'img':
+            self.images.append(dict(attrs))
+
+
+def slot_width(sizes, viewport):
+    """CSS px width of the image slot, for a sizes attribute of (max-width: Npx) entries and vw/px lengths."""
+    for entry in sizes.split(','):
+        entry = entry.strip()
+        match = re.match(r'\(max-width:\s*(\d+)px\)\s*(.+)', entry)
+        if match:
+            if viewport > int(match.group(1)):
+                continue
+            entry = match.group(2)
+        if entry.endswith('vw'):
+            return viewport * float(entry[:-2]) / 100
+        return float(entry.rstrip('px'))
+    return viewport
+
+
+def chosen_candidate(image, viewport, dpr):
+    """The srcset URL a browser would fetch: the narrowest candidate covering the slot at this DPR."""
+    # Cloudinary transformations contain commas, so split on descriptors the way browsers do.
+    candidates = sorted((int(width), url) for url, width in re.findall(r'(\S+?),?\s+(\d+)w', image['srcset']))
+    needed = slot_width(image.get('sizes', '100vw'), viewport) * dpr
+    for width, url in candidates:
+        if width >= needed:
+            return url
+    return candidates[-1][1]
+
+
+def original_url(url):
+    return re.sub(r'/image/upload/[^/]*\bw_\d+[^/]*/', '/image/upload/', url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=24)
+    parser.add_argument('--viewport', type=int, default=390, help='CSS px width of the screen')
+    parser.add_argument('--dpr', type=float, default=2.0, help='device pixel ratio')
+    args = parser.parse_args()
+
+    cdn = start_fake_cloudinary()
+    cdn_host = f'127.0.0.1:{cdn.server_address[1]}'
+    hostel_app, _ = load_app(MEDIA_CLOUDINARY_HOSTS=cdn_host)
+
+    def cdn_url(name):
+        return f'http://{cdn_host}/demo/image/upload/v1/{name}.jpg'
+
+    with hostel_app.app.app_context():
+        hostel_app.Room.query.delete()
+        for i in range(args.rooms):
+            room = hostel_app.Room(name=f'Bench Room {i}', capacity=1 + i % 2,
+                                   price_per_academic_year=3000 + i, available_rooms=1,
+                                   description='Benchmark room', is_deleted=False)
+            room.set_images([cdn_url(f'room-{i}-{n}') for n in range(4)])
+            room.set_videos([])
+            room.set_amenities(['WiFi', 'Study Desk'])
+            hostel_app.db.session.add(room)
+        hostel_details_entry = hostel_app.HostelDetails.query.first()
+        hostel_details_entry.set_general_images([cdn_url(f'hostel-{n}') for n in range(6)])
+        hostel_app.db.session.commit()
+        hostel_app.bump_rooms_version()
+        hostel_app.bump_cache_version('hostel_details')
+        hostel_app.bump_content_version()
+
+    sizes = {}
+
+    def size_of(url):
+        if url not in sizes:
+            request = urllib.request.Request(url, method='HEAD')
+            with urllib.request.urlopen(request) as response:
+                sizes[url] = int(response.headers['Content-Length'])
+        return sizes[url]
+
+    client = hostel_app.app.test_client()
+    problems = []
+    print(f'viewport {args.viewport} CSS px at {args.dpr:g}x, {args.rooms} rooms')
+    print(f'{"page":10} {"images":>6} {"eager":>5} {"original":>11} {"responsive":>11} {"eager bytes":>11}')
+    for path in ('/', '/rooms', '/gallery'):
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        collector = ImageCollector()
+        collector.feed(response.get_data(as_text=True))
+        images = [image for image in collector.images if cdn_host in image.get('src', '')]
+
+        original = responsive = eager_bytes = eager = 0
+        for image in images:
+            for attribute in ('srcset', 'width', 'height', 'loading'):
+                if not image.get(attribute):
+                    problems.append(f'{path}: <img src="{image["src"]}"> has no {attribute}')
+            if not image.get('srcset'):
+                continue
+            chosen = size_of(chosen_candidate(image, args.viewport, args.dpr))
+            original += size_of(original_url(image['src']))
+            responsive += chosen
+            if image['loading'] == 'eager':
+                eager += 1
+                eager_bytes += chosen
+        print(f'{path:10} {len(images):6} {eager:5} {original / 1e6:9.2f}MB {responsive / 1e6:9.2f}MB '
+              f'{eager_bytes / 1e6:9.2f}MB')
+        if not images:
+            problems.append(f'{path}: no images from the fake CDN were rendered')
+
+    cdn.shutdown()
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""Renders /rooms and /gallery against a throwaway SQLite database seeded with many rooms.
+
+Usage: python benchmarks/render_pages.py [--rooms 300] [--iterations 50]
+
+Runs with the page cache off, so every request renders the template and runs its queries.
+"""
+import argparse
+import time
+
+from harness import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=300)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    hostel_app, _ = load_app(PAGE_CACHE_BACKEND='none')
+
+    with hostel_app.app.app_context():
+        for i in range(args.rooms):
+            room = hostel_app.Room(name=f'Bench Room {i}', capacity=1 + i % 2,
+                                   price_per_academic_year=3000 + i, available_rooms=1,
+                                   description='Benchmark room', is_deleted=False)
+            room.set_images([f'https://placehold.co/400x300?text=Room+{i}+{n}' for n in range(4)])
+            room.set_videos([f'https://example.com/video-{i}.mp4'])
+            room.set_amenities(['WiFi', 'Private Toilet', 'Study Desk', 'Wardrobe', 'Fan'])
+            hostel_app.db.session.add(room)
+        hostel_app.db.session.commit()
+
+    client = hostel_app.app.test_client()
+    for path in ('/rooms', '/gallery'):
+        client.get(path)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            response = client.get(path)
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - start
+        print(f'{path:10} {elapsed / args.iterations * 1000:8.2f} ms/request '
+              f'({args.iterations} requests, {args.rooms} extra rooms)')
+
+
+if __name__ == '__main__':
+    main()
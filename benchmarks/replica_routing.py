@@ -0,0 +1,170 @@
+"""Checks read-replica routing against two local databases: a primary and a replica copied from it.
+
+Usage: python benchmarks/replica_routing.py [--primary-url URL --replica-url URL] [--requests 200]
+
+Defaults to two SQLite files, where "replication" is an explicit copy of the primary file
+(sqlite3's backup API), so each step can decide how far behind the replica is. Two local
+PostgreSQL instances with streaming replication work too; the steps that copy the primary
+are skipped and the replica is given a few seconds to catch up instead.
+
+Counts the statements each database runs while the test client browses, signs up, and
+sees the replica lag, break and recover, then while it is served from the page cache.
+Exits non-zero if a read goes to the wrong database, anything writes to the replica, or
+a cache hit runs a statement.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from harness import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--primary-url')
+    parser.add_argument('--replica-url')
+    parser.add_argument('--requests', type=int, default=200, help='anonymous page views in the browsing step')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='leemont-replica-')
+    primary_path, replica_path = os.path.join(workdir, 'primary.db'), os.path.join(workdir, 'replica.db')
+    sqlite_files = not args.primary_url
+    hostel_app, _ = load_app(
+        database_url=args.primary_url or f'sqlite:///{primary_path}',
+        workdir=workdir,
+        DATABASE_REPLICA_URL=args.replica_url or f'sqlite:///{replica_path}',
+        PAGE_CACHE_BACKEND='none',
+        CACHE_VERSION_SECONDS='0',
+        REPLICA_MAX_LAG_SECONDS='5',
+        REPLICA_LAG_CHECK_SECONDS='0',
+        BOOKING_EXPIRY_MODE='external',
+        PAYMENT_WORKER_MODE='external',
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+    )
+    from app import db, CacheVersion, ReplicationHeartbeat
+    from db_pool import REPLICA_BIND
+    from page_cache import LRUPageCache
+    from sqlalchemy import event
+
+    counts = {'primary': Counter(), 'replica': Counter()}
+
+    def counter(name):
+        def count(conn, cursor, statement, parameters, context, executemany):
+            kind = statement.lstrip().split(None, 1)[0].upper()
+            counts[name]['write' if kind in ('INSERT', 'UPDATE', 'DELETE') else 'read'] += 1
+            if 'FROM room' in statement:
+                counts[name]['room reads'] += 1
+        return count
+
+    with hostel_app.app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', counter('primary'))
+        event.listen(db.engines[REPLICA_BIND], 'before_cursor_execute', counter('replica'))
+
+    def replicate():
+        """Beats, as the heartbeat process would, then brings the replica up to date with the primary."""
+        with hostel_app.app.app_context():
+            hostel_app.write_replication_heartbeat()
+        if sqlite_files:
+            with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+                source.backup(target)
+        else:
+            time.sleep(3)
+
+    def age_cache_versions():
+        """Makes every cache version look old, as it would be a while after the last admin edit."""
+        with hostel_app.app.app_context():
+            db.session.execute(db.update(CacheVersion).values(bumped_at=datetime.utcnow() - timedelta(hours=1)))
+            db.session.commit()
+
+    failures = []
+
+    def browse(label, client, expect, views=1, path='/rooms'):
+        for counter_ in counts.values():
+            counter_.clear()
+        for _ in range(views):
+            response = client.get(path)
+            if response.status_code != 200:
+                failures.append(f'{label}: {path} answered {response.status_code}')
+        served_by = {name: counter_['room reads'] for name, counter_ in counts.items()}
+        print(f'{label:42} room reads: primary {served_by["primary"]:4}, replica {served_by["replica"]:4}')
+        other = 'primary' if expect == 'replica' else 'replica'
+        if served_by[expect] == 0 or served_by[other]:
+            failures.append(f'{label}: expected room reads on the {expect} only')
+        if counts['replica']['write']:
+            failures.append(f'{label}: {counts["replica"]["write"]} writes went to the replica')
+
+    replicate()
+    age_cache_versions()
+    anonymous = hostel_app.app.test_client()
+    browse('anonymous browsing', anonymous, 'replica', views=args.requests)
+    for path in ('/', '/gallery', '/room/1', '/api/rooms', '/api/rooms/1'):
+        browse(f'anonymous {path}', anonymous, 'replica', path=path)
+
+    visitor = hostel_app.app.test_client()
+    visitor.post('/signup', data={'email': f'replica-{time.time_ns()}@example.com', 'password': 'bench-password',
+                                  'confirm_password': 'bench-password'})
+    browse('right after signing up (read-your-writes)', visitor, 'primary')
+    browse('anonymous visitor meanwhile', anonymous, 'replica')
+
+    replicate()
+    with hostel_app.app.app_context():
+        hostel_app.bump_content_version()
+    browse('right after a content bump', anonymous, 'primary')
+    age_cache_versions()
+
+    # The last beat to reach the replica is a minute old, as when replication has stalled.
+    replicate()
+    with hostel_app.app.app_context():
+        db.session.execute(db.update(ReplicationHeartbeat).values(beat_at=datetime.utcnow() - timedelta(seconds=60)))
+        db.session.commit()
+    if sqlite_files:
+        with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+            source.backup(target)
+    else:
+        time.sleep(3)
+    browse('replica 60 s behind', anonymous, 'primary')
+
+    if sqlite_files:
+        with hostel_app.app.app_context():
+            db.engines[REPLICA_BIND].dispose()
+        os.remove(replica_path)
+        browse('replica missing', anonymous, 'primary')
+        replicate()
+        with hostel_app.app.app_context():
+            status = hostel_app.replica_lag_guard.status()
+        browse('replica restored', anonymous, 'replica')
+        print(f'lag guard before recovery: {status}')
+
+    # Page cache hits and 304s must not check the replica's lag or read from either database.
+    # Cache versions are read once per CACHE_VERSION_SECONDS, not per request, so give them a
+    # TTL longer than this step.
+    replicate()
+    hostel_app.app.config['CACHE_VERSION_SECONDS'] = 3600
+    hostel_app.page_cache = LRUPageCache(64)
+    anonymous.get('/rooms')
+    etag = anonymous.get('/api/rooms').headers['ETag']
+    for counter_ in counts.values():
+        counter_.clear()
+    for _ in range(args.requests):
+        anonymous.get('/rooms')
+        anonymous.get('/api/rooms', headers={'If-None-Match': etag})
+    statements = {name: sum(counter_.values()) - counter_['room reads'] for name, counter_ in counts.items()}
+    print(f'{"page cache hits and 304s":42} statements: primary {statements["primary"]:4}, '
+          f'replica {statements["replica"]:4}')
+    if any(statements.values()):
+        failures.append(f'{2 * args.requests} cache hits and 304s ran {statements} statements')
+
+    for line in failures:
+        print(f'FAIL {line}')
+    if not failures:
+        print('OK: browsing reads the replica; writes, recent writers, fresh bumps and lag use the primary.')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
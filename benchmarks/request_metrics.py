@@ -0,0 +1,112 @@
+"""Drives the public pages and reports per-endpoint latency, SQL and template time from /metrics.
+
+Usage: python benchmarks/request_metrics.py [--rooms 200] [--iterations 30] [--slow-ms 20]
+
+Also checks that /metrics needs the internal token and that slow requests are logged with
+their SQL statements. Exits non-zero if either check fails.
+"""
+import argparse
+import io
+import json
+import logging
+import re
+import sys
+from collections import defaultdict
+
+from harness import load_app
+
+SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def parse_metrics(text):
+    """{(metric, frozenset(labels)): value} for every sample line."""
+    samples = {}
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            labels = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2)))
+            samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--slow-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    hostel_app, _ = load_app(INTERNAL_TOKEN='bench-token', SLOW_REQUEST_MS=args.slow_ms, LOG_LEVEL='WARNING')
+    from observability import JsonFormatter
+
+    with hostel_app.app.app_context():
+        for i in range(args.rooms):
+            room = hostel_app.Room(name=f'Bench Room {i}', capacity=1 + i % 2,
+                                   price_per_academic_year=3000 + i, available_rooms=1,
+                                   description='Benchmark room', is_deleted=False)
+            room.set_images([f'https://placehold.co/400x300?text=Room+{i}'])
+            room.set_amenities(['WiFi', 'Study Desk'])
+            hostel_app.db.session.add(room)
+        hostel_app.db.session.commit()
+        hostel_app.bump_rooms_version()
+        room_id = hostel_app.Room.query.first().id
+
+    captured = io.StringIO()
+    capture = logging.StreamHandler(captured)
+    capture.setFormatter(JsonFormatter())
+    hostel_app.app.logger.addHandler(capture)
+
+    client = hostel_app.app.test_client()
+    paths = ['/', '/rooms', '/gallery', f'/room/{room_id}', '/api/rooms?limit=50',
+             f'/api/rooms/{room_id}/availability?check_in=2030-01-01&check_out=2030-06-01']
+    for _ in range(args.iterations):
+        for path in paths:
+            assert client.get(path).status_code == 200, path
+
+    problems = []
+    if client.get('/metrics').status_code != 404:
+        problems.append('/metrics answered without the internal token')
+    response = client.get('/metrics', headers={'Authorization': 'Bearer bench-token'})
+    assert response.status_code == 200
+    samples = parse_metrics(response.get_data(as_text=True))
+
+    report = defaultdict(dict)
+    for (name, labels), value in samples.items():
+        labels = dict(labels)
+        endpoint = labels.get('endpoint')
+        if name == 'http_request_duration_seconds_sum':
+            report[endpoint]['latency'] = report[endpoint].get('latency', 0) + value
+        elif name == 'http_request_duration_seconds_count':
+            report[endpoint]['requests'] = report[endpoint].get('requests', 0) + value
+        elif name == 'db_queries_total':
+            report[endpoint]['queries'] = value
+        elif name == 'db_query_seconds_total':
+            report[endpoint]['db'] = value
+        elif name == 'template_render_seconds_sum':
+            report[endpoint]['template'] = report[endpoint].get('template', 0) + value
+
+    print(f'{args.rooms} rooms, {args.iterations} requests per page')
+    print(f'{"endpoint":20} {"requests":>8} {"mean ms":>8} {"queries":>8} {"db ms":>7} {"tmpl ms":>8}')
+    for endpoint, row in sorted(report.items(), key=lambda item: -item[1].get('latency', 0)):
+        requests = row.get('requests')
+        if not requests:
+            continue
+        print(f'{endpoint:20} {requests:8.0f} {row["latency"] / requests * 1000:8.2f} '
+              f'{row.get("queries", 0) / requests:8.1f} {row.get("db", 0) / requests * 1000:7.2f} '
+              f'{row.get("template", 0) / requests * 1000:8.2f}')
+
+    slow = [json.loads(line) for line in captured.getvalue().splitlines() if '"Slow request"' in line]
+    print(f'slow requests logged (>= {args.slow_ms:g} ms): {len(slow)}')
+    if slow:
+        example = max(slow, key=lambda entry: entry['duration_ms'])
+        print(f'  slowest: {example["path"]} {example["duration_ms"]} ms, {example["db_queries"]} queries, '
+              f'first: {example["queries"][0]["sql"][:80] if example["queries"] else "-"}')
+        if any(entry['db_queries'] != len(entry['queries']) for entry in slow):
+            problems.append('a slow request log is missing some of its SQL statements')
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
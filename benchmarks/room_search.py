@@ -0,0 +1,83 @@
+"""Times amenity, capacity and price searches over many rooms: Python scan, SQL LIKE and the search index.
+
+Usage: python benchmarks/room_search.py [--rooms 5000] [--amenities 40] [--iterations 50]
+"""
+import argparse
+import json
+import random
+import time
+
+from harness import load_app
+
+
+def timed(label, iterations, fn, unit='search'):
+    result = fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:34} {elapsed / iterations * 1000:8.3f} ms/{unit}')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--amenities', type=int, default=40)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    hostel_app, _ = load_app()
+    from app import db, Room
+    from room_index import RoomSearchIndex
+
+    rng = random.Random(11)
+    amenity_names = ['Private Toilet', 'WiFi'] + [f'Amenity {n}' for n in range(args.amenities - 2)]
+    with hostel_app.app.app_context():
+        rows = [{'name': f'Bench Room {i}', 'capacity': rng.randint(1, 4),
+                 'price_per_academic_year': rng.randrange(2000, 8000, 10), 'available_rooms': 1,
+                 'description': 'Benchmark room', 'images_json': '[]', 'videos_json': '[]',
+                 'amenities_json': json.dumps(rng.sample(amenity_names, rng.randint(5, 15))), 'is_deleted': False}
+                for i in range(args.rooms)]
+        db.session.execute(db.insert(Room), rows)
+        db.session.commit()
+        hostel_app.bump_rooms_version()
+
+        wanted, capacity, max_price = ['Private Toilet', 'WiFi'], 2, 4000.0
+        print(f'{args.rooms} rooms, {args.amenities} amenities: rooms with {" and ".join(wanted)}, '
+              f'capacity {capacity}, under GHC {max_price:.0f}')
+
+        def python_scan():
+            return sorted(room.id for room in Room.query.filter_by(is_deleted=False).all()
+                          if room.capacity == capacity and room.price_per_academic_year <= max_price
+                          and all(a in room.get_amenities() for a in wanted))
+
+        def sql_like():
+            query = db.session.query(Room.id).filter(
+                Room.is_deleted.is_(False), Room.capacity == capacity, Room.price_per_academic_year <= max_price)
+            for amenity in wanted:
+                query = query.filter(Room.amenities_json.like(f'%{json.dumps(amenity)}%'))
+            return sorted(room_id for (room_id,) in query)
+
+        def index_search():
+            return hostel_app.get_room_index().search(amenities=wanted, capacity=capacity, max_price=max_price)
+
+        def index_search_and_fetch():
+            ids = index_search()
+            return [room.id for room in Room.query.filter(Room.id.in_(ids)).order_by(Room.id).all()]
+
+        expected = timed('load all rooms, filter in Python', args.iterations, python_scan)
+        assert timed('SQL LIKE on amenities_json', args.iterations, sql_like) == expected
+        assert timed('index search (ids only)', args.iterations * 20, index_search) == expected
+        assert timed('index search + load matching rooms', args.iterations, index_search_and_fetch) == expected
+
+        rows = db.session.query(Room.id, Room.capacity, Room.price_per_academic_year, Room.amenities_json) \
+            .filter(Room.is_deleted.is_(False)).all()
+        timed('index rebuild after an edit', 10, lambda: RoomSearchIndex(
+            db.session.query(Room.id, Room.capacity, Room.price_per_academic_year, Room.amenities_json)
+            .filter(Room.is_deleted.is_(False)).all()), unit='build')
+        print(f'{len(expected)} matching rooms; all methods agree ({len(rows)} rooms indexed).')
+
+
+if __name__ == '__main__':
+    main()
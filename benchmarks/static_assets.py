@@ -0,0 +1,72 @@
+"""Bytes and worker time spent on /static: plain Flask serving vs fingerprinted, precompressed assets.
+
+Usage: python benchmarks/static_assets.py [--iterations 500]
+
+Works on a copy of the static folder, so the repository's static/dist is left alone.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = ('css/style.css', 'js/main.js')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='leemont-bench-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ['METRICS_DIR'] = os.path.join(workdir, 'metrics')
+    os.environ['STATIC_FINGERPRINT'] = '0'
+    sys.path.insert(0, ROOT)
+    import app as hostel_app
+    from static_assets import build_static
+
+    static_folder = os.path.join(workdir, 'static')
+    shutil.copytree(os.path.join(ROOT, 'static'), static_folder, ignore=shutil.ignore_patterns('dist', 'renditions'))
+    hostel_app.app.static_folder = static_folder
+    manifest = build_static(static_folder)
+    client = hostel_app.app.test_client()
+    browser_headers = {'Accept-Encoding': 'gzip, deflate, br'}
+
+    def fetch_all(paths, headers):
+        responses = [client.get(f'/static/{path}', headers=headers) for path in paths]
+        assert all(response.status_code == 200 for response in responses)
+        return responses
+
+    def timed(label, paths, headers):
+        fetch_all(paths, headers)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            responses = fetch_all(paths, headers)
+        elapsed = time.perf_counter() - start
+        sent = sum(len(response.data) for response in responses)
+        print(f'{label:36} {elapsed / args.iterations / len(paths) * 1000:7.3f} ms/file '
+              f'{sent / 1024:8.1f} KiB body')
+        return responses
+
+    print(f'{" + ".join(ASSETS)}, {args.iterations} rounds')
+    plain = timed('original names', ASSETS, browser_headers)
+    hashed = [manifest[path] for path in ASSETS]
+    compressed = timed('fingerprinted, precompressed', hashed, browser_headers)
+    hostel_app.app.config['STATIC_HANDOFF'] = 'x-accel-redirect'
+    timed('fingerprinted, X-Accel-Redirect', hashed, browser_headers)
+    hostel_app.app.config['STATIC_HANDOFF'] = ''
+
+    # A repeat visit revalidates every plain asset (one request each, 304 at best) and
+    # sends nothing for immutable ones until the page links a new hash.
+    print(f'repeat visit requests: original names {len(plain)} '
+          f'(Cache-Control: {plain[0].headers.get("Cache-Control")}), fingerprinted 0 '
+          f'(Cache-Control: {compressed[0].headers.get("Cache-Control")})')
+    assert all(response.headers.get('Content-Encoding') for response in compressed)
+    assert all('immutable' in response.headers['Cache-Control'] for response in compressed)
+
+
+if __name__ == '__main__':
+    main()
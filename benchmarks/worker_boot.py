@@ -0,0 +1,69 @@
+"""Times worker startup, from importing app to serving the first request, for 1 vs N workers.
+
+Usage: python benchmarks/worker_boot.py [--workers 4]
+
+Each worker is a separate process, as under gunicorn. 'init on boot' repeats what every
+worker used to do at import (schema check, admin password hash check, seeding); 'boot
+only' is the current behaviour, with the database prepared once beforehand by init-db.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker(init_on_boot):
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import app as hostel_app
+    if init_on_boot:
+        hostel_app.initialize_database()
+    response = hostel_app.app.test_client().get('/rooms')
+    assert response.status_code == 200
+    sys.stdout.write(f'{(time.perf_counter() - start) * 1000:.1f}\n')
+
+
+def spawn(count, init_on_boot):
+    command = [sys.executable, os.path.abspath(__file__), '--worker']
+    if init_on_boot:
+        command.append('--init-on-boot')
+    start = time.perf_counter()
+    workers = [subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+               for _ in range(count)]
+    timings = [float(w.communicate()[0].strip().splitlines()[-1]) for w in workers]
+    return sum(timings) / len(timings), (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--init-on-boot', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.init_on_boot)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='leemont-boot-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "boot.db")}'
+    os.environ['METRICS_DIR'] = os.path.join(workdir, 'metrics')
+    os.environ.setdefault('ADMIN_PASSWORD', 'benchmark-admin-password')
+    # Release phase: prepare the database once.
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    for init_on_boot in (True, False):
+        label = 'init on boot' if init_on_boot else 'boot only'
+        for count in sorted({1, args.workers}):
+            mean, wall = spawn(count, init_on_boot)
+            print(f'{label:13} {count:2} worker(s): {mean:8.1f} ms import to first request (mean), '
+                  f'{wall:8.1f} ms until all served')
+
+
+if __name__ == '__main__':
+    main()
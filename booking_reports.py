@@ -0,0 +1,68 @@
+import csv
+import io
+from datetime import date
+
+# Statuses a booking can be in, in funnel order.
+FUNNEL_STATUSES = ('pending_payment', 'approved', 'failed', 'expired', 'refund_pending')
+# Columns of the bookings CSV export, in order.
+EXPORT_FIELDS = ('id', 'created_at', 'status', 'user_id', 'user_email', 'room_id', 'room_name',
+                 'check_in_date', 'check_out_date', 'nights', 'total_price', 'payment_reference')
+
+
+def academic_term(check_in, start_month=8):
+    """The academic term, e.g. '2026/27', that a stay starting on check_in falls in."""
+    start_year = check_in.year if check_in.month >= start_month else check_in.year - 1
+    return f'{start_year}/{(start_year + 1) % 100:02d}'
+
+
+def term_bounds(term, start_month=8):
+    """(first day, first day of the next term) of a term label from academic_term."""
+    start_year = int(term.split('/', 1)[0])
+    return date(start_year, start_month, 1), date(start_year + 1, start_month, 1)
+
+
+def rollup_deltas(stays, old_status, new_status, start_month=8):
+    """What moving each stay from old_status to new_status does to the rollups.
+
+    stays are (room_id, check_in, check_out, total_price) tuples; old_status is None for new
+    bookings. Returns {(room_id, term, status): [bookings, nights, amount]}, leaving out keys
+    whose changes cancel out.
+    """
+    deltas = {}
+    for room_id, check_in, check_out, total_price in stays:
+        term = academic_term(check_in, start_month)
+        nights = (check_out - check_in).days
+        for status, sign in ((old_status, -1), (new_status, 1)):
+            if status is None:
+                continue
+            delta = deltas.setdefault((room_id, term, status), [0, 0, 0.0])
+            delta[0] += sign
+            delta[1] += sign * nights
+            delta[2] += sign * (total_price or 0.0)
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def funnel(counts):
+    """The payment funnel from {status: bookings}: every status, plus started and conversion."""
+    started = sum(counts.values())
+    decided = counts.get('approved', 0) + counts.get('failed', 0) + counts.get('expired', 0)
+    result = {status: counts.get(status, 0) for status in FUNNEL_STATUSES}
+    result.update({status: count for status, count in counts.items() if status not in result})
+    result['started'] = started
+    # Of the checkouts that reached an outcome, the share that paid.
+    result['conversion_percent'] = round(100 * counts.get('approved', 0) / decided, 1) if decided else 0.0
+    return result
+
+
+def csv_chunks(rows, fields, rows_per_chunk=500):
+    """Rows (tuples in `fields` order) as CSV text with a header, rows_per_chunk rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
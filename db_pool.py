@@ -0,0 +1,171 @@
+import threading
+import time
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+# SQLALCHEMY_BINDS key of the read replica engine.
+REPLICA_BIND = 'replica'
+
+
+class PoolMetrics:
+    """Counts pool checkouts and how long they waited for a free connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_ms_total': round(self.wait_seconds_total * 1000, 3),
+                'wait_ms_mean': round(self.wait_seconds_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_ms_max': round(self.wait_seconds_max * 1000, 3),
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited, including checkouts that timed out.
+
+    Each engine's pool has its own metrics, and engine.dispose() hands them to the new pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def pool_size_for_budget(budget, workers, max_overflow):
+    """Splits a connection budget across workers: each gets pool_size + max_overflow <= budget / workers."""
+    return max(budget // max(workers, 1) - max_overflow, 1)
+
+
+def engine_options_from_config(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database, built from the DB_* settings."""
+    if not config['SQLALCHEMY_DATABASE_URI'].startswith('postgres'):
+        return {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+
+    if config['DB_PGBOUNCER']:
+        # PgBouncer does the pooling. A local pool would pin its server connections, and
+        # PgBouncer rejects the startup 'options' parameter, so the statement timeout is
+        # applied per transaction by install_statement_timeout instead.
+        return {'poolclass': NullPool}
+
+    pool_size = config['DB_POOL_SIZE']
+    if pool_size is None:
+        budget = config['DB_CONNECTION_BUDGET']
+        pool_size = pool_size_for_budget(budget, config['WEB_CONCURRENCY'], config['DB_MAX_OVERFLOW']) if budget else 5
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def install_statement_timeout(engine, timeout_ms):
+    """Sets statement_timeout at the start of every transaction, for connections made through PgBouncer."""
+    @event.listens_for(engine, 'begin')
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+
+
+def pool_status(engine):
+    """Current pool occupancy plus checkout wait metrics, for the internal metrics endpoint."""
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        })
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool.metrics.snapshot())
+    return status
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica engine while g.read_replica is set, and everything else to the primary.
+
+    Once a request flushes or runs an INSERT, UPDATE or DELETE, g.db_wrote is set and its
+    remaining reads go to the primary too, so a request always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if self._flushing or (clause is not None and clause.is_dml):
+                g.db_wrote = True
+            elif (g.get('read_replica') and not g.get('db_wrote') and clause is not None and clause.is_select
+                  and REPLICA_BIND in self._db.engines):
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaLagGuard:
+    """Remembers whether the replica was within max_lag seconds of the primary, re-measuring at most every check_interval."""
+
+    def __init__(self, max_lag=5.0, check_interval=2.0):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self.error = None
+        self._usable = False
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def usable(self, measure_lag):
+        """Whether reads may go to the replica. measure_lag() returns the lag in seconds, or None if unknown."""
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._usable
+        with self._lock:
+            if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+                try:
+                    self.lag, self.error = measure_lag(), None
+                except exc.SQLAlchemyError as e:
+                    # An unreachable or broken replica is as good as a lagging one: read the primary.
+                    self.lag, self.error = None, str(e).splitlines()[0]
+                self._usable = self.lag is not None and self.lag <= self.max_lag
+                self._checked_at = time.monotonic()
+        return self._usable
+
+    def status(self):
+        return {'usable': self._usable, 'lag_seconds': self.lag, 'max_lag_seconds': self.max_lag, 'error': self.error}
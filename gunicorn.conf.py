@@ -0,0 +1,37 @@
+# gunicorn reads this file from the working directory, so the Procfile's 'gunicorn app:app'
+# picks it up. Every setting comes from the environment.
+#
+# GUNICORN_WORKER_CLASS=sync (default): one request per worker process. Simple, but a
+#   booking holds its whole process for the Paystack round trip.
+# GUNICORN_WORKER_CLASS=gevent: each worker serves up to GUNICORN_WORKER_CONNECTIONS
+#   requests at once and switches between them while they wait on Paystack or PostgreSQL.
+#   Needs gevent, plus psycogreen on PostgreSQL (the app patches psycopg2 itself); both
+#   are pinned in requirements.txt, at the versions benchmarks/async_workers.py ran with.
+#
+# Settings benchmarks/async_workers.py was run with, per web dyno:
+#   sync:   WEB_CONCURRENCY=2
+#   gevent: WEB_CONCURRENCY=2 GUNICORN_WORKER_CONNECTIONS=100 DB_POOL_SIZE=5 DB_MAX_OVERFLOW=2
+#           (or DB_CONNECTION_BUDGET=14); PAYSTACK_POOL_MAXSIZE and PASSWORD_HASH_WORKERS
+#           then default to 100 and one per core.
+# Database connections are bounded by the pool, not by worker_connections: a gevent worker
+# opens at most DB_POOL_SIZE + DB_MAX_OVERFLOW, the same as a sync worker, and requests
+# wait up to DB_POOL_TIMEOUT for one.
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# The same default as app.py's METRICS_DIR: the metrics folder in the app's instance
+# folder next to this file.
+metrics_dir = os.environ.get('METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics'))
+
+
+def child_exit(server, worker):
+    """Drops the exited worker's metrics snapshot, so /metrics only merges live workers."""
+    if metrics_dir:
+        from observability import remove_snapshot
+        remove_snapshot(metrics_dir, worker.pid)
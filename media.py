@@ -0,0 +1,139 @@
+import hashlib
+import os
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+# Widths of the stored renditions. Cards render about 400 CSS px wide and the gallery
+# lightbox up to about 1200, so these cover 1x-2x screens without upscaling.
+RENDITION_WIDTHS = (320, 640, 960, 1600)
+# Every rendition is cropped to the 4:3 frame the templates lay images out in.
+ASPECT_RATIO = (4, 3)
+CLOUDINARY_HOSTS = ('res.cloudinary.com',)
+# Local rendition files this process has already seen on disk.
+_existing_renditions = set()
+
+
+def _height_for(width):
+    return width * ASPECT_RATIO[1] // ASPECT_RATIO[0]
+
+
+def _image_record(url, srcset):
+    """The stored form of one image: the original URL, a default src, and [width, url] pairs."""
+    if not srcset:
+        return {'url': url, 'src': url, 'srcset': [], 'width': None, 'height': None}
+    # The default src is a mid-sized rendition for browsers that ignore srcset.
+    width, src = srcset[min(1, len(srcset) - 1)]
+    return {'url': url, 'src': src, 'srcset': srcset, 'width': width, 'height': _height_for(width)}
+
+
+def cloudinary_rendition_url(url, width, hosts=CLOUDINARY_HOSTS):
+    """Rewrites a Cloudinary delivery URL to a cropped, auto-format rendition, or returns None.
+
+    Cloudinary derives renditions on request from the transformation in the path, so this
+    needs no API call and works offline.
+    """
+    parts = urlsplit(url)
+    if parts.netloc not in hosts or '/image/upload/' not in parts.path:
+        return None
+    prefix, rest = parts.path.split('/image/upload/', 1)
+    transformation = f'c_fill,g_auto,w_{width},h_{_height_for(width)},q_auto,f_auto'
+    return urlunsplit(parts._replace(path=f'{prefix}/image/upload/{transformation}/{rest}'))
+
+
+def _static_path(url, static_folder, static_url_path='/static'):
+    """The file a /static/... URL points at, or None for any other URL."""
+    path = unquote(urlsplit(url).path)
+    if not path.startswith(static_url_path + '/'):
+        return None
+    return os.path.join(static_folder, *path[len(static_url_path) + 1:].split('/'))
+
+
+def _write_renditions(source, static_folder, static_url_path='/static'):
+    """Writes resized JPEG renditions of one image file. Returns [width, url] pairs.
+
+    Needs Pillow; without it, or for a missing, truncated or unreadable file, no renditions
+    are made. Files are named by a hash of the source, so every process that renders the
+    same image writes and links the same names.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return []
+    output_dir = os.path.join(static_folder, 'renditions')
+    srcset = []
+    try:
+        with open(source, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            os.makedirs(output_dir, exist_ok=True)
+            for width in RENDITION_WIDTHS:
+                if width > image.width:
+                    break
+                name = f'{digest}-{width}.jpg'
+                target = os.path.join(output_dir, name)
+                if not os.path.exists(target):
+                    tmp_target = f'{target}.{os.getpid()}.tmp'
+                    ImageOps.fit(image, (width, _height_for(width))).save(tmp_target, 'JPEG', quality=80, optimize=True)
+                    os.replace(tmp_target, target)
+                srcset.append([width, f'{static_url_path}/renditions/{name}'])
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return []
+    return srcset
+
+
+def local_renditions(url, static_folder, static_url_path='/static'):
+    """Writes renditions of an image under the static folder. Returns [width, url] pairs."""
+    source = _static_path(url, static_folder, static_url_path)
+    return _write_renditions(source, static_folder, static_url_path) if source else []
+
+
+def build_renditions(static_folder, images_dir='images'):
+    """Writes the renditions of every image under static/<images_dir>. Returns how many images had some.
+
+    Run at build time on every instance ('flask build-static'), so renditions linked from the
+    database exist wherever the web process runs, not only where the record was saved.
+    """
+    built = 0
+    for root, _, files in os.walk(os.path.join(static_folder, images_dir)):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in ('.jpg', '.jpeg', '.png', '.webp', '.gif'):
+                built += bool(_write_renditions(os.path.join(root, name), static_folder))
+    return built
+
+
+def servable_image(record, static_folder, static_url_path='/static'):
+    """A stored image record minus any local renditions that are missing on this instance.
+
+    An image uploaded on another instance has no rendition files here, so it is served from
+    its original URL rather than linking renditions that would 404.
+    """
+    srcset = [pair for pair in record.get('srcset') or []
+              if not pair[1].startswith(static_url_path + '/renditions/')
+              or _rendition_exists(_static_path(pair[1], static_folder, static_url_path))]
+    if len(srcset) == len(record.get('srcset') or []):
+        return record
+    return _image_record(record['url'], srcset)
+
+
+def _rendition_exists(path):
+    # Renditions are never deleted while the app runs, so a file seen once stays known.
+    if path in _existing_renditions:
+        return True
+    if os.path.exists(path):
+        _existing_renditions.add(path)
+        return True
+    return False
+
+
+def derive_image(url, static_folder, cloudinary_hosts=CLOUDINARY_HOSTS):
+    """Returns the stored record for one image URL; unknown hosts keep just the original URL."""
+    if cloudinary_rendition_url(url, RENDITION_WIDTHS[0], cloudinary_hosts):
+        srcset = [[width, cloudinary_rendition_url(url, width, cloudinary_hosts)] for width in RENDITION_WIDTHS]
+    else:
+        srcset = local_renditions(url, static_folder)
+    return _image_record(url, srcset)
+
+
+def plain_image(url):
+    """Record for an image that has no stored renditions yet."""
+    return _image_record(url, [])
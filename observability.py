@@ -0,0 +1,204 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+from flask.logging import default_handler
+from sqlalchemy import event
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Time from request start to response, by endpoint.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'db_queries_per_request': (
+        'histogram', 'SQL statements executed per request, by endpoint.',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100)),
+    'db_queries_total': ('counter', 'SQL statements executed, by endpoint.', None),
+    'db_query_seconds_total': ('counter', 'Time spent executing SQL statements, by endpoint.', None),
+    'template_render_seconds': (
+        'histogram', 'Time spent rendering templates, by endpoint and template.',
+        (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)),
+    'paystack_request_duration_seconds': (
+        'histogram', 'Outbound Paystack calls, by operation and outcome, one per attempt.',
+        (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'background_job_duration_seconds': (
+        'histogram', 'Duration of each background job run, by job.',
+        (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)),
+    'background_job_rows_total': ('counter', 'Rows changed by background jobs, by job and action.', None),
+}
+
+# Attributes every LogRecord has; anything else was passed through extra= and is logged as a field.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms for one process, keyed by metric name and label values."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            position = bisect.bisect_left(buckets, value)
+            if position < len(buckets):
+                series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """A JSON-serializable copy of every series, as merge_snapshots and render_prometheus take it."""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(counts), total, count]
+                               for (name, labels), (counts, total, count) in self._histograms.items()],
+            }
+
+    def write_snapshot(self, directory):
+        """Writes this process's series to <directory>/<pid>.json for other workers to merge."""
+        os.makedirs(directory, exist_ok=True)
+        path = snapshot_path(directory, os.getpid())
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+def snapshot_path(directory, pid):
+    return os.path.join(directory, f'{pid}.json')
+
+
+def remove_snapshot(directory, pid):
+    """Deletes an exited worker's snapshot, so its pid's series stop being reported."""
+    for path in (snapshot_path(directory, pid), f'{snapshot_path(directory, pid)}.tmp'):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_snapshots(directory):
+    """Every live worker's last written snapshot."""
+    snapshots = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return snapshots
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}' if pairs else ''
+
+
+def render_prometheus(snapshots):
+    """Prometheus text exposition format (version 0.0.4) for the merged snapshots."""
+    counters, histograms = merge_snapshots(snapshots)
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+            continue
+        for (series_name, labels), (counts, total, count) in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def install_query_timing(target, on_query):
+    """Calls on_query(statement, seconds) after every SQL statement executed through target."""
+    # The start time lives on the statement's execution context, so a statement that raises
+    # leaves nothing behind on the connection. The few internal statements run without a
+    # context are not timed.
+    @event.listens_for(target, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(target, 'after_cursor_execute')
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_started', None)
+        if started is not None:
+            on_query(statement, time.perf_counter() - started)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, plus any fields passed with extra=."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(logger, level='INFO', log_format='json'):
+    """Replaces Flask's default handler on logger with one writing JSON (or plain text) to stderr."""
+    logger.removeHandler(default_handler)
+    handler = logging.StreamHandler()
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+# A rendered page as it is stored in the cache. last_modified is a Unix timestamp.
+PageCacheEntry = namedtuple('PageCacheEntry', ['body', 'mimetype', 'etag', 'last_modified'])
+
+
+class NullPageCache:
+    """Backend used when page caching is switched off."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, entry):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUPageCache:
+    """In-process LRU cache. Each gunicorn worker holds its own copy of the entries."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _mtime(path):
+    """A file's mtime, or 0 if another worker removed it in the meantime."""
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+class FileSystemPageCache:
+    """Stores entries as files in a local directory so every worker on the host shares them.
+
+    The directory is pruned back to max_entries every prune_every writes of this process,
+    rather than listed on each one, so it may briefly hold a few more entries.
+    """
+
+    def __init__(self, directory, max_entries=512, prune_every=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.prune_every = max(1, prune_every)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.page')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        if header.get('key') != key:
+            return None
+        return PageCacheEntry(body, header['mimetype'], header['etag'], header['last_modified'])
+
+    def set(self, key, entry):
+        path = self._path(key)
+        header = {'key': key, 'mimetype': entry.mimetype, 'etag': entry.etag,
+                  'last_modified': entry.last_modified}
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(entry.body)
+        os.replace(tmp_path, path)
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self._prune()
+
+    def _prune(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.page')]
+        except FileNotFoundError:
+            return
+        if len(names) <= self.max_entries:
+            return
+        paths = [os.path.join(self.directory, name) for name in names]
+        paths.sort(key=_mtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.page'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+def create_page_cache(config):
+    """Builds the page cache backend named by PAGE_CACHE_BACKEND ('memory', 'filesystem' or 'none')."""
+    backend = config.get('PAGE_CACHE_BACKEND', 'memory')
+    max_entries = config.get('PAGE_CACHE_MAX_ENTRIES', 512)
+    if backend == 'memory':
+        return LRUPageCache(max_entries)
+    if backend == 'filesystem':
+        return FileSystemPageCache(config['PAGE_CACHE_DIR'], max_entries)
+    if backend == 'none':
+        return NullPageCache()
+    raise ValueError(f'Unknown PAGE_CACHE_BACKEND: {backend}')
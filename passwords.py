@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from serving import native_thread_pool
+
+
+def canonical_method(method):
+    """Spells out werkzeug's defaults, so 'scrypt' matches the 'scrypt:32768:8:1' prefix it stores."""
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join([name] + params + defaults[len(params):])
+
+
+class PasswordHashingBusy(Exception):
+    """Every hashing slot is taken and the wait queue is full; the caller should ask the user to retry."""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with configurable werkzeug parameters.
+
+    With workers > 0, hashing runs on a bounded thread pool. hashlib releases the GIL while it
+    works, so the pool caps how many cores a login storm can take from the threads serving
+    other requests, and attempts beyond the queue are refused at once instead of piling up.
+    Under gevent the pool keeps real threads, so hashing never blocks the worker's event loop.
+    """
+
+    def __init__(self, method='scrypt', workers=0, queue_size=8):
+        self.method = canonical_method(method)
+        self._executor = native_thread_pool(workers, 'password-hash') if workers else None
+        self._max_pending = workers + queue_size
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a hasher from PASSWORD_HASH_* Flask config values."""
+        return cls(config['PASSWORD_HASH_METHOD'], config['PASSWORD_HASH_WORKERS'], config['PASSWORD_HASH_QUEUE'])
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        with self._lock:
+            if self._pending >= self._max_pending:
+                raise PasswordHashingBusy('Too many password hashes in progress.')
+            self._pending += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with other parameters than the configured ones."""
+        return password_hash.split('$', 1)[0] != self.method
+
+
+class LoginThrottle:
+    """Recent failed logins per email and per client IP, checked before any password is hashed.
+
+    Counts are per process, like the other in-memory caches, so with several gunicorn workers
+    an attacker gets up to that many times the limit; the cost of each guess stays bounded.
+    """
+
+    def __init__(self, max_failures_per_email=5, max_failures_per_ip=20, window=300, max_keys=50000):
+        self.limits = {'email': max_failures_per_email, 'ip': max_failures_per_ip}
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['LOGIN_MAX_FAILURES_PER_EMAIL'], config['LOGIN_MAX_FAILURES_PER_IP'],
+                   config['LOGIN_FAILURE_WINDOW'])
+
+    def _keys(self, email, ip):
+        return [('email', (email or '').strip().lower()), ('ip', ip or '')]
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, email, ip):
+        """Seconds until another attempt is allowed for this email or IP; 0 if it is allowed now."""
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for key in self._keys(email, ip):
+                failures = self._recent(key, now)
+                if failures and len(failures) >= self.limits[key[0]]:
+                    wait = max(wait, failures[-self.limits[key[0]]] + self.window - now)
+        return wait
+
+    def record_failure(self, email, ip):
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys(email, ip):
+                failures = self._recent(key, now)
+                if failures is None:
+                    failures = self._failures[key] = deque(maxlen=max(self.limits.values()))
+                failures.append(now)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def reset(self, email):
+        """Forgets an email's failures after a successful login."""
+        with self._lock:
+            self._failures.pop(self._keys(email, None)[0], None)
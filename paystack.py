@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PAYSTACK_BASE_URL = 'https://api.paystack.co'
+
+# Status codes worth retrying on idempotent calls; anything else is a real answer.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class PaystackError(Exception):
+    """Paystack answered, but rejected the request."""
+
+
+class PaystackUnavailable(PaystackError):
+    """Paystack could not be reached, timed out, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops calling the gateway for a while after repeated failures so workers are not parked on it."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow_request(self):
+        # In the half-open state calls go through; the first result closes or re-opens the circuit.
+        return self.state != 'open'
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class PaystackClient:
+    """Pooled, keep-alive Paystack client with timeouts, bounded retries on verify and a circuit breaker."""
+
+    def __init__(self, secret_key, base_url=PAYSTACK_BASE_URL, connect_timeout=3.05, read_timeout=10.0,
+                 verify_retries=2, backoff_factor=0.5, pool_maxsize=10, breaker=None):
+        self.secret_key = secret_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify_retries = verify_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker or CircuitBreaker()
+        # Optional hook called as on_request(operation, seconds, outcome) after every attempt.
+        self.on_request = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {secret_key}',
+            'Content-Type': 'application/json',
+        })
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a client from PAYSTACK_* Flask config values."""
+        return cls(
+            config['PAYSTACK_SECRET_KEY'],
+            base_url=config.get('PAYSTACK_BASE_URL', PAYSTACK_BASE_URL),
+            connect_timeout=config.get('PAYSTACK_CONNECT_TIMEOUT', 3.05),
+            read_timeout=config.get('PAYSTACK_READ_TIMEOUT', 10.0),
+            verify_retries=config.get('PAYSTACK_VERIFY_RETRIES', 2),
+            pool_maxsize=config.get('PAYSTACK_POOL_MAXSIZE', 10),
+            breaker=CircuitBreaker(config.get('PAYSTACK_BREAKER_THRESHOLD', 5),
+                                   config.get('PAYSTACK_BREAKER_RESET', 30.0)),
+        )
+
+    def initialize_transaction(self, payload):
+        """Starts a transaction. Not retried: a second attempt with the same reference is rejected."""
+        return self._request('initialize', 'POST', '/transaction/initialize', retries=0, json=payload)
+
+    def verify_transaction(self, reference):
+        """Looks up a transaction's outcome. Safe to retry, so transient failures are retried with backoff."""
+        return self._request('verify', 'GET', f'/transaction/verify/{reference}', retries=self.verify_retries)
+
+    def _backoff(self, attempt):
+        return min(self.backoff_factor * (2 ** attempt), 8.0)
+
+    def _report(self, operation, started, outcome):
+        if self.on_request is not None:
+            self.on_request(operation, time.perf_counter() - started, outcome)
+
+    def _request(self, operation, method, path, retries, **kwargs):
+        if not self.breaker.allow_request():
+            raise PaystackUnavailable('Payment gateway circuit is open; not calling Paystack.')
+
+        last_error = None
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt - 1))
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._report(operation, started, 'error')
+                last_error = e
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self._report(operation, started, 'error')
+                last_error = PaystackUnavailable(f'Paystack returned HTTP {response.status_code}.')
+                continue
+            self._report(operation, started, 'ok')
+            self.breaker.record_success()
+            return _parse_response(response.status_code, _json_or_none(response))
+
+        self.breaker.record_failure()
+        raise PaystackUnavailable(f'Payment gateway error: {last_error}') from last_error
+
+
+class AsyncPaystackClient:
+    """asyncio variant of PaystackClient built on httpx (optional dependency)."""
+
+    def __init__(self, secret_key, base_url=PAYSTACK_BASE_URL, connect_timeout=3.05, read_timeout=10.0,
+                 verify_retries=2, backoff_factor=0.5, pool_maxsize=10, breaker=None):
+        try:
+            import httpx
+        except ImportError as e:
+            raise RuntimeError('AsyncPaystackClient requires httpx (pip install httpx).') from e
+        self._httpx = httpx
+        self.verify_retries = verify_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker or CircuitBreaker()
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            headers={'Authorization': f'Bearer {secret_key}', 'Content-Type': 'application/json'},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+
+    async def initialize_transaction(self, payload):
+        return await self._request('POST', '/transaction/initialize', retries=0, json=payload)
+
+    async def verify_transaction(self, reference):
+        return await self._request('GET', f'/transaction/verify/{reference}', retries=self.verify_retries)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, method, path, retries, **kwargs):
+        if not self.breaker.allow_request():
+            raise PaystackUnavailable('Payment gateway circuit is open; not calling Paystack.')
+
+        last_error = None
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(min(self.backoff_factor * (2 ** (attempt - 1)), 8.0))
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except self._httpx.HTTPError as e:
+                last_error = e
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                last_error = PaystackUnavailable(f'Paystack returned HTTP {response.status_code}.')
+                continue
+            self.breaker.record_success()
+            return _parse_response(response.status_code, _json_or_none(response))
+
+        self.breaker.record_failure()
+        raise PaystackUnavailable(f'Payment gateway error: {last_error}') from last_error
+
+
+def _json_or_none(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def _parse_response(status_code, body):
+    if body is None:
+        raise PaystackError(f'Paystack returned a non-JSON response (HTTP {status_code}).')
+    if status_code >= 400 or not body.get('status'):
+        raise PaystackError(body.get('message') or f'Paystack returned HTTP {status_code}.')
+    return body
@@ -0,0 +1,225 @@
+import codecs
+import csv
+import io
+import json
+import math
+import os
+
+# Record keys, in the order data/rooms.json and CSV exports use them.
+ROOM_FIELDS = ('id', 'name', 'capacity', 'price_per_academic_year', 'available_rooms', 'description',
+               'amenities', 'images', 'video_url', 'is_deleted')
+# List values are joined with LIST_SEPARATOR in a CSV cell.
+LIST_FIELDS = ('amenities', 'images')
+LIST_SEPARATOR = '|'
+FORMATS = ('json', 'csv')
+CHUNK_SIZE = 64 * 1024
+
+
+class CatalogError(ValueError):
+    """A catalogue that cannot be read, or a record that is not a valid room."""
+
+
+def catalog_format(filename, default='json'):
+    """'csv' or 'json' from a file name's extension."""
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return extension if extension in FORMATS else default
+
+
+class JsonCatalogReader:
+    """Streams room records out of a catalogue in the data/rooms.json layout.
+
+    The file is read CHUNK_SIZE at a time and each element of the "rooms" array is decoded
+    on its own, so memory stays flat however many rooms there are. The other top-level keys
+    (hostel_name, general_images, ...) are collected in .hostel as they go past. A bare
+    top-level array of rooms is accepted too.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.hostel = {}
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decode = codecs.getincrementaldecoder('utf-8-sig')().decode
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+
+    def _fill(self):
+        chunk = self._stream.read(self._chunk_size)
+        if isinstance(chunk, bytes):
+            try:
+                chunk = self._decode(chunk, final=not chunk)
+            except UnicodeDecodeError as e:
+                raise CatalogError(f'Invalid JSON: {e}.')
+        if not chunk:
+            self._eof = True
+            return False
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, message):
+        return CatalogError(f'{message} at character {self._offset + self._pos}.')
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise self._error(f"Expected '{char}'")
+        self._pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise self._error('Invalid JSON')
+            # A number that ends the buffer may continue in the next chunk.
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']')
+            return
+
+    def __iter__(self):
+        if self._peek() == '[':
+            yield from self._array()
+            return
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise self._error('Expected a key')
+            self._expect(':')
+            if key == 'rooms':
+                yield from self._array()
+            else:
+                self.hostel[key] = self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect('}')
+            return
+
+
+class CsvCatalogReader:
+    """Streams room records out of a CSV catalogue with a header row of ROOM_FIELDS."""
+
+    def __init__(self, stream):
+        self.hostel = {}
+        self._stream = stream
+
+    def __iter__(self):
+        stream = self._stream
+        if not isinstance(stream, io.TextIOBase):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        try:
+            for row in csv.DictReader(stream):
+                yield {key: value for key, value in row.items() if key is not None}
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise CatalogError(f'Invalid CSV: {e}.')
+        finally:
+            if stream is not self._stream:
+                stream.detach()
+
+
+def catalog_reader(stream, fmt):
+    return CsvCatalogReader(stream) if fmt == 'csv' else JsonCatalogReader(stream)
+
+
+def _as_list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    raise CatalogError('amenities and images must be lists.')
+
+
+def _as_flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def room_values(record):
+    """Validates one catalogue record and returns the room's values, keyed like the record."""
+    if not isinstance(record, dict):
+        raise CatalogError('Each room must be an object.')
+    name = str(record.get('name') or '').strip()
+    if not name:
+        raise CatalogError('name is required.')
+    try:
+        values = {
+            'name': name,
+            'capacity': int(record['capacity']),
+            'price_per_academic_year': float(record['price_per_academic_year']),
+            'available_rooms': int(record.get('available_rooms') or 0),
+        }
+    except KeyError as e:
+        raise CatalogError(f'{e.args[0]} is required for room "{name}".')
+    except (TypeError, ValueError, OverflowError):
+        raise CatalogError(f'capacity, price_per_academic_year and available_rooms must be numbers for room "{name}".')
+    price = values['price_per_academic_year']
+    if values['capacity'] < 1 or values['available_rooms'] < 0 or not math.isfinite(price) or price <= 0:
+        raise CatalogError(f'Room "{name}" needs a positive price and capacity, and no negative unit count.')
+    values['description'] = str(record.get('description') or '')
+    values['amenities'] = _as_list(record.get('amenities'))
+    values['images'] = _as_list(record.get('images'))
+    values['video_url'] = str(record.get('video_url') or '').strip()
+    values['is_deleted'] = _as_flag(record.get('is_deleted'))
+    return values
+
+
+def json_catalog_chunks(hostel, records):
+    """The catalogue as JSON text in the data/rooms.json layout, one chunk per room."""
+    yield '{\n'
+    for key, value in hostel.items():
+        yield f'  {json.dumps(key)}: {json.dumps(value)},\n'
+    yield '  "rooms": ['
+    separator = '\n'
+    for record in records:
+        yield separator + '    ' + json.dumps(record)
+        separator = ',\n'
+    yield '\n  ]\n}\n'
+
+
+def csv_catalog_chunks(records, rows_per_chunk=200):
+    """The catalogue as CSV text with a ROOM_FIELDS header, a few hundred rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, ROOM_FIELDS)
+    writer.writeheader()
+    for count, record in enumerate(records, 1):
+        writer.writerow(dict(record, **{field: LIST_SEPARATOR.join(record[field]) for field in LIST_FIELDS}))
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
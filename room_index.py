@@ -0,0 +1,65 @@
+import bisect
+import json
+
+
+def normalize_amenity(name):
+    """Amenities match case-insensitively and ignore repeated whitespace."""
+    return ' '.join(name.split()).casefold()
+
+
+class RoomSearchIndex:
+    """Inverted index over active rooms, with one bitset per amenity and per capacity.
+
+    Rooms are ranked by price, so bit n is the n-th cheapest room and a price range is a
+    contiguous run of bits. A search ANDs a few integers instead of decoding every room's
+    amenities.
+    """
+
+    def __init__(self, rows):
+        """rows: (room_id, capacity, price, amenities_json) for every active room."""
+        rows = sorted(rows, key=lambda row: (row[2], row[0]))
+        self._room_ids = [row[0] for row in rows]
+        self._prices = [row[2] for row in rows]
+        self._all = (1 << len(rows)) - 1
+        self._amenity_bits = {}
+        self._amenity_names = {}
+        self._capacity_bits = {}
+        for position, (_, capacity, _, amenities_json) in enumerate(rows):
+            bit = 1 << position
+            self._capacity_bits[capacity] = self._capacity_bits.get(capacity, 0) | bit
+            for amenity in json.loads(amenities_json) if amenities_json else []:
+                key = normalize_amenity(amenity)
+                self._amenity_bits[key] = self._amenity_bits.get(key, 0) | bit
+                self._amenity_names.setdefault(key, amenity.strip())
+
+    def __len__(self):
+        return len(self._room_ids)
+
+    @property
+    def amenities(self):
+        """Display names of every amenity offered by at least one room, alphabetically."""
+        return sorted(self._amenity_names.values(), key=str.casefold)
+
+    @property
+    def capacities(self):
+        return sorted(self._capacity_bits)
+
+    def search(self, amenities=(), capacity=None, min_price=None, max_price=None):
+        """Ids of the rooms that have every amenity and match capacity and price, in ascending id order."""
+        mask = self._all
+        if min_price is not None or max_price is not None:
+            low = bisect.bisect_left(self._prices, min_price) if min_price is not None else 0
+            high = bisect.bisect_right(self._prices, max_price) if max_price is not None else len(self._prices)
+            mask &= ((1 << high) - 1) ^ ((1 << low) - 1) if high > low else 0
+        if capacity is not None:
+            mask &= self._capacity_bits.get(capacity, 0)
+        for amenity in amenities:
+            mask &= self._amenity_bits.get(normalize_amenity(amenity), 0)
+
+        room_ids = []
+        while mask:
+            lowest = mask & -mask
+            room_ids.append(self._room_ids[lowest.bit_length() - 1])
+            mask ^= lowest
+        room_ids.sort()
+        return room_ids
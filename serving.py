@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def cooperative():
+    """Whether gevent has monkey-patched this process, as gunicorn's gevent worker does before loading the app."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def native_thread_pool(max_workers, thread_name_prefix=''):
+    """A thread pool on real OS threads, even under gevent, for CPU work that releases the GIL.
+
+    Under gevent a patched ThreadPoolExecutor would run its tasks as greenlets on the worker's
+    single OS thread, so a long hash would stall every other request the worker is serving.
+    """
+    if cooperative():
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+def make_psycopg_cooperative():
+    """Lets psycopg2 yield to other greenlets while it waits on PostgreSQL (needs psycogreen)."""
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError as e:
+        raise RuntimeError('gevent workers with PostgreSQL need psycogreen (pinned in requirements.txt).') from e
+    patch_psycopg()
@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import shutil
+
+from werkzeug.security import safe_join
+
+# Fingerprinted copies and their manifest live under static/dist/ (see `flask build-static`).
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Directories whose file names already carry a content hash.
+FINGERPRINTED_DIRS = (DIST_DIR, 'renditions')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+# Preferred first when a client accepts both.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _compress(path):
+    """Writes .gz (and .br when the brotli package is installed) next to path, keeping only smaller files."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        variants['.br'] = brotli.compress(data)
+    except ImportError:
+        pass
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+def build_static(static_folder):
+    """Copies every static file to dist/ under a content-hashed name, precompresses text assets,
+    and writes the manifest mapping original paths to hashed ones. Returns the manifest.
+
+    Copies from earlier builds are kept, so pages cached or still open in a browser keep working.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for directory, subdirs, files in os.walk(static_folder):
+        relative_dir = os.path.relpath(directory, static_folder)
+        if relative_dir.split(os.sep)[0] in FINGERPRINTED_DIRS:
+            subdirs[:] = []
+            continue
+        for name in sorted(files):
+            source = os.path.join(directory, name)
+            with open(source, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            stem, extension = os.path.splitext(name)
+            relative = os.path.normpath(os.path.join(relative_dir, name)).replace(os.sep, '/')
+            hashed = os.path.normpath(os.path.join(DIST_DIR, relative_dir, f'{stem}.{digest}{extension}')).replace(os.sep, '/')
+            target = os.path.join(static_folder, *hashed.split('/'))
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(source, target)
+                if is_compressible(name):
+                    _compress(target)
+            manifest[relative] = hashed
+    # Written to a temporary file first, so a worker starting up never reads half a manifest.
+    path = os.path.join(dist, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """The manifest written by build_static, or {} when the assets have not been built."""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_compressible(filename):
+    return os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS
+
+
+def is_fingerprinted(filename):
+    """Whether a path relative to the static folder names content that never changes.
+
+    The manifest sits in dist/ but is rewritten by every build under the same name.
+    """
+    filename = posixpath.normpath(filename)
+    return filename.split('/', 1)[0] in FINGERPRINTED_DIRS and filename != f'{DIST_DIR}/{MANIFEST_NAME}'
+
+
+def precompressed_variant(static_folder, filename, accept_encoding):
+    """(encoding, filename) of the best precompressed file the client accepts, or None."""
+    accepted = {token.split(';')[0].strip() for token in accept_encoding.split(',')
+                if token.replace(' ', '').partition(';q=')[2] not in ('0', '0.0', '0.00', '0.000')}
+    for encoding, suffix in ENCODINGS:
+        path = safe_join(static_folder, filename + suffix)
+        if encoding in accepted and path and os.path.isfile(path):
+            return encoding, filename + suffix
+    return None
+
+
+def content_type(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
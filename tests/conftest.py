@@ -0,0 +1,86 @@
+"""Shared fixtures: one app imported against a throwaway database and metrics directory per test session.
+
+app.py reads its settings from the environment at import, so every test shares the one
+app and database. Tests add their own users and rooms and compare against their own
+baselines rather than assuming an empty database. TEST_DATABASE_URL runs them against
+PostgreSQL instead of SQLite.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+ADMIN_PASSWORD = 'test-admin-password'
+PASSWORD = 'test-password'
+
+
+@pytest.fixture(scope='session')
+def hostel_app(tmp_path_factory):
+    """The app module, with the schema created and the default admin, hostel and rooms seeded."""
+    workdir = tmp_path_factory.mktemp('leemont')
+    os.environ.update(
+        DATABASE_URL=os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{workdir / "test.db"}',
+        METRICS_DIR=str(workdir / 'metrics'),
+        # One process, whose own bumps apply at once; a long TTL keeps query counts steady.
+        CACHE_VERSION_SECONDS='3600',
+        ADMIN_PASSWORD=ADMIN_PASSWORD,
+        BOOKING_EXPIRY_MODE='external',
+        PAYMENT_WORKER_MODE='external',
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+        LOG_LEVEL='WARNING',
+    )
+    import app
+    app.initialize_database()
+    return app
+
+
+@pytest.fixture
+def db(hostel_app):
+    with hostel_app.app.app_context():
+        yield hostel_app.db
+        hostel_app.db.session.remove()
+
+
+@pytest.fixture
+def statements(hostel_app):
+    """SQL statements run on the primary engine while the test runs, in order."""
+    with hostel_app.app.app_context():
+        engine = hostel_app.db.engine
+    collected = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        collected.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    yield collected
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def guest(hostel_app):
+    """A new guest account: (id, email)."""
+    email = f'guest-{uuid.uuid4().hex[:12]}@example.com'
+    with hostel_app.app.app_context():
+        user = hostel_app.User(email=email)
+        user.set_password(PASSWORD)
+        hostel_app.db.session.add(user)
+        hostel_app.db.session.commit()
+        return user.id, email
+
+
+@pytest.fixture
+def guest_client(hostel_app, guest):
+    client = hostel_app.app.test_client()
+    client.post('/login', data={'email': guest[1], 'password': PASSWORD})
+    return client
+
+
+@pytest.fixture
+def admin_client(hostel_app):
+    client = hostel_app.app.test_client()
+    client.post('/admin/login', data={'username': 'admin@leemonthostel.com', 'password': ADMIN_PASSWORD})
+    return client
@@ -0,0 +1,31 @@
+"""Cache versions shared by every worker on every host through the database."""
+import time
+
+
+def test_a_bump_on_another_host_is_seen_once_the_ttl_passes(hostel_app, db, monkeypatch):
+    CacheVersion = hostel_app.CacheVersion
+    hostel_app.bump_cache_version('rooms')
+    before = hostel_app.get_cache_version('rooms')
+    index = hostel_app.get_room_index()
+
+    # Another host bumps the row; this worker keeps its snapshot until the TTL runs out.
+    db.session.execute(db.update(CacheVersion).where(CacheVersion.name == 'rooms')
+                       .values(version=CacheVersion.version + 1))
+    db.session.commit()
+    assert hostel_app.get_cache_version('rooms') == before
+    assert hostel_app.get_room_index() is index
+
+    ttl = hostel_app.app.config['CACHE_VERSION_SECONDS']
+    monotonic = time.monotonic
+    monkeypatch.setattr(time, 'monotonic', lambda: monotonic() + ttl + 1)
+    assert hostel_app.get_cache_version('rooms')[0] == before[0] + 1
+    assert hostel_app.get_room_index() is not index
+
+
+def test_a_request_reads_the_versions_once(hostel_app, statements, monkeypatch):
+    monkeypatch.setitem(hostel_app.app.config, 'CACHE_VERSION_SECONDS', 0)
+    monkeypatch.setitem(hostel_app._cache_versions, 'snapshot', (0.0, {}))
+    hostel_app.app.test_client().get('/rooms')
+    statements.clear()
+    hostel_app.app.test_client().get('/rooms')
+    assert sum(1 for statement in statements if 'FROM cache_version' in statement) == 1
@@ -0,0 +1,20 @@
+"""Connection pool metrics."""
+from sqlalchemy import create_engine, text
+
+from db_pool import MeteredQueuePool, pool_status
+
+
+def test_each_engine_keeps_its_own_pool_metrics_across_dispose(tmp_path):
+    primary = create_engine(f'sqlite:///{tmp_path / "primary.db"}', poolclass=MeteredQueuePool)
+    replica = create_engine(f'sqlite:///{tmp_path / "replica.db"}', poolclass=MeteredQueuePool)
+    for _ in range(3):
+        with primary.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    with replica.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    primary.dispose()
+    with primary.connect() as connection:
+        connection.execute(text('SELECT 1'))
+
+    assert pool_status(primary)['checkouts'] == 4
+    assert pool_status(replica)['checkouts'] == 1
@@ -0,0 +1,63 @@
+"""Holding room units under concurrency."""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pytest
+
+UNITS = 5
+
+
+@pytest.fixture
+def room_and_user(hostel_app):
+    db = hostel_app.db
+    with hostel_app.app.app_context():
+        room = hostel_app.Room(name=f'Stress Room {uuid.uuid4().hex[:8]}', capacity=1, price_per_academic_year=1000,
+                               available_rooms=UNITS, description='stress test', is_deleted=False)
+        user = hostel_app.User(email=f'stress-{uuid.uuid4().hex}@example.com', password_hash='x')
+        db.session.add_all([room, user])
+        db.session.commit()
+        return room.id, user.id
+
+
+def test_concurrent_holds_never_oversell(hostel_app, room_and_user):
+    db, Booking = hostel_app.db, hostel_app.Booking
+    room_id, user_id = room_and_user
+    check_in = date.today() + timedelta(days=30)
+    check_out = check_in + timedelta(days=120)
+
+    def attempt(_):
+        with hostel_app.app.app_context():
+            try:
+                if not hostel_app.hold_room_unit(room_id, check_in, check_out):
+                    db.session.rollback()
+                    return False
+                db.session.add(Booking(
+                    user_id=user_id, room_id=room_id, check_in_date=check_in, check_out_date=check_out,
+                    total_price=1000, status='pending_payment', payment_reference=str(uuid.uuid4()),
+                    holds_inventory=True, hold_expires_at=datetime.utcnow() + timedelta(minutes=30)))
+                db.session.commit()
+                return True
+            except Exception:
+                db.session.rollback()
+                return None
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(attempt, range(100)))
+
+    with hostel_app.app.app_context():
+        remaining = hostel_app.free_units(room_id, check_in, check_out)
+    assert results.count(None) == 0
+    assert (results.count(True), remaining) == (UNITS, 0)
+
+
+def test_only_a_stay_covering_tonight_bumps_availability(hostel_app, db):
+    """Public pages show tonight's free units, so a hold for later dates keeps them cached."""
+    before = (hostel_app.get_cache_version('content'), hostel_app.get_cache_version('availability'))
+    check_in = date.today() + timedelta(days=30)
+    hostel_app.bump_availability_for_stay(check_in, check_in + timedelta(days=120))
+    assert (hostel_app.get_cache_version('content'), hostel_app.get_cache_version('availability')) == before
+    hostel_app.bump_availability_for_stay(date.today(), date.today() + timedelta(days=120))
+    assert hostel_app.get_cache_version('availability') != before[1]
@@ -0,0 +1,9 @@
+"""Per-process metrics snapshots in METRICS_DIR."""
+
+
+def test_a_one_shot_command_leaves_no_snapshot(hostel_app, tmp_path, monkeypatch):
+    metrics_dir = tmp_path / 'metrics'
+    monkeypatch.setitem(hostel_app.app.config, 'METRICS_DIR', str(metrics_dir))
+    result = hostel_app.app.test_cli_runner().invoke(args=['expire-bookings'])
+    assert result.exit_code == 0, result.output
+    assert not metrics_dir.exists() or not list(metrics_dir.iterdir())
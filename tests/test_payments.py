@@ -0,0 +1,82 @@
+"""Verifying queued Paystack payments and applying them to bookings."""
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def booking(hostel_app, guest):
+    """A pending booking holding the only unit of a new room: (room id, payment reference)."""
+    db = hostel_app.db
+    check_in = date.today() + timedelta(days=30)
+    with hostel_app.app.app_context():
+        room = hostel_app.Room(name=f'Payment Room {uuid.uuid4().hex[:8]}', capacity=1, price_per_academic_year=1000,
+                               available_rooms=1, description='payment test', is_deleted=False)
+        db.session.add(room)
+        db.session.commit()
+        reference = str(uuid.uuid4())
+        db.session.add(hostel_app.Booking(
+            user_id=guest[0], room_id=room.id, check_in_date=check_in, check_out_date=check_in + timedelta(days=120),
+            total_price=1000, status='pending_payment', payment_reference=reference, holds_inventory=True,
+            hold_expires_at=datetime.utcnow() + timedelta(minutes=30)))
+        db.session.commit()
+        return room.id, reference
+
+
+@pytest.fixture
+def paystack_statuses(hostel_app, monkeypatch):
+    """Makes each verify answer with the next status appended to the returned list."""
+    statuses = []
+    monkeypatch.setattr(hostel_app.paystack, 'verify_transaction',
+                        lambda reference: {'status': True, 'data': {'status': statuses.pop(0)}})
+    return statuses
+
+
+def verify(hostel_app, reference, event='charge.success'):
+    """Queues an event for the reference, makes it due and runs the worker once."""
+    db, PaymentEvent = hostel_app.db, hostel_app.PaymentEvent
+    with hostel_app.app.app_context():
+        hostel_app.enqueue_payment_event(reference, event)
+        db.session.execute(db.update(PaymentEvent).where(PaymentEvent.reference == reference)
+                           .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        hostel_app.process_payment_events()
+        booking_status = hostel_app.Booking.query.filter_by(payment_reference=reference).one().status
+        event_statuses = [status for (status,) in db.session.query(PaymentEvent.status)
+                          .filter(PaymentEvent.reference == reference).order_by(PaymentEvent.id)]
+        return booking_status, event_statuses
+
+
+def test_an_unsettled_transaction_is_retried_until_it_succeeds(hostel_app, booking, paystack_statuses):
+    _, reference = booking
+    paystack_statuses.extend(['ongoing', 'pending', 'success'])
+    assert verify(hostel_app, reference, 'callback') == ('pending_payment', ['pending'])
+    assert verify(hostel_app, reference, 'callback') == ('pending_payment', ['pending'])
+    assert verify(hostel_app, reference) == ('approved', ['processed'])
+
+
+@pytest.mark.parametrize('status', ['failed', 'abandoned', 'reversed'])
+def test_a_final_failure_fails_the_booking(hostel_app, booking, paystack_statuses, status):
+    paystack_statuses.append(status)
+    assert verify(hostel_app, booking[1]) == ('failed', ['processed'])
+
+
+def test_a_success_after_a_failure_rebooks_a_free_unit(hostel_app, booking, paystack_statuses):
+    paystack_statuses.extend(['failed', 'success'])
+    assert verify(hostel_app, booking[1], 'callback')[0] == 'failed'
+    assert verify(hostel_app, booking[1])[0] == 'approved'
+
+
+def test_a_success_after_a_failure_asks_for_a_refund_when_the_room_filled(
+        hostel_app, booking, guest, paystack_statuses):
+    room_id, reference = booking
+    paystack_statuses.extend(['failed', 'success'])
+    assert verify(hostel_app, reference, 'callback')[0] == 'failed'
+    with hostel_app.app.app_context():
+        stay = hostel_app.Booking.query.filter_by(payment_reference=reference).one()
+        hostel_app.db.session.add(hostel_app.Booking(
+            user_id=guest[0], room_id=room_id, check_in_date=stay.check_in_date, check_out_date=stay.check_out_date,
+            total_price=1000, status='approved', payment_reference=str(uuid.uuid4()), holds_inventory=False))
+        hostel_app.db.session.commit()
+    assert verify(hostel_app, reference)[0] == 'refund_pending'
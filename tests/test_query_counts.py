@@ -0,0 +1,130 @@
+"""Pages that list rows must run a fixed number of queries, however many rows there are."""
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+PAGES = ('/', '/rooms', '/room/1', '/my_bookings', '/api/my_bookings', '/api/rooms')
+
+
+def count_queries(client, statements, path):
+    statements.clear()
+    response = client.get(path)
+    assert response.status_code == 200, path
+    return len(statements), response
+
+
+def add_rooms_and_bookings(hostel_app, rooms, bookings):
+    db = hostel_app.db
+    rng = random.Random(rooms + bookings)
+    with hostel_app.app.app_context():
+        users = [hostel_app.User(email=f'guest-{uuid.uuid4().hex}@example.com', password_hash='x')
+                 for _ in range(20)]
+        db.session.add_all(users)
+        db.session.add_all(hostel_app.Room(
+            name=f'Test Room {uuid.uuid4().hex[:8]}', capacity=1, price_per_academic_year=3000,
+            available_rooms=2, description='Test room', is_deleted=False) for _ in range(rooms))
+        db.session.commit()
+        room_ids = [room_id for (room_id,) in db.session.query(hostel_app.Room.id)]
+        user_ids = [user.id for user in users]
+        rows = []
+        for _ in range(bookings):
+            check_in = date.today() + timedelta(days=rng.randint(-400, 200))
+            rows.append({'user_id': rng.choice(user_ids), 'room_id': rng.choice(room_ids),
+                         'check_in_date': check_in, 'check_out_date': check_in + timedelta(days=120),
+                         'total_price': 3000, 'status': rng.choice(('approved', 'pending_payment', 'failed')),
+                         'payment_reference': str(uuid.uuid4()), 'holds_inventory': False})
+        db.session.execute(db.insert(hostel_app.Booking), rows)
+        db.session.commit()
+        hostel_app.bump_content_version()
+        hostel_app.bump_rooms_version()
+
+
+def test_admin_dashboard_queries_do_not_grow_with_data(hostel_app, admin_client, statements):
+    db, Booking, Room = hostel_app.db, hostel_app.Booking, hostel_app.Room
+    admin_client.get('/admin/dashboard')  # load the admin into the login cache
+
+    def page_counts():
+        first, _ = count_queries(admin_client, statements, '/admin/dashboard')
+        with hostel_app.app.app_context():
+            page_size = hostel_app.app.config['ADMIN_PAGE_SIZE']
+            room_cursor = db.session.query(Room.id).order_by(Room.id).offset(page_size - 1).limit(1).scalar()
+            booking_cursor = db.session.query(Booking.id).order_by(Booking.id.desc()) \
+                .offset(page_size - 1).limit(1).scalar()
+        second, _ = count_queries(admin_client, statements, f'/admin/dashboard?rooms_after={room_cursor or 0}'
+                                                            f'&bookings_before={booking_cursor or 0}')
+        return first, second
+
+    add_rooms_and_bookings(hostel_app, rooms=5, bookings=30)
+    small = page_counts()
+    add_rooms_and_bookings(hostel_app, rooms=100, bookings=1000)
+    assert page_counts() == small
+
+
+def test_my_bookings_queries_do_not_grow_with_bookings(hostel_app, guest, guest_client, statements):
+    db, Booking = hostel_app.db, hostel_app.Booking
+    user_id = guest[0]
+    with hostel_app.app.app_context():
+        room_ids = [room_id for (room_id,) in db.session.query(hostel_app.Room.id)]
+    guest_client.get('/my_bookings')  # load the user into the login cache
+
+    def page_counts():
+        html, _ = count_queries(guest_client, statements, '/my_bookings')
+        first_json, response = count_queries(guest_client, statements, '/api/my_bookings')
+        cursor = response.get_json()['next_cursor']
+        second_json, _ = count_queries(guest_client, statements, f'/api/my_bookings?before={cursor}')
+        second_html, _ = count_queries(guest_client, statements, f'/my_bookings?before={cursor}')
+        return html, second_html, first_json, second_json
+
+    def add_bookings(count):
+        # Bookings made in the same second share created_at, which exercises the id tie-break.
+        created_at = datetime.utcnow().replace(microsecond=0)
+        with hostel_app.app.app_context():
+            db.session.execute(db.insert(Booking), [
+                {'user_id': user_id, 'room_id': room_ids[n % len(room_ids)],
+                 'check_in_date': date.today(), 'check_out_date': date.today() + timedelta(days=120),
+                 'total_price': 3000, 'status': 'approved', 'payment_reference': str(uuid.uuid4()),
+                 'holds_inventory': False, 'created_at': created_at - timedelta(seconds=n // 3)}
+                for n in range(count)])
+            db.session.commit()
+
+    page_size = hostel_app.app.config['MY_BOOKINGS_PAGE_SIZE']
+    add_bookings(page_size + 5)
+    small = page_counts()
+    add_bookings(500)
+    assert page_counts() == small
+
+    # Walking every page returns each booking exactly once.
+    seen, cursor = [], ''
+    while cursor is not None:
+        data = guest_client.get(f'/api/my_bookings?before={cursor}').get_json()
+        seen.extend(booking['id'] for booking in data['bookings'])
+        cursor = data['next_cursor']
+    assert len(seen) == len(set(seen)) == page_size + 5 + 500
+
+
+def test_logged_in_views_load_the_user_from_the_cache(hostel_app, guest, guest_client, statements, monkeypatch):
+    def measure(ttl):
+        monkeypatch.setitem(hostel_app.app.config, 'USER_CACHE_SECONDS', ttl)
+        counts, user_queries = {}, {}
+        for path in PAGES:
+            guest_client.get(path)  # warm the user, hostel and room caches
+            count, _ = count_queries(guest_client, statements, path)
+            counts[path] = count
+            user_queries[path] = sum(1 for statement in statements if 'FROM user' in statement)
+        return counts, user_queries
+
+    uncached, uncached_user_queries = measure(0)
+    cached, cached_user_queries = measure(60)
+    assert not any(cached_user_queries.values())
+    # Exactly the user query goes (/api/rooms never loads the user, so its count stays the same).
+    assert cached == {path: uncached[path] - uncached_user_queries[path] for path in PAGES}
+
+
+def test_forgetting_cached_users_applies_a_promotion_at_once(hostel_app, guest, guest_client):
+    assert guest_client.get('/admin/dashboard').status_code != 200
+    with hostel_app.app.app_context():
+        hostel_app.db.session.execute(
+            hostel_app.db.update(hostel_app.User).where(hostel_app.User.id == guest[0]).values(is_admin=True))
+        hostel_app.db.session.commit()
+        hostel_app.forget_cached_users()
+    assert guest_client.get('/admin/dashboard').status_code == 200
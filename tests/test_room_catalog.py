@@ -0,0 +1,46 @@
+"""Reading and validating uploaded room catalogues."""
+import io
+
+import pytest
+
+from room_catalog import CatalogError, JsonCatalogReader, room_values
+
+ROOM = {'name': 'Catalogue Room', 'capacity': 2, 'price_per_academic_year': 3000, 'available_rooms': 1}
+
+
+def upload(admin_client, body, filename):
+    return admin_client.post('/admin/rooms/import', data={'catalog': (io.BytesIO(body), filename)},
+                             content_type='multipart/form-data')
+
+
+@pytest.mark.parametrize('body', [b'\xff\xfe{"rooms": []}', b'{"rooms": [{"name": "Caf\xe9"}]}'])
+def test_a_json_catalogue_that_is_not_utf8_is_a_catalog_error(body):
+    with pytest.raises(CatalogError):
+        list(JsonCatalogReader(io.BytesIO(body)))
+
+
+@pytest.mark.parametrize('filename', ['rooms.json', 'rooms.csv'])
+def test_uploading_a_catalogue_that_is_not_utf8_answers_400(admin_client, filename):
+    response = upload(admin_client, b'\xff\xfe\x00\x81 not utf-8', filename)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+@pytest.mark.parametrize('field, value', [
+    ('price_per_academic_year', 1e400), ('price_per_academic_year', float('nan')),
+    ('price_per_academic_year', 0), ('price_per_academic_year', -5),
+    ('capacity', 1e400), ('capacity', 0), ('capacity', -1), ('available_rooms', -1),
+])
+def test_room_values_rejects_unusable_numbers(field, value):
+    with pytest.raises(CatalogError):
+        room_values(dict(ROOM, **{field: value}))
+
+
+def test_uploading_an_infinite_price_answers_400(admin_client):
+    body = b'{"rooms": [{"name": "Infinite Room", "capacity": 1, "price_per_academic_year": 1e400}]}'
+    response = upload(admin_client, body, 'rooms.json')
+    assert response.status_code == 400
+
+
+def test_room_values_accepts_a_valid_room():
+    assert room_values(ROOM)['price_per_academic_year'] == 3000.0
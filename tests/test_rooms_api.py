@@ -0,0 +1,24 @@
+"""The public rooms JSON API."""
+import pytest
+
+
+@pytest.mark.parametrize('query', ['after=abc', 'after=12%7C3', 'limit=ten', 'limit=1.5'])
+def test_a_malformed_cursor_or_limit_answers_400(hostel_app, query):
+    response = hostel_app.app.test_client().get(f'/api/rooms?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_following_next_cursor_visits_each_room_once(hostel_app):
+    client = hostel_app.app.test_client()
+    seen, cursor = [], None
+    while True:
+        data = client.get('/api/rooms?limit=4' + (f'&after={cursor}' if cursor is not None else '')).get_json()
+        seen.extend(room['id'] for room in data['rooms'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    with hostel_app.app.app_context():
+        active = hostel_app.Room.query.filter(hostel_app.Room.is_deleted.is_(False)).count()
+    assert seen == sorted(set(seen))
+    assert len(seen) == active
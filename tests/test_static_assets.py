@@ -0,0 +1,17 @@
+"""Cache headers on static files."""
+from static_assets import IMMUTABLE
+
+
+def test_only_hashed_copies_are_cached_for_good(hostel_app, tmp_path, monkeypatch):
+    dist = tmp_path / 'dist'
+    dist.mkdir()
+    (dist / 'style.0123456789ab.css').write_text('body {}')
+    (dist / 'manifest.json').write_text('{"style.css": "dist/style.0123456789ab.css"}')
+    monkeypatch.setattr(hostel_app.app, 'static_folder', str(tmp_path))
+    client = hostel_app.app.test_client()
+
+    assert client.get('/static/dist/style.0123456789ab.css').headers['Cache-Control'] == IMMUTABLE
+    for path in ('/static/dist/manifest.json', '/static/dist/./manifest.json'):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert 'immutable' not in response.headers.get('Cache-Control', '')